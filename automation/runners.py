@@ -1,24 +1,27 @@
-from playwright.async_api import async_playwright
+from mpm.services.browser_pool import browser_pool
 
 
-async def run_cookie_capture(url: str) -> dict:
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        # Create a new incognito-like context
-        context = await browser.new_context()
+async def _cookie_capture(url: str) -> dict:
+    # A fresh incognito-like context on a pooled browser
+    async with browser_pool.context() as context:
         page = await context.new_page()
         await page.goto(url)
         cookies = await context.cookies()
-        await browser.close()
         return {"cookies": cookies}
 
 
-async def run_screenshot(url: str) -> dict:
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+async def _screenshot(url: str) -> dict:
+    async with browser_pool.context() as context:
+        page = await context.new_page()
         await page.goto(url)
         path = "screenshot.png"
         await page.screenshot(path=path)
-        await browser.close()
         return {"screenshot_path": path}
+
+
+async def run_cookie_capture(url: str) -> dict:
+    return await browser_pool.call(_cookie_capture(url))
+
+
+async def run_screenshot(url: str) -> dict:
+    return await browser_pool.call(_screenshot(url))
@@ -0,0 +1,66 @@
+"""
+Compare the bloom-filter pre-screen with the exact in-process set index:
+memory footprint, lookups per second and observed false-positive rate.
+
+    python scripts/bench_bloom.py --entries 1000000 --lookups 200000 --fp-rate 0.001
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from mpm.services.bloom import BloomFilter  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=200_000)
+    parser.add_argument("--fp-rate", type=float, default=0.001)
+    args = parser.parse_args()
+
+    listed = [f"user{i}@example.com" for i in range(args.entries)]
+    # half listed, half not
+    probes = [f"user{i * 2}@example.com" for i in range(args.lookups)]
+    misses = [f"other{i}@example.org" for i in range(args.lookups)]
+
+    tracemalloc.start()
+    exact = set(v.strip().lower() for v in listed)
+    set_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    t = time.perf_counter()
+    for v in probes:
+        v.strip().lower() in exact
+    set_rate = len(probes) / (time.perf_counter() - t)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.bloom")
+        t = time.perf_counter()
+        bf = BloomFilter.create(path, args.entries, args.fp_rate)
+        bf.add_many(listed)
+        build_s = time.perf_counter() - t
+
+        t = time.perf_counter()
+        for v in probes:
+            v in bf
+        bloom_rate = len(probes) / (time.perf_counter() - t)
+        false_pos = sum(v in bf for v in misses) / len(misses)
+        bloom_bytes = bf.nbytes
+        bf.close()
+
+    print(f"entries: {args.entries:,}  lookups: {args.lookups:,}")
+    print(f"exact set   : {set_bytes / 2**20:8.1f} MiB heap   {set_rate:12,.0f} lookups/s")
+    print(
+        f"bloom filter: {bloom_bytes / 2**20:8.1f} MiB mmap   {bloom_rate:12,.0f} lookups/s"
+        f"   build {build_s:.1f}s  k={bf.k}"
+    )
+    print(f"false-positive rate: {false_pos:.4%} (target {args.fp_rate:.4%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Compare offset pagination with the keyset pagination of GET /logs on a
+generated log_entries table: time per page at increasing depths, for all
+entries and for one profile.
+
+    python scripts/bench_logs.py --rows 10000000 --profiles 100 --page-size 100
+
+Uses a throwaway SQLite file unless --db is given (the table there is
+replaced).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from fastapi import Response  # noqa: E402
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.schema import CreateTable  # noqa: E402
+
+from mpm.models import LogEntry  # noqa: E402
+from mpm.routers.logs import encode_cursor, list_logs  # noqa: E402
+
+STATUSES = ["success"] * 8 + ["error", "deferred"]
+
+
+def generate(engine, rows, profiles, chunk=100_000):
+    table = LogEntry.__table__
+    table.drop(engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(CreateTable(table))
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    rng = random.Random(1)
+    t = time.perf_counter()
+    with engine.begin() as conn:
+        for lo in range(0, rows, chunk):
+            conn.execute(
+                insert(table),
+                [
+                    {
+                        "profile_id": rng.randint(1, profiles),
+                        "action": "send_message_email",
+                        "status": rng.choice(STATUSES),
+                        "detail": None,
+                        # a few rows per second, so timestamps repeat
+                        "timestamp": start + timedelta(seconds=i // 3),
+                    }
+                    for i in range(lo, min(lo + chunk, rows))
+                ],
+            )
+    load_s = time.perf_counter() - t
+    t = time.perf_counter()
+    with engine.begin() as conn:
+        for index in table.indexes:
+            index.create(conn)
+    return load_s, time.perf_counter() - t
+
+
+def offset_page(db, profile_id, skip, limit):
+    q = db.query(LogEntry)
+    if profile_id is not None:
+        q = q.filter(LogEntry.profile_id == profile_id)
+    return (
+        q.order_by(LogEntry.timestamp.desc(), LogEntry.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+def keyset_page(db, profile_id, cursor, limit):
+    return list_logs(
+        Response(),
+        profile_id=profile_id,
+        action=None,
+        status=None,
+        since=None,
+        until=None,
+        cursor=cursor,
+        limit=limit,
+        db=db,
+    )
+
+
+def timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--profiles", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--db", help="SQLAlchemy URL (default: temporary SQLite file)")
+    args = parser.parse_args()
+
+    tmp = None
+    url = args.db
+    if url is None:
+        tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False).name
+        url = f"sqlite:///{tmp}"
+    engine = create_engine(url)
+    try:
+        load_s, index_s = generate(engine, args.rows, args.profiles)
+        print(f"rows: {args.rows:,}  load {load_s:.1f}s  indexes {index_s:.1f}s")
+        db = sessionmaker(bind=engine)()
+        limit = args.page_size
+        for label, profile_id in (("all", None), ("one profile", 1)):
+            q = db.query(LogEntry)
+            if profile_id is not None:
+                q = q.filter(LogEntry.profile_id == profile_id)
+            total = q.count()
+            print(f"\n{label}: page size {limit}")
+            print(f"{'page':>10} {'offset ms':>12} {'keyset ms':>12}")
+            page = 1
+            while (page - 1) * limit < total:
+                skip = (page - 1) * limit
+                cursor = None
+                if skip:
+                    # the cursor the previous page would have returned (untimed)
+                    cursor = encode_cursor(offset_page(db, profile_id, skip - 1, 1)[0])
+                off = timed(lambda: offset_page(db, profile_id, skip, limit))
+                key = timed(lambda: keyset_page(db, profile_id, cursor, limit))
+                print(f"{page:>10,} {off:>12.2f} {key:>12.2f}")
+                page *= 10
+        db.close()
+    finally:
+        engine.dispose()
+        if tmp:
+            os.remove(tmp)
+
+
+if __name__ == "__main__":
+    main()
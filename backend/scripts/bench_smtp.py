@@ -0,0 +1,71 @@
+"""
+Compare the synchronous SMTP path (SMTPConnector.send_many, one session)
+with AsyncSMTPConnector (several concurrent sessions in one process) against
+a local sink that adds a fixed per-command latency, like a remote server.
+Reports messages per second (wall clock) and per CPU-second of the sender.
+
+    python scripts/bench_smtp.py --messages 500 --latency 0.02 --connections 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from mpm.connectors.async_smtp_connector import AsyncSMTPConnector  # noqa: E402
+from mpm.connectors.smtp_connector import SMTPConnector  # noqa: E402
+from mpm.tests.smtp_sink import SMTPSink  # noqa: E402
+
+
+def _measure(label, send, count):
+    wall, cpu = time.perf_counter(), time.process_time()
+    results = send()
+    wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+    ok = sum(r["status"] == "success" for r in results)
+    print(
+        f"{label:<22} {ok:>6}/{count} sent  {count / wall:10,.0f} msg/s"
+        f"  {count / max(cpu, 1e-9):10,.0f} msg/CPU-s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per SMTP reply")
+    parser.add_argument("--connections", type=int, default=20)
+    parser.add_argument("--per-domain", type=int, default=20)
+    args = parser.parse_args()
+
+    # The sink runs on its own thread and loop; CPU-s includes its share
+    sink = SMTPSink(latency=args.latency).start()
+    messages = [
+        {"to": f"user{i}@example{i % 10}.com", "subject": "Hi", "body": "Hello " * 50}
+        for i in range(args.messages)
+    ]
+    common = dict(host="127.0.0.1", port=sink.port, use_ssl=False, use_mailcatcher=True)
+
+    print(f"messages: {args.messages:,}  latency: {args.latency * 1000:.0f} ms/reply")
+    try:
+        _measure(
+            "sync (1 session)",
+            lambda: SMTPConnector(**common).send_many(messages),
+            args.messages,
+        )
+        conn = AsyncSMTPConnector(
+            **common,
+            max_connections=args.connections,
+            per_domain_limit=args.per_domain,
+        )
+        _measure(
+            f"async ({args.connections} sessions)",
+            lambda: asyncio.run(conn.send_many(messages)),
+            args.messages,
+        )
+    finally:
+        sink.stop()
+
+
+if __name__ == "__main__":
+    main()
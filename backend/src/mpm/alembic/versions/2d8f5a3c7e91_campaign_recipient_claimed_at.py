@@ -0,0 +1,28 @@
+"""Campaign recipient claim lease
+
+Revision ID: 2d8f5a3c7e91
+Revises: 7e2b9c4d1a06
+Create Date: 2026-10-18 15:41:09.263514
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2d8f5a3c7e91'
+down_revision: Union[str, Sequence[str], None] = '7e2b9c4d1a06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('campaign_recipients', sa.Column('claimed_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('campaign_recipients', 'claimed_at')
@@ -0,0 +1,30 @@
+"""Per-profile send rate limits
+
+Revision ID: 4b7e2d91c0a6
+Revises: 126f1defe7cf
+Create Date: 2026-10-18 13:05:12.604117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b7e2d91c0a6'
+down_revision: Union[str, Sequence[str], None] = '126f1defe7cf'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('profiles', sa.Column('rate_limit_per_hour', sa.Integer(), nullable=True))
+    op.add_column('profiles', sa.Column('rate_limit_burst', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('profiles', 'rate_limit_burst')
+    op.drop_column('profiles', 'rate_limit_per_hour')
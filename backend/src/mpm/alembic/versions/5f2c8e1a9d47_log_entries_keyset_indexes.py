@@ -0,0 +1,32 @@
+"""log_entries indexes for keyset pagination and time-range filters
+
+Revision ID: 5f2c8e1a9d47
+Revises: d3a1f6e8b245
+Create Date: 2026-10-18 16:21:05.482913
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f2c8e1a9d47'
+down_revision: Union[str, Sequence[str], None] = 'd3a1f6e8b245'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_log_entries_time', 'log_entries', ['timestamp', 'id'], unique=False)
+    op.create_index('ix_log_entries_profile_time', 'log_entries', ['profile_id', 'timestamp', 'id'], unique=False)
+    op.create_index('ix_log_entries_status_time', 'log_entries', ['status', 'timestamp', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_log_entries_status_time', table_name='log_entries')
+    op.drop_index('ix_log_entries_profile_time', table_name='log_entries')
+    op.drop_index('ix_log_entries_time', table_name='log_entries')
@@ -0,0 +1,28 @@
+"""list_entries lookup index for suppression checks
+
+Revision ID: 737ef5b10806
+Revises: ca87f68cf2ea
+Create Date: 2026-10-18 11:40:17.092415
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '737ef5b10806'
+down_revision: Union[str, Sequence[str], None] = 'ca87f68cf2ea'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_list_entries_lookup', 'list_entries', ['profile_id', 'type', sa.text('lower(value)')], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_list_entries_lookup', table_name='list_entries')
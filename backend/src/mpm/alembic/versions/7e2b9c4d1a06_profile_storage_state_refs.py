@@ -0,0 +1,90 @@
+"""profile storage states in the content-addressed state store
+
+Revision ID: 7e2b9c4d1a06
+Revises: 3c9d5a7f1b24
+Create Date: 2026-10-18 20:14:37.902215
+
+"""
+import json
+import os
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e2b9c4d1a06'
+down_revision: Union[str, Sequence[str], None] = '3c9d5a7f1b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+profiles = sa.table(
+    'profiles',
+    sa.column('id', sa.Integer),
+    sa.column('credentials', sa.JSON),
+    sa.column('cookies', sa.JSON),
+    sa.column('storage_state_ref', sa.String),
+    sa.column('storage_state_summary', sa.JSON),
+)
+
+
+def _legacy_state(creds: dict, cookies) -> Union[dict, None]:
+    """The state a profile had: its storage_state file, else its cookie snapshot."""
+    path = creds.get('storage_state_path')
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    cookies = creds.get('cookies') or cookies
+    if isinstance(cookies, str):
+        cookies = json.loads(cookies)
+    if cookies:
+        return {'cookies': cookies, 'origins': []}
+    return None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    from mpm.services.state_store import state_store, summarize
+
+    op.add_column('profiles', sa.Column('storage_state_ref', sa.String(length=64), nullable=True))
+    op.add_column('profiles', sa.Column('storage_state_summary', sa.JSON(), nullable=True))
+
+    # Move every stored state into the blob store; profiles keep the ref
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(profiles.c.id, profiles.c.credentials, profiles.c.cookies)).all()
+    for pid, creds, cookies in rows:
+        creds = creds if isinstance(creds, dict) else json.loads(creds or '{}')
+        state = _legacy_state(creds, cookies)
+        slim = {k: v for k, v in creds.items() if k not in ('cookies', 'storage_state_path')}
+        values = {'credentials': slim}
+        if state is not None:
+            values['storage_state_ref'] = state_store.put(state)
+            values['storage_state_summary'] = summarize(state)
+        conn.execute(profiles.update().where(profiles.c.id == pid).values(**values))
+
+    op.drop_column('profiles', 'cookies')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    from mpm.services.state_store import state_store
+
+    op.add_column('profiles', sa.Column('cookies', sa.JSON(), nullable=True))
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(profiles.c.id, profiles.c.credentials, profiles.c.storage_state_ref)
+        .where(profiles.c.storage_state_ref.isnot(None))
+    ).all()
+    for pid, creds, ref in rows:
+        creds = creds if isinstance(creds, dict) else json.loads(creds or '{}')
+        try:
+            cookies = state_store.get(ref).get('cookies', [])
+        except KeyError:
+            continue
+        conn.execute(
+            profiles.update().where(profiles.c.id == pid)
+            .values(credentials={**creds, 'cookies': cookies})
+        )
+    op.drop_column('profiles', 'storage_state_summary')
+    op.drop_column('profiles', 'storage_state_ref')
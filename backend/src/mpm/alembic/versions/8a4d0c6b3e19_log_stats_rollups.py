@@ -0,0 +1,44 @@
+"""log_stats_minute / log_stats_hour rollup tables
+
+Revision ID: 8a4d0c6b3e19
+Revises: 5f2c8e1a9d47
+Create Date: 2026-10-18 17:05:32.640218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4d0c6b3e19'
+down_revision: Union[str, Sequence[str], None] = '5f2c8e1a9d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('log_stats_minute',
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('profile_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket', 'profile_id', 'action', 'status')
+    )
+    op.create_table('log_stats_hour',
+    sa.Column('bucket', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('profile_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('bucket', 'profile_id', 'action', 'status')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('log_stats_hour')
+    op.drop_table('log_stats_minute')
@@ -0,0 +1,109 @@
+"""profile log retention; monthly partitions for log_entries on Postgres
+
+Revision ID: b71e4f0d2c58
+Revises: 8a4d0c6b3e19
+Create Date: 2026-10-18 18:12:44.301557
+
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b71e4f0d2c58'
+down_revision: Union[str, Sequence[str], None] = '8a4d0c6b3e19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LOG_INDEXES = {
+    'ix_log_entries_id': ['id'],
+    'ix_log_entries_time': ['timestamp', 'id'],
+    'ix_log_entries_profile_time': ['profile_id', 'timestamp', 'id'],
+    'ix_log_entries_status_time': ['status', 'timestamp', 'id'],
+}
+COLUMNS = 'id, profile_id, action, status, detail, timestamp'
+
+
+def _next_month(ts):
+    return (ts.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def _partition_log_entries() -> None:
+    conn = op.get_bind()
+    op.execute("UPDATE log_entries SET timestamp = now() WHERE timestamp IS NULL")
+    op.execute("ALTER TABLE log_entries RENAME TO log_entries_unpartitioned")
+    op.execute("ALTER TABLE log_entries_unpartitioned RENAME CONSTRAINT log_entries_pkey TO log_entries_unpartitioned_pkey")
+    for name in LOG_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER SEQUENCE log_entries_id_seq OWNED BY NONE")
+    # the partition key has to be part of the primary key
+    op.execute("""
+        CREATE TABLE log_entries (
+            id INTEGER NOT NULL DEFAULT nextval('log_entries_id_seq'),
+            profile_id INTEGER NOT NULL REFERENCES profiles (id),
+            action VARCHAR NOT NULL,
+            status VARCHAR NOT NULL,
+            detail TEXT,
+            timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+    op.execute("ALTER SEQUENCE log_entries_id_seq OWNED BY log_entries.id")
+
+    # monthly partitions from the oldest row to two months ahead
+    now = datetime.now(timezone.utc)
+    oldest = conn.execute(sa.text("SELECT min(timestamp) FROM log_entries_unpartitioned")).scalar()
+    month = (oldest or now).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = _next_month(_next_month(now.replace(day=1)))
+    while month <= last:
+        end = _next_month(month)
+        op.execute(
+            f"CREATE TABLE log_entries_y{month.year:04d}m{month.month:02d} PARTITION OF log_entries "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+        )
+        month = end
+    op.execute("CREATE TABLE log_entries_default PARTITION OF log_entries DEFAULT")
+
+    op.execute(f"INSERT INTO log_entries ({COLUMNS}) SELECT {COLUMNS} FROM log_entries_unpartitioned")
+    op.execute("DROP TABLE log_entries_unpartitioned")
+    for name, columns in LOG_INDEXES.items():
+        op.create_index(name, 'log_entries', columns, unique=False)
+
+
+def _unpartition_log_entries() -> None:
+    op.execute("ALTER TABLE log_entries RENAME TO log_entries_partitioned")
+    for name in LOG_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+    op.execute("ALTER SEQUENCE log_entries_id_seq OWNED BY NONE")
+    op.execute("""
+        CREATE TABLE log_entries (
+            id INTEGER NOT NULL DEFAULT nextval('log_entries_id_seq') PRIMARY KEY,
+            profile_id INTEGER NOT NULL REFERENCES profiles (id),
+            action VARCHAR NOT NULL,
+            status VARCHAR NOT NULL,
+            detail TEXT,
+            timestamp TIMESTAMP WITH TIME ZONE DEFAULT now()
+        )
+    """)
+    op.execute("ALTER SEQUENCE log_entries_id_seq OWNED BY log_entries.id")
+    op.execute(f"INSERT INTO log_entries ({COLUMNS}) SELECT {COLUMNS} FROM log_entries_partitioned")
+    op.execute("DROP TABLE log_entries_partitioned CASCADE")
+    for name, columns in LOG_INDEXES.items():
+        op.create_index(name, 'log_entries', columns, unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('profiles', sa.Column('log_retention_days', sa.Integer(), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition_log_entries()
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        _unpartition_log_entries()
+    op.drop_column('profiles', 'log_retention_days')
@@ -0,0 +1,54 @@
+"""Background list import jobs
+
+Revision ID: ca87f68cf2ea
+Revises: e9dbf43aff97
+Create Date: 2026-10-18 10:02:51.774210
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ca87f68cf2ea'
+down_revision: Union[str, Sequence[str], None] = 'e9dbf43aff97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('import_jobs',
+    sa.Column('id', sa.String(), nullable=False),
+    sa.Column('filename', sa.String(), nullable=True),
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('bytes_total', sa.Integer(), nullable=False),
+    sa.Column('bytes_processed', sa.Integer(), nullable=False),
+    sa.Column('inserted', sa.Integer(), nullable=False),
+    sa.Column('skipped', sa.Integer(), nullable=False),
+    sa.Column('errors', sa.JSON(), nullable=True),
+    sa.Column('detail', sa.Text(), nullable=True),
+    sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+    sa.Column('rollback_on_cancel', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.add_column('list_entries', sa.Column('import_job_id', sa.String(), nullable=True))
+    op.create_index(op.f('ix_list_entries_import_job_id'), 'list_entries', ['import_job_id'], unique=False)
+    # SQLite can't add a constraint to an existing table
+    if op.get_bind().dialect.name != 'sqlite':
+        op.create_foreign_key('fk_list_entries_import_job_id', 'list_entries', 'import_jobs', ['import_job_id'], ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        op.drop_constraint('fk_list_entries_import_job_id', 'list_entries', type_='foreignkey')
+    op.drop_index(op.f('ix_list_entries_import_job_id'), table_name='list_entries')
+    op.drop_column('list_entries', 'import_job_id')
+    op.drop_table('import_jobs')
@@ -0,0 +1,28 @@
+"""Campaign run delay distribution
+
+Revision ID: d3a1f6e8b245
+Revises: 4b7e2d91c0a6
+Create Date: 2026-10-18 14:02:47.119305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a1f6e8b245'
+down_revision: Union[str, Sequence[str], None] = '4b7e2d91c0a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('campaign_runs', sa.Column('delay_distribution', sa.String(), server_default='uniform', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('campaign_runs', 'delay_distribution')
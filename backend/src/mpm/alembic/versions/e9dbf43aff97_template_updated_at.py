@@ -0,0 +1,28 @@
+"""Template updated_at for compiled-template cache keys
+
+Revision ID: e9dbf43aff97
+Revises: c56faaa235fd
+Create Date: 2026-10-18 09:12:04.318211
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9dbf43aff97'
+down_revision: Union[str, Sequence[str], None] = 'c56faaa235fd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('templates', sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('templates', 'updated_at')
@@ -0,0 +1,187 @@
+import asyncio
+import ssl
+from email.message import EmailMessage
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import aiosmtplib
+
+from mpm.connectors.smtp_connector import build_message, send_result
+from mpm.services.mx_cache import recipient_domain
+
+
+class AsyncSMTPConnector:
+    """
+    asyncio counterpart of SMTPConnector (same constructor and result
+    format). `send_many` keeps up to `max_connections` SMTP sessions open at
+    once and spreads the messages over them, so one worker process overlaps
+    many network round trips. At most `per_domain_limit` transactions to the
+    same recipient domain (or the same "slot", when messages name one) are
+    in progress at a time.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        user: Optional[str] = None,
+        port: int = 587,
+        password: Optional[str] = None,
+        use_ssl: bool = True,
+        use_mailcatcher: bool = False,
+        max_connections: int = 10,
+        per_domain_limit: int = 5,
+        max_messages: int = 100,
+        timeout: float = 30.0,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_ssl = use_ssl
+        self.use_mailcatcher = use_mailcatcher
+        self.max_connections = max(1, max_connections)
+        self.per_domain_limit = max(1, per_domain_limit)
+        # Sessions are replaced after this many messages, like SMTPSessionPool
+        self.max_messages = max_messages
+        self.timeout = timeout
+
+    def build_message(self, to_address: str, subject: str, body: str) -> EmailMessage:
+        return build_message(self.user, to_address, subject, body)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        # MailCatcher: plaintext SMTP, no auth
+        if self.use_mailcatcher:
+            smtp = aiosmtplib.SMTP(
+                hostname=self.host,
+                port=self.port,
+                use_tls=False,
+                start_tls=False,
+                timeout=self.timeout,
+            )
+            await smtp.connect()
+            return smtp
+        if not self.use_ssl:
+            raise ValueError("user login and password are required")
+        smtp = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            use_tls=True,
+            tls_context=ssl.create_default_context(),
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        if self.user and self.password:
+            await smtp.login(self.user, self.password)
+        return smtp
+
+    @staticmethod
+    async def _close(smtp: Optional[aiosmtplib.SMTP]) -> None:
+        if smtp is None:
+            return
+        try:
+            await smtp.quit()
+        except Exception:
+            smtp.close()
+
+    async def send_email(self, to_address: str, subject: str, body: str):
+        msg = self.build_message(to_address, subject, body)
+        smtp = await self._connect()
+        try:
+            return await smtp.send_message(msg)
+        finally:
+            await self._close(smtp)
+
+    async def send_many(
+        self,
+        messages: Iterable[Mapping[str, str]],
+        slots: Optional[Mapping[str, int]] = None,
+    ) -> List[dict]:
+        """
+        Send rendered messages (`{"to", "subject", "body"}` dicts, with an
+        optional "slot" grouping them in place of the recipient domain)
+        concurrently. `slots` lowers the concurrent transactions allowed per
+        group, e.g. to the domain leases the caller holds. Returns one
+        result per message, in input order, with the same
+        `{"to", "status", "code", "detail"}` shape as SMTPConnector.send_many.
+        A dropped connection is re-opened and the message retried once.
+        """
+        messages = list(messages)
+        slots = slots or {}
+        semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        def group_slot(item: Mapping[str, str]) -> asyncio.Semaphore:
+            group = item.get("slot") or recipient_domain(item["to"])
+            if group not in semaphores:
+                limit = min(self.per_domain_limit, slots.get(group, self.per_domain_limit))
+                semaphores[group] = asyncio.Semaphore(max(1, limit))
+            return semaphores[group]
+        results: List[Optional[dict]] = [None] * len(messages)
+        queue: asyncio.Queue = asyncio.Queue()
+        for i in range(len(messages)):
+            queue.put_nowait(i)
+
+        async def worker():
+            smtp, sent = None, 0
+            try:
+                while not queue.empty():
+                    i = queue.get_nowait()
+                    item = messages[i]
+                    to_address = item["to"]
+                    msg = self.build_message(to_address, item.get("subject", ""), item["body"])
+                    for attempt in range(2):
+                        if smtp is None:
+                            try:
+                                smtp, sent = await self._connect(), 0
+                            except (aiosmtplib.SMTPException, OSError) as e:
+                                # Can't (re)connect: fail what this worker
+                                # holds and stop; the other sessions go on
+                                results[i] = send_result(to_address, "error", None, str(e))
+                                return
+                        try:
+                            async with group_slot(item):
+                                errors, _ = await smtp.send_message(msg)
+                        except aiosmtplib.SMTPRecipientsRefused as e:
+                            refused = e.recipients[0] if e.recipients else None
+                            results[i] = send_result(
+                                to_address,
+                                "refused",
+                                getattr(refused, "code", None),
+                                getattr(refused, "message", str(e)),
+                            )
+                        except aiosmtplib.SMTPServerDisconnected as e:
+                            smtp.close()
+                            smtp = None
+                            if attempt:
+                                results[i] = send_result(to_address, "error", None, str(e))
+                                break
+                            continue
+                        except aiosmtplib.SMTPResponseException as e:
+                            results[i] = send_result(to_address, "error", e.code, e.message)
+                        except (aiosmtplib.SMTPException, OSError) as e:
+                            smtp.close()
+                            smtp = None
+                            if attempt:
+                                results[i] = send_result(to_address, "error", None, str(e))
+                                break
+                            continue
+                        else:
+                            sent += 1
+                            if errors:
+                                code, resp = next(iter(errors.values()))
+                                results[i] = send_result(to_address, "refused", code, resp)
+                            else:
+                                results[i] = send_result(to_address, "success", 250, None)
+                        break
+                    if smtp is not None and sent >= self.max_messages:
+                        await self._close(smtp)
+                        smtp = None
+            finally:
+                await self._close(smtp)
+
+        workers = min(self.max_connections, len(messages))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+        # Anything left over means every session failed to connect
+        for i, r in enumerate(results):
+            if r is None:
+                results[i] = send_result(messages[i]["to"], "error", None, "no SMTP connection")
+        return results
@@ -1,26 +1,101 @@
-from playwright.sync_api import sync_playwright
+import asyncio
 import json
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from mpm.services.browser_pool import browser_pool
+
+# Seconds between cookie jar checks while waiting for a login cookie
+COOKIE_POLL_INTERVAL = 0.5
+
+
+@dataclass
+class LoginCompletion:
+    """
+    What marks a manual login as finished; the first condition met wins.
+    `url_pattern` is a regex searched in the page URL, `selector` a selector
+    that appears on the page, `cookie` the name of a cookie that gets set.
+    With none of them set, navigating away from the login URL counts.
+    """
+
+    url_pattern: Optional[str] = None
+    selector: Optional[str] = None
+    cookie: Optional[str] = None
+
+
+async def _cookie_set(context, name: str) -> None:
+    while not any(c["name"] == name for c in await context.cookies()):
+        await asyncio.sleep(COOKIE_POLL_INTERVAL)
+
+
+async def wait_for_login(
+    page, timeout_ms: int, completion: Optional[LoginCompletion] = None
+) -> bool:
+    """
+    Wait for `completion` (see LoginCompletion) for at most `timeout_ms`;
+    returns False on timeout.
+    """
+    completion = completion or LoginCompletion()
+    timeout = timeout_ms / 1000
+    waits = []
+    if completion.url_pattern:
+        pattern = re.compile(completion.url_pattern)
+        waits.append(
+            page.wait_for_url(lambda url: bool(pattern.search(url)), timeout=timeout_ms)
+        )
+    if completion.selector:
+        waits.append(
+            page.wait_for_selector(completion.selector, state="attached", timeout=timeout_ms)
+        )
+    if completion.cookie:
+        waits.append(asyncio.wait_for(_cookie_set(page.context, completion.cookie), timeout))
+    if not waits:
+        start_url = page.url
+        waits.append(page.wait_for_url(lambda url: url != start_url, timeout=timeout_ms))
+
+    pending = {asyncio.ensure_future(w) for w in waits}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if any(t.exception() is None for t in done):
+                return True
+        return False
+    finally:
+        for t in pending:
+            t.cancel()
+
 
 class PlaywrightAuth:
     def __init__(self, headless: bool = False):
         self.headless = headless
 
-    def login(self, login_url: str) -> str:
+    def login(
+        self,
+        login_url: str,
+        completion: Optional[LoginCompletion] = None,
+        max_wait_ms: int = 120_000,
+    ) -> str:
         """
         Opens a browser window, navigates to `login_url`,
         waits for the user to complete login, then captures cookies.
         Returns JSON-encoded cookies string.
         """
-        playwright = sync_playwright().start()
-        browser = playwright.chromium.launch(headless=self.headless)
-        context = browser.new_context()
-        page = context.new_page()
-        page.goto(login_url)
-
-        # Wait up to 2 minutes for manual login
-        page.wait_for_timeout(120_000)
-
-        cookies = context.cookies()
-        browser.close()
-        playwright.stop()
-        return json.dumps(cookies)
+        return browser_pool.run(self.login_async(login_url, completion, max_wait_ms))["cookies"]
+
+    async def login_async(
+        self,
+        login_url: str,
+        completion: Optional[LoginCompletion] = None,
+        max_wait_ms: int = 120_000,
+    ) -> dict:
+        """
+        Returns as soon as `completion` is met; after `max_wait_ms` whatever
+        cookies exist are returned anyway. Returns {cookies (JSON string), logged_in}.
+        """
+        async with browser_pool.context(headless=self.headless) as context:
+            page = await context.new_page()
+            await page.goto(login_url)
+            logged_in = await wait_for_login(page, max_wait_ms, completion)
+            cookies = await context.cookies()
+        return {"cookies": json.dumps(cookies), "logged_in": logged_in}
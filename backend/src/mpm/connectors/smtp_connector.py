@@ -1,7 +1,9 @@
 import smtplib
 import ssl
 from email.message import EmailMessage
-from typing import Optional
+from typing import Iterable, List, Mapping, Optional
+
+from mpm.connectors.smtp_pool import SMTPSessionPool
 
 
 class SMTPConnector:
@@ -13,6 +15,7 @@ class SMTPConnector:
         password: Optional[str] = None,
         use_ssl: bool = True,
         use_mailcatcher: bool = False,
+        pool: Optional[SMTPSessionPool] = None,
     ):
         self.host = host
         self.port = port
@@ -20,13 +23,18 @@ class SMTPConnector:
         self.password = password
         self.use_ssl = use_ssl
         self.use_mailcatcher = use_mailcatcher
+        # When set, connections are borrowed from (and returned to) the pool
+        # instead of being opened and closed for every message.
+        self.pool = pool
+
+    def build_message(self, to_address: str, subject: str, body: str) -> EmailMessage:
+        return build_message(self.user, to_address, subject, body)
 
     def send_email(self, to_address: str, subject: str, body: str):
-        msg = EmailMessage()
-        msg["From"] = self.user or "no-reply@example.com"
-        msg["To"] = to_address
-        msg["Subject"] = subject
-        msg.set_content(body)
+        msg = self.build_message(to_address, subject, body)
+
+        if self.pool is not None:
+            return self._send_pooled(msg)
 
         # MailCatcher: plaintext SMTP, no auth
         if self.use_mailcatcher:
@@ -45,3 +53,127 @@ class SMTPConnector:
         else:
             raise ValueError("user login and password are required")
 
+    def _pool_session(self):
+        assert self.pool is not None
+        return self.pool.session(
+            self.host,
+            self.port,
+            user=self.user,
+            password=self.password,
+            use_ssl=self.use_ssl,
+            use_mailcatcher=self.use_mailcatcher,
+        )
+
+    def _send_pooled(self, msg: EmailMessage):
+        # A pooled connection can still be dropped by the server between the
+        # NOOP check and the send; retry once on a fresh connection.
+        for attempt in range(2):
+            try:
+                with self._pool_session() as session:
+                    refused = session.server.send_message(msg)
+                    session.sent += 1
+                    return refused
+            except smtplib.SMTPServerDisconnected:
+                if attempt:
+                    raise
+
+    def send_many(self, messages: Iterable[Mapping[str, str]]) -> List[dict]:
+        """
+        Send a chunk of rendered messages (`{"to", "subject", "body"}` dicts)
+        through one authenticated session. Returns one result per message:
+        `{"to", "status", "code", "detail"}` where status is "success",
+        "refused" (the server rejected the recipient) or "error".
+        A dropped connection is re-opened and the message retried once.
+        """
+        # Without a shared pool, use a private one that closes on release
+        pool = self.pool or SMTPSessionPool(max_idle_per_key=0)
+        key = (self.host, self.port, self.user, self.use_ssl, self.use_mailcatcher)
+        results: List[dict] = []
+        session = None
+        try:
+            it = iter(messages)
+            for item in it:
+                to_address = item["to"]
+                msg = self.build_message(to_address, item.get("subject", ""), item["body"])
+                for attempt in range(2):
+                    if session is None:
+                        try:
+                            session = pool.acquire(
+                                self.host,
+                                self.port,
+                                user=self.user,
+                                password=self.password,
+                                use_ssl=self.use_ssl,
+                                use_mailcatcher=self.use_mailcatcher,
+                            )
+                        except (smtplib.SMTPException, OSError) as e:
+                            # Can't (re)connect: fail this and all remaining
+                            # messages instead of hammering the server
+                            results.append(send_result(to_address, "error", None, str(e)))
+                            results.extend(
+                                send_result(m["to"], "error", None, str(e)) for m in it
+                            )
+                            return results
+                    try:
+                        refused = session.server.send_message(msg)
+                    except smtplib.SMTPRecipientsRefused as e:
+                        code, resp = next(iter(e.recipients.values()), (None, b""))
+                        results.append(send_result(to_address, "refused", code, resp))
+                    except smtplib.SMTPResponseException as e:
+                        results.append(
+                            send_result(to_address, "error", e.smtp_code, e.smtp_error)
+                        )
+                    except OSError as e:
+                        # SMTPServerDisconnected or a socket error: the
+                        # connection is unusable, retry once on a new one
+                        pool.release(key, session, broken=True)
+                        session = None
+                        if attempt:
+                            results.append(send_result(to_address, "error", None, str(e)))
+                            break
+                        continue
+                    else:
+                        session.sent += 1
+                        if refused:
+                            code, resp = next(iter(refused.values()))
+                            results.append(send_result(to_address, "refused", code, resp))
+                        else:
+                            results.append(send_result(to_address, "success", 250, None))
+                    break
+
+                # Rotate connections that hit the per-connection message cap
+                if session is not None and session.sent >= pool.max_messages:
+                    pool.release(key, session)
+                    session = None
+        finally:
+            if session is not None:
+                pool.release(key, session)
+        return results
+
+
+def smtp_error_code(e: Exception) -> Optional[int]:
+    """The SMTP reply code carried by an smtplib exception, if any."""
+    if isinstance(e, smtplib.SMTPRecipientsRefused):
+        code, _ = next(iter(e.recipients.values()), (None, b""))
+        return code
+    if isinstance(e, smtplib.SMTPResponseException):
+        return e.smtp_code
+    return None
+
+
+def build_message(
+    from_address: Optional[str], to_address: str, subject: str, body: str
+) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = from_address or "no-reply@example.com"
+    msg["To"] = to_address
+    msg["Subject"] = subject
+    msg.set_content(body)
+    return msg
+
+
+def send_result(to_address: str, status: str, code: Optional[int], detail) -> dict:
+    """One entry of a `send_many` result list (shared with AsyncSMTPConnector)."""
+    if isinstance(detail, bytes):
+        detail = detail.decode("utf-8", errors="replace")
+    return {"to": to_address, "status": status, "code": code, "detail": detail}
@@ -0,0 +1,200 @@
+import smtplib
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# (host, port, user, use_ssl, use_mailcatcher)
+PoolKey = Tuple[str, int, Optional[str], bool, bool]
+
+
+@dataclass
+class PooledSession:
+    """An authenticated SMTP connection plus the bookkeeping the pool needs."""
+
+    server: smtplib.SMTP
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    sent: int = 0
+
+
+class SMTPSessionPool:
+    """
+    Keeps authenticated SMTP connections alive between sends, one idle stack
+    per profile (host/port/user). A connection is checked with NOOP before it
+    is handed out, discarded when it has been idle for longer than `max_idle`
+    seconds or has carried `max_messages` messages, and replaced transparently
+    when the server has dropped it.
+
+    The pool is thread-safe; a single module-level instance (`smtp_pool`) is
+    shared by every task running in the same Celery worker process.
+    """
+
+    def __init__(
+        self,
+        max_idle: float = 60.0,
+        max_messages: int = 100,
+        max_idle_per_key: int = 2,
+        timeout: float = 30.0,
+        factory: Optional[Callable[..., smtplib.SMTP]] = None,
+    ):
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self.max_idle_per_key = max_idle_per_key
+        self.timeout = timeout
+        self._factory = factory
+        self._idle: Dict[PoolKey, List[PooledSession]] = {}
+        self._lock = threading.Lock()
+
+    # -- connection lifecycle -------------------------------------------------
+
+    def _connect(
+        self,
+        host: str,
+        port: int,
+        user: Optional[str],
+        password: Optional[str],
+        use_ssl: bool,
+        use_mailcatcher: bool,
+    ) -> smtplib.SMTP:
+        if self._factory is not None:
+            return self._factory(
+                host=host,
+                port=port,
+                user=user,
+                password=password,
+                use_ssl=use_ssl,
+                use_mailcatcher=use_mailcatcher,
+            )
+
+        # MailCatcher: plaintext SMTP, no auth
+        if use_mailcatcher:
+            return smtplib.SMTP(host, port, timeout=self.timeout)
+
+        if not use_ssl:
+            raise ValueError("user login and password are required")
+
+        context = ssl.create_default_context()
+        server = smtplib.SMTP_SSL(host, port, context=context, timeout=self.timeout)
+        if user and password:
+            try:
+                server.login(user, password)
+            except Exception:
+                self._close(server)
+                raise
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _is_alive(self, session: PooledSession) -> bool:
+        try:
+            code, _ = session.server.noop()
+        except (smtplib.SMTPException, OSError):
+            return False
+        return code == 250
+
+    # -- public API -----------------------------------------------------------
+
+    def acquire(
+        self,
+        host: str,
+        port: int,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        use_ssl: bool = True,
+        use_mailcatcher: bool = False,
+    ) -> PooledSession:
+        """Return a live session for the given profile, opening one if needed."""
+        key: PoolKey = (host, port, user, use_ssl, use_mailcatcher)
+        now = time.monotonic()
+        while True:
+            with self._lock:
+                stack = self._idle.get(key)
+                session = stack.pop() if stack else None
+            if session is None:
+                break
+            if now - session.last_used > self.max_idle or not self._is_alive(session):
+                self._close(session.server)
+                continue
+            return session
+
+        server = self._connect(host, port, user, password, use_ssl, use_mailcatcher)
+        return PooledSession(server=server)
+
+    def release(self, key: PoolKey, session: PooledSession, broken: bool = False):
+        """Hand a session back; it is closed if broken or past its limits."""
+        session.last_used = time.monotonic()
+        if broken or session.sent >= self.max_messages:
+            self._close(session.server)
+            return
+        with self._lock:
+            stack = self._idle.setdefault(key, [])
+            if len(stack) < self.max_idle_per_key:
+                stack.append(session)
+                return
+        self._close(session.server)
+
+    @contextmanager
+    def session(
+        self,
+        host: str,
+        port: int,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        use_ssl: bool = True,
+        use_mailcatcher: bool = False,
+    ) -> Iterator[PooledSession]:
+        """
+        Context manager around acquire/release. A connection that raised an
+        SMTP or socket error is not returned to the pool.
+        """
+        key: PoolKey = (host, port, user, use_ssl, use_mailcatcher)
+        session = self.acquire(host, port, user, password, use_ssl, use_mailcatcher)
+        broken = False
+        try:
+            yield session
+        except smtplib.SMTPServerDisconnected:
+            broken = True
+            raise
+        except smtplib.SMTPException:
+            # Protocol-level refusals leave the connection usable
+            raise
+        except OSError:
+            broken = True
+            raise
+        finally:
+            self.release(key, session, broken=broken)
+
+    def prune(self) -> int:
+        """Close idle connections past `max_idle`. Returns how many were closed."""
+        now = time.monotonic()
+        stale: List[PooledSession] = []
+        with self._lock:
+            for key, stack in self._idle.items():
+                keep = [s for s in stack if now - s.last_used <= self.max_idle]
+                stale.extend(s for s in stack if now - s.last_used > self.max_idle)
+                self._idle[key] = keep
+        for s in stale:
+            self._close(s.server)
+        return len(stale)
+
+    def close_all(self) -> None:
+        with self._lock:
+            sessions = [s for stack in self._idle.values() for s in stack]
+            self._idle.clear()
+        for s in sessions:
+            self._close(s.server)
+
+    def idle_count(self) -> int:
+        with self._lock:
+            return sum(len(stack) for stack in self._idle.values())
@@ -1,11 +1,18 @@
+import asyncio
 import logging
 import os
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from mpm.routers import profile, template, list_manager, logs, automation
+from mpm.routers import profile, template, list_manager, logs, automation, campaign, domains, events
 from pydantic import BaseModel
 from mpm.connectors.smtp_connector import SMTPConnector
-from mpm.connectors.playwright_auth import PlaywrightAuth
+from mpm.connectors.playwright_auth import LoginCompletion, PlaywrightAuth
+from mpm.routers.automation import job_accepted
+import mpm.schemas as schemas
+from mpm.database import SessionLocal
+from mpm.services import automation_jobs
 from dotenv import load_dotenv
 
 # Logging setup
@@ -17,7 +24,19 @@ logger = logging.getLogger(__name__)
 
 load_dotenv(__file__ + "../../.env")  # loads .env into os.environ
 
-app = FastAPI(title="Multi-Profile Messaging")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Jobs left queued/running by a previous process never finish on their own
+    db = SessionLocal()
+    try:
+        automation_jobs.reap(db)
+    finally:
+        db.close()
+    yield
+
+
+app = FastAPI(title="Multi-Profile Messaging", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,6 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Initialize SMTP connector from env
@@ -47,30 +67,51 @@ class EmailRequest(BaseModel):
     body: str
 
 
-@app.post("/api/test-email")
-def test_email(req: EmailRequest):
+async def _send_test_email(req: EmailRequest) -> dict:
     try:
-        smtp.send_email(req.to_address, req.subject, req.body)
+        await asyncio.to_thread(smtp.send_email, req.to_address, req.subject, req.body)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Email send failed: {e}")
+        raise RuntimeError(f"Email send failed: {e}") from e
     return {"status": "sent"}
 
 
+@app.post("/api/test-email")
+def test_email(req: EmailRequest):
+    """Send in the background; poll GET /automation/jobs/{job_id}."""
+    job_id = automation_jobs.start(
+        "test_email", _send_test_email(req), params={"to_address": req.to_address}
+    )
+    return job_accepted(job_id)
+
+
 class AuthRequest(BaseModel):
     login_url: str
+    # when the login is done; max_wait_ms is only the timeout
+    completion: Optional[schemas.LoginCompletion] = None
+    max_wait_ms: int = 120_000
+
+
+async def _telegram_login(req: AuthRequest) -> dict:
+    try:
+        completion = LoginCompletion(**req.completion.model_dump()) if req.completion else None
+        return await play_auth.login_async(req.login_url, completion, req.max_wait_ms)
+    except Exception as e:
+        raise RuntimeError(f"Playwright auth failed: {e}") from e
 
 
 @app.post("/api/telegram/login")
 def telegram_login(req: AuthRequest):
     """
-    Launches a browser for the user to log into Telegram’s web interface
-    and returns the cookies JSON.
+    Launches a browser for the user to log into Telegram’s web interface.
+    Returns a job id at once; the finished job's result holds the cookies JSON.
     """
-    try:
-        cookies_json = play_auth.login(req.login_url)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Playwright auth failed: {e}")
-    return {"cookies": cookies_json}
+    job_id = automation_jobs.start(
+        "telegram_login",
+        _telegram_login(req),
+        params={"login_url": req.login_url},
+        max_wait=req.max_wait_ms / 1000,
+    )
+    return job_accepted(job_id)
 
 
 # existing endpoints...
@@ -78,5 +119,8 @@ app.include_router(profile.router)
 app.include_router(template.router)
 app.include_router(list_manager.router)
 app.include_router(logs.router)
+app.include_router(campaign.router)
+app.include_router(domains.router)
+app.include_router(events.router)
 
 app.include_router(automation.router)
@@ -1,12 +1,15 @@
 from datetime import datetime, timezone
 from sqlalchemy import (
+    Boolean,
     Column,
     Integer,
     String,
     Text,
     DateTime,
     Enum,
+    Float,
     ForeignKey,
+    Index,
     JSON,
 )
 from sqlalchemy.sql import func
@@ -29,15 +32,22 @@ class Profile(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, index=True)
     platform = Column(Enum(PlatformEnum), nullable=False)
-    credentials = Column(JSON, nullable=False)  # tokens, cookies, SMTP creds, etc.
+    credentials = Column(JSON, nullable=False)  # tokens, SMTP creds, user agent, etc.
     proxy = Column(String, nullable=True)
+    # Send rate shared by all workers; NULL uses SEND_RATE_PER_HOUR / SEND_RATE_BURST
+    rate_limit_per_hour = Column(Integer, nullable=True)
+    rate_limit_burst = Column(Integer, nullable=True)
+    # Days of send logs kept; NULL uses LOG_RETENTION_DAYS (see services.log_retention)
+    log_retention_days = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True),
         default=datetime.now(timezone.utc),
         onupdate=datetime.now(timezone.utc),
     )
-    cookies = Column(JSON, nullable=True)
+    # Browser storage state (cookies + localStorage) in services.state_store
+    storage_state_ref = Column(String(64), nullable=True)
+    storage_state_summary = Column(JSON, nullable=True)
 
 
 class Template(Base):
@@ -47,6 +57,13 @@ class Template(Base):
     subject = Column(String, nullable=True)  # for email
     body = Column(Text, nullable=False)  # message text with variables
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Part of the compiled-template cache key; set client-side so that
+    # edits within the same second still get a distinct value
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
 
 
 class ListEntry(Base):
@@ -55,9 +72,117 @@ class ListEntry(Base):
     profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False)
     type = Column(Enum(ListTypeEnum), nullable=False)
     value = Column(String, nullable=False)  # e.g. user id, email address
+    # set for rows created by a background bulk import (see ImportJob)
+    import_job_id = Column(
+        String, ForeignKey("import_jobs.id"), nullable=True, index=True
+    )
+
+
+# membership lookups (bloom-filter confirms, delete checks)
+Index(
+    "ix_list_entries_lookup",
+    ListEntry.profile_id,
+    ListEntry.type,
+    func.lower(ListEntry.value),
+)
+
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    id = Column(String, primary_key=True)  # uuid4 hex
+    filename = Column(String, nullable=True)
+    path = Column(String, nullable=False)  # spooled upload on disk
+    status = Column(String, nullable=False, default="queued")
+    # queued / running / completed / failed / cancelled
+    bytes_total = Column(Integer, nullable=False, default=0)
+    bytes_processed = Column(Integer, nullable=False, default=0)
+    inserted = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    errors = Column(JSON, nullable=True)  # [{line, error}, ...] (capped)
+    detail = Column(Text, nullable=True)  # failure reason
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    rollback_on_cancel = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class AutomationJob(Base):
+    """A background Playwright job over many profiles (e.g. a bulk cookie refresh)."""
+
+    __tablename__ = "automation_jobs"
+    id = Column(String, primary_key=True)  # uuid4 hex
+    kind = Column(String, nullable=False)  # "cookie_refresh"
+    status = Column(String, nullable=False, default="queued")
+    # queued / running / completed / failed
+    params = Column(JSON, nullable=True)  # profile filter, concurrency caps
+    total = Column(Integer, nullable=False, default=0)
+    succeeded = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    results = Column(JSON, nullable=True)  # [{profile_id, status, detail}, ...]
+    detail = Column(Text, nullable=True)  # failure reason
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class CampaignRun(Base):
+    """
+    One campaign send for a profile. Recipients live in campaign_recipients;
+    `cursor` is the next position to hand out, and at most `window`
+    recipients are queued on the broker at any time.
+    """
+
+    __tablename__ = "campaign_runs"
+    id = Column(Integer, primary_key=True, index=True)
+    profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False, index=True)
+    template_id = Column(Integer, ForeignKey("templates.id"), nullable=False)
+    status = Column(String, nullable=False, default="running")
+    # running / paused / stopped / completed
+    total = Column(Integer, nullable=False, default=0)
+    cursor = Column(Integer, nullable=False, default=0)
+    in_flight = Column(Integer, nullable=False, default=0)
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    suppressed = Column(Integer, nullable=False, default=0)
+    window = Column(Integer, nullable=False, default=50)
+    batch_size = Column(Integer, nullable=False, default=1)
+    min_delay = Column(Float, nullable=False, default=1.0)
+    max_delay = Column(Float, nullable=False, default=5.0)
+    # name in services.scheduler.DISTRIBUTIONS
+    delay_distribution = Column(String, nullable=False, default="uniform")
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class CampaignRecipient(Base):
+    __tablename__ = "campaign_recipients"
+    __table_args__ = (
+        Index("ix_campaign_recipients_run_position", "run_id", "position", unique=True),
+    )
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, ForeignKey("campaign_runs.id"), nullable=False)
+    position = Column(Integer, nullable=False)
+    recipient = Column(String, nullable=False)
+    context = Column(JSON, nullable=True)
+    status = Column(String, nullable=False, default="pending")
+    # pending / queued / sent / error / suppressed / cancelled
+    # bumped every time the recipient is queued; a task only sends if its
+    # attempt still matches, so re-queued work after a resume never doubles up
+    attempt = Column(Integer, nullable=False, default=0)
+    # set when queued and renewed when the send starts; see campaign.resume
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+    detail = Column(Text, nullable=True)
 
 
 class LogEntry(Base):
+    # On Postgres the table is range-partitioned by month on timestamp, with
+    # (id, timestamp) as primary key; see services.log_retention
     __tablename__ = "log_entries"
     id = Column(Integer, primary_key=True, index=True)
     profile_id = Column(Integer, ForeignKey("profiles.id"), nullable=False)
@@ -65,3 +190,32 @@ class LogEntry(Base):
     status = Column(String, nullable=False)  # "success" / "error"
     detail = Column(Text, nullable=True)  # error message or extra info
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+
+    # keyset pagination on (timestamp, id), newest first; see routers.logs
+    __table_args__ = (
+        Index("ix_log_entries_time", "timestamp", "id"),
+        Index("ix_log_entries_profile_time", "profile_id", "timestamp", "id"),
+        Index("ix_log_entries_status_time", "status", "timestamp", "id"),
+    )
+
+
+class LogStatMinute(Base):
+    """LogEntry counts per minute; maintained by services.log_stats."""
+
+    __tablename__ = "log_stats_minute"
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # start of the minute, UTC
+    profile_id = Column(Integer, primary_key=True)
+    action = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class LogStatHour(Base):
+    """LogEntry counts per hour; maintained by services.log_stats."""
+
+    __tablename__ = "log_stats_hour"
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # start of the hour, UTC
+    profile_id = Column(Integer, primary_key=True)
+    action = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
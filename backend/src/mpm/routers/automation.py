@@ -1,14 +1,27 @@
 # backend/routers/automation.py
 from __future__ import annotations
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel, ConfigDict
+import asyncio
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ConfigDict, Field
 from sqlalchemy.orm import Session
 from mpm.database import SessionLocal
 import mpm.models as models
+import mpm.schemas as schemas
+from mpm.connectors.playwright_auth import LoginCompletion
 from mpm.connectors.playwright_automation import PlaywrightAutomation
+from mpm.services import automation_jobs, cookie_refresh
+from mpm.services.state_store import profile_state, set_profile_state
+from mpm.tasks import cookie_refresh_task
 
 router = APIRouter(prefix="/automation", tags=["automation"])
 
+# Seconds between job status reads while long-polling
+JOB_POLL_INTERVAL = 0.5
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -22,6 +35,8 @@ class CaptureReq(BaseModel):
     login_url: str
     max_wait_ms: int = 120_000
     headless: bool = False
+    # when the login is done; max_wait_ms is only the timeout
+    completion: schemas.LoginCompletion | None = None
 
 
 class RefreshReq(BaseModel):
@@ -29,42 +44,87 @@ class RefreshReq(BaseModel):
     headless: bool = True
 
 
+class BulkRefreshReq(BaseModel):
+    # all Telegram profiles when both filters are empty
+    profile_ids: list[int] | None = None
+    proxy: str | None = None
+    concurrency: int | None = Field(None, gt=0)
+    per_proxy: int | None = Field(None, gt=0)
+
+
 class CookieResp(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     cookies: list
     user_agent: str | None = None
-    storage_state_path: str | None = None
+    storage_state_ref: str | None = None
+    storage_state_summary: dict | None = None
+
 
+def job_accepted(job_id: str) -> JSONResponse:
+    """202 with the id of a job that was just queued."""
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"job_id": job_id, "status": "queued"},
+    )
 
-@router.post("/cookies/capture", response_model=CookieResp)
+
+def _store_capture(profile_id: int, res: dict) -> dict:
+    db = SessionLocal()
+    try:
+        prof = db.query(models.Profile).get(profile_id)
+        if not prof:
+            raise ValueError("Profile was deleted during capture")
+        changed = set_profile_state(prof, res["storage_state"], res.get("user_agent"))
+        db.commit()
+        return {
+            "profile_id": profile_id,
+            "logged_in": res.get("logged_in"),
+            "changed": changed,
+            "user_agent": res.get("user_agent"),
+            "storage_state_ref": prof.storage_state_ref,
+            "storage_state_summary": prof.storage_state_summary,
+        }
+    finally:
+        db.close()
+
+
+async def _capture_and_store(req: CaptureReq, proxy: str | None) -> dict:
+    pwa = PlaywrightAutomation(headless=req.headless)
+    res = await pwa.capture_cookies_async(
+        login_url=req.login_url,
+        max_wait_ms=req.max_wait_ms,
+        proxy=proxy,
+        completion=LoginCompletion(**req.completion.model_dump()) if req.completion else None,
+    )
+    return await asyncio.to_thread(_store_capture, req.profile_id, res)
+
+
+@router.post("/cookies/capture")
 def capture_cookies(req: CaptureReq, db: Session = Depends(get_db)):
+    """Start a capture in the background; poll GET /automation/jobs/{job_id}."""
     prof = db.query(models.Profile).get(req.profile_id)
     if not prof:
         raise HTTPException(404, "Profile not found")
     if prof.platform == "email":
         raise HTTPException(400, "Cookie capture not applicable for email profiles")
 
-    proxy = prof.proxy
-    pwa = PlaywrightAutomation(headless=req.headless)
-    res = pwa.capture_cookies(
-        login_url=req.login_url,
-        max_wait_ms=req.max_wait_ms,
-        proxy=proxy,
-        storage_state_dir="./storage_states",
-        storage_state_name=f"profile_{prof.id}.json",
+    job_id = automation_jobs.start(
+        "cookie_capture",
+        _capture_and_store(req, prof.proxy),
+        params={"profile_id": prof.id, "login_url": req.login_url},
+        max_wait=req.max_wait_ms / 1000,
     )
+    return job_accepted(job_id)
 
-    # persist to profile.credentials
-    creds = dict(prof.credentials or {})
-    creds["cookies"] = res["cookies"]
-    creds["storage_state_path"] = res["storage_state_path"]
-    creds["user_agent"] = res.get("user_agent")
-    prof.credentials = creds
-    db.add(prof)
-    db.commit()
-    db.refresh(prof)
 
-    return CookieResp(**res)
+def _cookie_resp(prof: models.Profile) -> CookieResp:
+    state = profile_state(prof) or {}
+    return CookieResp(
+        cookies=state.get("cookies", []),
+        user_agent=(prof.credentials or {}).get("user_agent"),
+        storage_state_ref=prof.storage_state_ref,
+        storage_state_summary=prof.storage_state_summary,
+    )
 
 
 @router.get("/cookies/{profile_id}", response_model=CookieResp)
@@ -72,12 +132,7 @@ def get_cookies(profile_id: int, db: Session = Depends(get_db)):
     prof = db.query(models.Profile).get(profile_id)
     if not prof:
         raise HTTPException(404, "Profile not found")
-    creds = prof.credentials or {}
-    return CookieResp(
-        cookies=creds.get("cookies", []),
-        user_agent=creds.get("user_agent"),
-        storage_state_path=creds.get("storage_state_path"),
-    )
+    return _cookie_resp(prof)
 
 
 @router.post("/cookies/refresh", response_model=CookieResp)
@@ -86,23 +141,68 @@ def refresh_cookies(req: RefreshReq, db: Session = Depends(get_db)):
     if not prof:
         raise HTTPException(404, "Profile not found")
 
-    storage_path = (prof.credentials or {}).get("storage_state_path")
-    if not storage_path:
+    state = profile_state(prof)
+    if state is None:
         raise HTTPException(
-            400, "No storage_state_path on this profile. Capture first."
+            400, "No storage state on this profile. Capture first."
         )
 
     proxy = prof.proxy
     pwa = PlaywrightAutomation(headless=req.headless)
-    res = pwa.load_storage_state(storage_state_path=storage_path, proxy=proxy)
-
-    # Update cookies snapshot
-    creds = dict(prof.credentials or {})
-    creds["cookies"] = res["cookies"]
-    creds["user_agent"] = res.get("user_agent")
-    prof.credentials = creds
-    db.add(prof)
-    db.commit()
-    db.refresh(prof)
-
-    return CookieResp(**res)
+    res = pwa.load_storage_state(storage_state=state, proxy=proxy)
+
+    # Write only if the state or user agent changed
+    if set_profile_state(prof, res["storage_state"], res.get("user_agent")):
+        db.commit()
+        db.refresh(prof)
+
+    return _cookie_resp(prof)
+
+
+@router.post("/cookies/refresh/bulk")
+def bulk_refresh_cookies(req: BulkRefreshReq, db: Session = Depends(get_db)):
+    """Queue a refresh of many profiles; poll GET /automation/jobs/{job_id}."""
+    job = cookie_refresh.create_job(db, **req.model_dump())
+    cookie_refresh_task.delay(job.id)
+    return job_accepted(job.id)
+
+
+def _job_status(job_id: str) -> schemas.AutomationJobStatus | None:
+    db = SessionLocal()
+    try:
+        job = db.query(models.AutomationJob).get(job_id)
+        if not job:
+            return None
+        if automation_jobs.expire(job):
+            db.commit()
+        return schemas.AutomationJobStatus(
+            id=job.id,
+            kind=job.kind,
+            status=job.status,
+            total=job.total or 0,
+            processed=(job.succeeded or 0) + (job.failed or 0),
+            succeeded=job.succeeded or 0,
+            failed=job.failed or 0,
+            results=job.results or [],
+            detail=job.detail,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
+    finally:
+        db.close()
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.AutomationJobStatus)
+async def get_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Seconds to wait for the job to finish"),
+):
+    deadline = time.monotonic() + wait
+    while True:
+        job = await run_in_threadpool(_job_status, job_id)
+        if job is None:
+            raise HTTPException(404, "Automation job not found")
+        if job.status in automation_jobs.FINISHED or time.monotonic() >= deadline:
+            return job
+        await asyncio.sleep(JOB_POLL_INTERVAL)
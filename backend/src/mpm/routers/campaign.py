@@ -1,26 +1,91 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
 from mpm.database import SessionLocal
-from mpm.models import Profile
-
-# You’ll wire these functions into your Celery tasks:
-from tasks import start_campaign_task, stop_campaign_task
+from mpm.models import CampaignRun, Profile, Template
+import mpm.schemas as schemas
+from mpm.services import campaign
+from mpm.services.scheduler import DISTRIBUTIONS
+from mpm.tasks import campaign_tick_task, resume_campaign_task, stop_campaign_task
 
 router = APIRouter(prefix="/campaigns", tags=["campaigns"])
 
 
-@router.post("/{profile_id}/start")
-def start_campaign(profile_id: int):
+def get_db():
     db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.post("/{profile_id}/start", response_model=schemas.CampaignRun)
+def start_campaign(
+    profile_id: int,
+    body: Optional[schemas.CampaignStart] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Start a new run from `body`, or, without a body, resume the profile's
+    paused run from its cursor.
+    """
     profile = db.query(Profile).get(profile_id)
     if not profile:
         raise HTTPException(404, "Profile not found")
-    # Enqueue Celery task
-    start_campaign_task.delay(profile_id)
-    return {"status": "queued", "action": "start"}
+    run = campaign.active_run(db, profile_id)
+
+    if body is None:
+        if run is None or run.status != "paused":
+            raise HTTPException(404, "No paused campaign to resume")
+        resume_campaign_task.delay(run.id)
+        return run
+
+    if run is not None:
+        raise HTTPException(409, f"Campaign run {run.id} is already {run.status}")
+    if db.query(Template).get(body.template_id) is None:
+        raise HTTPException(404, "Template not found")
+    vars_list = body.vars_list or [{} for _ in body.recipients]
+    if len(vars_list) != len(body.recipients):
+        raise HTTPException(422, "vars_list must be parallel to recipients")
+    if body.delay_distribution not in DISTRIBUTIONS:
+        raise HTTPException(
+            422, f"delay_distribution must be one of {sorted(DISTRIBUTIONS)}"
+        )
+    run = campaign.create_run(
+        db,
+        profile_id,
+        body.template_id,
+        body.recipients,
+        vars_list,
+        window=body.window,
+        batch_size=body.batch_size,
+        min_delay=body.min_delay,
+        max_delay=body.max_delay,
+        delay_distribution=body.delay_distribution,
+    )
+    # Enqueue Celery task; the worker checks email domains before sending
+    campaign_tick_task.delay(run.id, check_domains=profile.platform == "email")
+    return run
 
 
 @router.post("/{profile_id}/stop")
-def stop_campaign(profile_id: int):
-    # Implementation depends on how you track tasks—this is a stub
-    stop_campaign_task.delay(profile_id)
-    return {"status": "queued", "action": "stop"}
+def stop_campaign(profile_id: int, pause: bool = False, db: Session = Depends(get_db)):
+    """Stop the active run, or with `?pause=true` pause it for a later resume."""
+    if campaign.active_run(db, profile_id) is None:
+        raise HTTPException(404, "No active campaign")
+    stop_campaign_task.delay(profile_id, pause)
+    return {"status": "queued", "action": "pause" if pause else "stop"}
+
+
+@router.get("/{profile_id}", response_model=schemas.CampaignRun)
+def get_campaign(profile_id: int, db: Session = Depends(get_db)):
+    """The profile's most recent run, with progress counters."""
+    run = (
+        db.query(CampaignRun)
+        .filter(CampaignRun.profile_id == profile_id)
+        .order_by(CampaignRun.id.desc())
+        .first()
+    )
+    if run is None:
+        raise HTTPException(404, "No campaign for this profile")
+    return run
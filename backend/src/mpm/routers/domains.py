@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+import mpm.schemas as schemas
+from mpm.services import domain_throttle
+
+router = APIRouter(prefix="/domains", tags=["domains"])
+
+
+@router.get("/", response_model=list[schemas.DomainStats])
+def list_domain_stats():
+    """Per-destination-domain delivery counters, adaptive rate and backoff."""
+    return domain_throttle.stats()
@@ -0,0 +1,83 @@
+import asyncio
+import json
+from typing import AsyncIterator, List, Optional
+
+from fastapi import APIRouter, Header, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from mpm.services import events
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+# Seconds between keep-alive comments on an idle stream
+KEEPALIVE = 15.0
+# Client reconnect delay suggested to EventSource, in ms
+RETRY_MS = 2000
+
+
+def format_event(event_id: str, event: dict) -> str:
+    return f"id: {event_id}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def event_stream(
+    sub: events.Subscription, resume: Optional[str] = None
+) -> AsyncIterator[str]:
+    """
+    SSE body for one subscriber: the backlog after `resume` (from the
+    stream's history), then live events until the client goes away or is
+    cut off for falling behind.
+    """
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        last = resume
+        while resume:
+            backlog = await run_in_threadpool(events.hub.bus.read, resume)
+            if not backlog:
+                break
+            for event_id, event in backlog:
+                if sub.matches(event):
+                    yield format_event(event_id, event)
+            resume = last = backlog[-1][0]
+        while True:
+            try:
+                item = await asyncio.wait_for(sub.queue.get(), KEEPALIVE)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:
+                # cut off; the client reconnects with its Last-Event-ID
+                return
+            event_id, event = item
+            # live events that the backlog already covered
+            if last is not None and events.id_key(event_id) <= events.id_key(last):
+                continue
+            yield format_event(event_id, event)
+    finally:
+        events.hub.unsubscribe(sub)
+
+
+@router.get("/")
+async def stream_events(
+    profile_id: Optional[List[int]] = Query(None),
+    campaign_id: Optional[List[int]] = Query(None),
+    last_event_id: Optional[str] = Query(None, description="Resume after this event id"),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+):
+    """
+    Server-sent delivery events ("log" and "campaign") for the given
+    profiles and/or campaign runs (all of them if neither is given). On
+    reconnect, EventSource sends Last-Event-ID and the stream resumes after
+    that event.
+    """
+    resume = last_event_id_header or last_event_id
+    if resume is not None:
+        try:
+            events.id_key(resume)
+        except ValueError:
+            resume = None
+    sub = events.hub.subscribe(asyncio.get_running_loop(), profile_id, campaign_id)
+    return StreamingResponse(
+        event_stream(sub, resume),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,13 +1,22 @@
-import csv
-import io
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
 from fastapi import APIRouter,UploadFile, File, Depends, HTTPException, status, Query
+from fastapi.responses import JSONResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from mpm.database import SessionLocal
 import mpm.models as models
 import mpm.schemas as schemas
+from mpm.services.list_import import ImportFormatError, import_list_entries
+from mpm.services.list_index import normalize, safe_update
+from mpm.tasks import import_list_task
 
 router = APIRouter(prefix="/lists", tags=["lists"])
 
+SPOOL_DIR = os.getenv("LIST_IMPORT_SPOOL_DIR", "./uploads")
+
 def get_db():
     db = SessionLocal()
     try:
@@ -21,6 +30,7 @@ def create_list_entry(entry_in: schemas.ListEntryCreate, db: Session = Depends(g
     db.add(db_e)
     db.commit()
     db.refresh(db_e)
+    safe_update("add", db_e.profile_id, db_e.type.value, [db_e.value])
     return db_e
 
 @router.get("/", response_model=list[schemas.ListEntry])
@@ -43,34 +53,126 @@ def delete_list_entry(entry_id: int, db: Session = Depends(get_db)):
     db_e = db.query(models.ListEntry).get(entry_id)
     if not db_e:
         raise HTTPException(status_code=404, detail="List entry not found")
+    profile_id, list_type, value = db_e.profile_id, db_e.type, db_e.value
     db.delete(db_e)
     db.commit()
+    # Only drop the value from the index if no other row still lists it
+    still_listed = (
+        db.query(models.ListEntry.id)
+        .filter_by(profile_id=profile_id, type=list_type)
+        .filter(func.lower(models.ListEntry.value) == normalize(value))
+        .first()
+    )
+    if still_listed is None:
+        safe_update("remove", profile_id, list_type.value, [value])
     return
 
 @router.post("/bulk")
-async def bulk_upload_lists(file: UploadFile = File(...), db: Session = Depends(get_db)):
+def bulk_upload_lists(
+    file: UploadFile = File(...),
+    background: bool = Query(False),
+    db: Session = Depends(get_db),
+):
     if not file.filename or not file.filename.endswith((".csv", ".txt")):
         raise HTTPException(400, "Please upload a CSV file")
-    content = (await file.read()).decode("utf-8", errors="ignore")
-    reader = csv.DictReader(io.StringIO(content))
-    required = {"profile_id", "type", "value"}
-    if set(map(str.lower, reader.fieldnames or [])) != required:
-        # or use a softer check to allow any order
-        missing = required - set(map(str.lower, reader.fieldnames or []))
-        raise HTTPException(400, f"CSV must contain headers: {', '.join(sorted(required))}. Missing: {', '.join(sorted(missing))}")
-    inserted = skipped = 0
-    for row in reader:
+    if background:
+        return _start_import_job(file, db)
+    # Runs in the threadpool and reads the spooled upload incrementally
+    try:
+        result = import_list_entries(db, file.file)
+    except ImportFormatError as e:
+        raise HTTPException(400, str(e))
+    return result.as_dict()
+
+
+def _start_import_job(file: UploadFile, db: Session):
+    """Spool the upload to disk and hand it to import_list_task."""
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    path = os.path.join(SPOOL_DIR, f"import_{job_id}.csv")
+    with open(path, "wb") as out:
+        shutil.copyfileobj(file.file, out, length=1024 * 1024)
+    job = models.ImportJob(
+        id=job_id,
+        filename=file.filename,
+        path=path,
+        status="queued",
+        bytes_total=os.path.getsize(path),
+    )
+    db.add(job)
+    db.commit()
+    import_list_task.delay(job_id)
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"job_id": job_id, "status": "queued"},
+    )
+
+
+def _job_status(job: models.ImportJob) -> schemas.ImportJobStatus:
+    rows = (job.inserted or 0) + (job.skipped or 0)
+    rate = eta = None
+    if job.started_at is not None:
+        started = job.started_at
+        if started.tzinfo is None:  # SQLite drops the tz
+            started = started.replace(tzinfo=timezone.utc)
+        end = job.finished_at or datetime.now(timezone.utc)
+        if end.tzinfo is None:
+            end = end.replace(tzinfo=timezone.utc)
+        elapsed = max((end - started).total_seconds(), 1e-6)
+        rate = rows / elapsed
+        if job.status == "running" and job.bytes_processed:
+            remaining = job.bytes_total - job.bytes_processed
+            eta = remaining / (job.bytes_processed / elapsed)
+    return schemas.ImportJobStatus(
+        id=job.id,
+        filename=job.filename,
+        status=job.status,
+        rows_processed=rows,
+        inserted=job.inserted or 0,
+        skipped=job.skipped or 0,
+        errors=job.errors or [],
+        bytes_total=job.bytes_total,
+        bytes_processed=job.bytes_processed,
+        rows_per_second=rate,
+        eta_seconds=eta,
+        detail=job.detail,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+
+@router.get("/bulk/{job_id}", response_model=schemas.ImportJobStatus)
+def get_import_job(job_id: str, db: Session = Depends(get_db)):
+    job = db.query(models.ImportJob).get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return _job_status(job)
+
+
+@router.post("/bulk/{job_id}/cancel", response_model=schemas.ImportJobStatus)
+def cancel_import_job(
+    job_id: str,
+    rollback: bool = Query(False, description="Delete rows already imported"),
+    db: Session = Depends(get_db),
+):
+    job = db.query(models.ImportJob).get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    if job.status == "queued":
+        # Never started: the worker will skip it
+        job.status = "cancelled"
+        job.finished_at = datetime.now(timezone.utc)
         try:
-            entry = models.ListEntry(
-                profile_id=int(row["profile_id"]),
-                type=row["type"],  # validate whitelist/blacklist per your enum
-                value=row["value"].strip(),
-            )
-            db.add(entry)
-            inserted += 1
-        except Exception:
-            db.rollback()
-            skipped += 1
-        else:
-            db.commit()
-    return {"inserted": inserted, "skipped": skipped}
\ No newline at end of file
+            os.remove(job.path)
+        except OSError:
+            pass
+    elif job.status == "running":
+        # The worker stops after its current batch
+        job.cancel_requested = True
+        job.rollback_on_cancel = rollback
+    else:
+        raise HTTPException(status_code=409, detail=f"Import job is {job.status}")
+    db.commit()
+    db.refresh(job)
+    return _job_status(job)
@@ -1,11 +1,28 @@
-from fastapi import APIRouter, Depends, Query
+import base64
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime, timezone
+from typing import Iterator, List, Literal, Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
 from sqlalchemy.orm import Session
 from mpm.database import SessionLocal
 import mpm.models as models
 import mpm.schemas as schemas
+from mpm.services import log_stats
 
 router = APIRouter(prefix="/logs", tags=["logs"])
 
+# Rows fetched per round trip by exports, and rows per streamed chunk
+EXPORT_FETCH_SIZE = int(os.getenv("LOG_EXPORT_FETCH_SIZE", 10_000))
+EXPORT_CHUNK_ROWS = 1000
+EXPORT_COLUMNS = ("id", "profile_id", "action", "status", "detail", "timestamp")
+
 def get_db():
     db = SessionLocal()
     try:
@@ -13,20 +30,195 @@ def get_db():
     finally:
         db.close()
 
+
+def _utc(ts: datetime) -> datetime:
+    # timestamps are stored in UTC (naive on SQLite)
+    return ts.astimezone(timezone.utc) if ts.tzinfo else ts
+
+
+def encode_cursor(entry: models.LogEntry) -> str:
+    raw = json.dumps([entry.timestamp.isoformat(), entry.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, entry_id = json.loads(raw)
+        return _utc(datetime.fromisoformat(ts)), int(entry_id)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor") from None
+
+
+def _conditions(profile_id, action, status, since, until) -> List:
+    conds = []
+    if profile_id is not None:
+        conds.append(models.LogEntry.profile_id == profile_id)
+    if action is not None:
+        conds.append(models.LogEntry.action == action)
+    if status is not None:
+        conds.append(models.LogEntry.status == status)
+    if since is not None:
+        conds.append(models.LogEntry.timestamp >= _utc(since))
+    if until is not None:
+        conds.append(models.LogEntry.timestamp < _utc(until))
+    return conds
+
+
 @router.get("/", response_model=list[schemas.LogEntry])
 def list_logs(
+    response: Response,
+    profile_id: int = Query(None),
+    action: str = Query(None),
+    status: str = Query(None),
+    since: Optional[datetime] = Query(None, description="Only entries at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only entries before this time"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    limit: int = Query(100, gt=0, le=1000),
+    db: Session = Depends(get_db),
+):
+    """
+    Newest entries first. Pages are keyed on (timestamp, id) rather than an
+    offset, so every page is an index range scan however deep it is; when
+    more entries follow, the `X-Next-Cursor` header holds the cursor for the
+    next page.
+    """
+    q = db.query(models.LogEntry).filter(
+        *_conditions(profile_id, action, status, since, until)
+    )
+    if cursor is not None:
+        q = q.filter(
+            tuple_(models.LogEntry.timestamp, models.LogEntry.id) < decode_cursor(cursor)
+        )
+    entries = (
+        q.order_by(models.LogEntry.timestamp.desc(), models.LogEntry.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    if len(entries) > limit:
+        entries = entries[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(entries[-1])
+    return entries
+
+
+@router.get("/stats", response_model=list[schemas.LogStat])
+def log_statistics(
+    period: Literal["minute", "hour"] = "hour",
     profile_id: int = Query(None),
     action: str = Query(None),
     status: str = Query(None),
-    skip: int = 0,
-    limit: int = 100,
+    since: Optional[datetime] = Query(None, description="First bucket: the one containing this time"),
+    until: Optional[datetime] = Query(None, description="Only buckets starting before this time"),
+    limit: int = Query(1000, gt=0, le=10_000),
     db: Session = Depends(get_db),
 ):
-    q = db.query(models.LogEntry)
+    """
+    Entry counts per minute or hour bucket and (profile_id, action, status),
+    read from the rollup tables rather than the raw log.
+    """
+    model = log_stats.PERIODS[period]
+    q = db.query(model)
     if profile_id is not None:
-        q = q.filter(models.LogEntry.profile_id == profile_id)
+        q = q.filter(model.profile_id == profile_id)
     if action is not None:
-        q = q.filter(models.LogEntry.action == action)
+        q = q.filter(model.action == action)
     if status is not None:
-        q = q.filter(models.LogEntry.status == status)
-    return q.offset(skip).limit(limit).all()
+        q = q.filter(model.status == status)
+    if since is not None:
+        q = q.filter(model.bucket >= log_stats.bucket(since, period))
+    if until is not None:
+        q = q.filter(model.bucket < _utc(until))
+    return (
+        q.order_by(model.bucket, model.profile_id, model.action, model.status)
+        .limit(limit)
+        .all()
+    )
+
+
+def _export_rows(conds: List) -> Iterator[tuple]:
+    # its own session: the request's is closed before the body is streamed
+    db = SessionLocal()
+    try:
+        cols = [getattr(models.LogEntry, c) for c in EXPORT_COLUMNS]
+        rows = db.execute(
+            select(*cols)
+            .where(*conds)
+            .order_by(models.LogEntry.timestamp, models.LogEntry.id)
+            .execution_options(yield_per=EXPORT_FETCH_SIZE)
+        )
+        yield from rows
+    finally:
+        db.close()
+
+
+def _ndjson_chunks(rows: Iterator[tuple]) -> Iterator[str]:
+    lines = []
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        if record["timestamp"] is not None:
+            record["timestamp"] = record["timestamp"].isoformat()
+        lines.append(json.dumps(record) + "\n")
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+def _csv_chunks(rows: Iterator[tuple]) -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    n = 0
+    for row in rows:
+        writer.writerow(row[:-1] + (row[-1].isoformat() if row[-1] else "",))
+        n += 1
+        if n % EXPORT_CHUNK_ROWS == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _gzipped(chunks: Iterator[str]) -> Iterator[bytes]:
+    gz = zlib.compressobj(wbits=31)  # gzip container
+    for chunk in chunks:
+        # sync-flush each chunk so clients can decode as it arrives
+        yield gz.compress(chunk.encode()) + gz.flush(zlib.Z_SYNC_FLUSH)
+    yield gz.flush()
+
+
+@router.get("/export")
+def export_logs(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    profile_id: int = Query(None),
+    action: str = Query(None),
+    status: str = Query(None),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+):
+    """
+    Stream every matching entry, oldest first, as NDJSON or CSV (optionally
+    gzipped). Rows are read through a server-side cursor and written out in
+    chunks, so memory stays flat however many rows match.
+    """
+    rows = _export_rows(_conditions(profile_id, action, status, since, until))
+    if format == "csv":
+        chunks, media_type = _csv_chunks(rows), "text/csv"
+    else:
+        chunks, media_type = _ndjson_chunks(rows), "application/x-ndjson"
+    filename = f"logs.{format}"
+    if gzip:
+        body, media_type, filename = _gzipped(chunks), "application/gzip", filename + ".gz"
+    else:
+        body = (chunk.encode() for chunk in chunks)
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
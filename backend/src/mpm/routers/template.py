@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from jinja2 import TemplateError
 from sqlalchemy.orm import Session
 from mpm.database import SessionLocal
 import mpm.models as models
 import mpm.schemas as schemas
+from mpm.services.renderer import Renderer
 
 router = APIRouter(prefix="/templates", tags=["templates"])
 
@@ -26,6 +28,16 @@ def create_template(template_in: schemas.TemplateCreate, db: Session = Depends(g
 def list_templates(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     return db.query(models.Template).offset(skip).limit(limit).all()
 
+@router.post("/preview", response_model=list[schemas.TemplatePreview])
+def preview_template_source(req: schemas.TemplateSourcePreviewRequest):
+    """Render an unsaved subject and body for each context in `vars_list`."""
+    tmpl = models.Template(subject=req.subject, body=req.body)
+    try:
+        rendered = list(Renderer().render_many(tmpl, req.vars_list))
+    except TemplateError as e:
+        raise HTTPException(status_code=422, detail=f"Template error: {e}")
+    return [{"subject": subject, "body": body} for subject, body in rendered]
+
 @router.get("/{template_id}", response_model=schemas.Template)
 def get_template(template_id: int, db: Session = Depends(get_db)):
     db_t = db.query(models.Template).get(template_id)
@@ -33,6 +45,16 @@ def get_template(template_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Template not found")
     return db_t
 
+@router.post("/{template_id}/preview", response_model=list[schemas.TemplatePreview])
+def preview_template(
+    template_id: int, req: schemas.TemplatePreviewRequest, db: Session = Depends(get_db)
+):
+    db_t = db.query(models.Template).get(template_id)
+    if not db_t:
+        raise HTTPException(status_code=404, detail="Template not found")
+    rendered = Renderer().render_many(db_t, req.vars_list)
+    return [{"subject": subject, "body": body} for subject, body in rendered]
+
 @router.put("/{template_id}", response_model=schemas.Template)
 def update_template(template_id: int, template_in: schemas.TemplateCreate, db: Session = Depends(get_db)):
     db_t = db.query(models.Template).get(template_id)
@@ -1,7 +1,8 @@
+import re
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from pydantic import ConfigDict
-from typing import Any, Optional
+from typing import Optional
 
 import enum
 
@@ -22,19 +23,24 @@ class ProfileBase(BaseModel):
     platform: PlatformEnum
     credentials: dict
     proxy: Optional[str] = None
+    rate_limit_per_hour: Optional[int] = Field(None, gt=0)
+    rate_limit_burst: Optional[int] = Field(None, gt=0)
+    log_retention_days: Optional[int] = Field(None, gt=0)
 
 
 class ProfileCreate(ProfileBase):
     pass
 
 class ProfileUpdate(ProfileBase):
-    cookies: Optional[Any] = None  # will hold JSON array of cookies
+    pass
 
 class Profile(ProfileBase):
     id: int
     created_at: Optional[datetime]
     updated_at: datetime
-    cookies: Optional[Any] = None
+    # storage state lives in services.state_store; GET /automation/cookies/{id} reads it
+    storage_state_ref: Optional[str] = None
+    storage_state_summary: Optional[dict] = None
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -51,11 +57,26 @@ class TemplateCreate(TemplateBase):
 
 class Template(TemplateBase):
     id: int
-    created_at: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime] = None
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class TemplatePreviewRequest(BaseModel):
+    vars_list: list[dict]
+
+
+class TemplateSourcePreviewRequest(TemplatePreviewRequest):
+    subject: Optional[str] = None
+    body: str
+
+
+class TemplatePreview(BaseModel):
+    subject: str
+    body: str
+
+
 # >>> List Entries
 class ListEntryBase(BaseModel):
     profile_id: int
@@ -73,6 +94,105 @@ class ListEntry(ListEntryBase):
     model_config = ConfigDict(from_attributes=True)
 
 
+class ImportJobStatus(BaseModel):
+    id: str
+    filename: Optional[str] = None
+    status: str
+    rows_processed: int
+    inserted: int
+    skipped: int
+    errors: list[dict] = []
+    bytes_total: int
+    bytes_processed: int
+    rows_per_second: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    detail: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+# >>> Automation
+class LoginCompletion(BaseModel):
+    """When a manual login counts as done; none set: the page left the login URL."""
+
+    url_pattern: Optional[str] = Field(None, description="Regex searched in the page URL")
+    selector: Optional[str] = Field(None, description="Selector that appears after login")
+    cookie: Optional[str] = Field(None, description="Name of a cookie set by the login")
+
+    @field_validator("url_pattern")
+    @classmethod
+    def _valid_regex(cls, v):
+        if v is not None:
+            try:
+                re.compile(v)
+            except re.error as e:
+                raise ValueError(f"invalid regex: {e}")
+        return v
+
+
+class AutomationJobStatus(BaseModel):
+    id: str
+    kind: str
+    status: str
+    total: int
+    processed: int
+    succeeded: int
+    failed: int
+    results: list[dict] = []
+    detail: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+# >>> Campaigns
+class CampaignStart(BaseModel):
+    template_id: int
+    recipients: list[str]
+    vars_list: Optional[list[dict]] = None
+    window: Optional[int] = None
+    batch_size: int = 1
+    min_delay: float = 1.0
+    max_delay: float = 5.0
+    delay_distribution: str = "uniform"
+
+
+class CampaignRun(BaseModel):
+    id: int
+    profile_id: int
+    template_id: int
+    status: str
+    total: int
+    cursor: int
+    in_flight: int
+    sent: int
+    failed: int
+    suppressed: int
+    window: int
+    batch_size: int
+    delay_distribution: str
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+# >>> Delivery metrics
+class DomainStats(BaseModel):
+    domain: str
+    sent: int
+    deferred: int
+    failed: int
+    in_flight: int
+    rate_per_hour: float
+    max_rate_per_hour: float
+    concurrency: int
+    backoff_seconds: float
+    last_code: Optional[int] = None
+
+
 # >>> Logs
 class LogEntry(BaseModel):
     id: int
@@ -80,6 +200,16 @@ class LogEntry(BaseModel):
     action: str
     status: str
     detail: Optional[str]
-    timestamp: Optional[str]
+    timestamp: Optional[datetime]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class LogStat(BaseModel):
+    bucket: datetime
+    profile_id: int
+    action: str
+    status: str
+    count: int
 
     model_config = ConfigDict(from_attributes=True)
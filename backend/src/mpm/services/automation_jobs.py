@@ -0,0 +1,132 @@
+"""
+One-off automation jobs run inside the API process.
+
+Interactive logins, cookie captures and test emails used to run in the
+request handler, each holding a threadpool worker for as long as the
+operator took to log in. Now the handler records an AutomationJob, hands the
+work to the browser pool's event loop (services.browser_pool) as a coroutine
+and returns the job id straight away. A coroutine waiting on a browser costs
+no thread, so any number of captures can wait on operators without slowing
+the API; blocking calls such as smtplib run via asyncio.to_thread.
+
+These jobs stay in the API process because interactive logins need a
+browser on the operator's machine. Clients read the outcome from GET
+/automation/jobs/{id}, passing ?wait= to long-poll. On success the job's
+`results` holds the work's return value as its only entry.
+
+Each job gets a deadline: the work's own max wait plus AUTOMATION_JOB_GRACE
+seconds (recorded as params["timeout"]). Past it the work is cancelled. A
+job whose process died (restart, crash) is marked failed once its deadline
+has passed, by `reap` at API startup or when the job is next read, so
+clients polling it always see it finish.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Optional
+
+from sqlalchemy.orm import Session
+
+from mpm.database import SessionLocal
+from mpm.models import AutomationJob
+from mpm.services.browser_pool import browser_pool
+
+FINISHED = ("completed", "failed")
+# Slack on top of a job's max wait: browser start-up, navigation, writes
+GRACE = float(os.getenv("AUTOMATION_JOB_GRACE", 60))
+# Max wait for work that has none of its own (e.g. a test email)
+DEFAULT_MAX_WAIT = 120.0
+INTERRUPTED = "Interrupted: the API stopped before the job finished"
+
+logger = logging.getLogger(__name__)
+
+
+def _update(job_id: str, **values) -> None:
+    db = SessionLocal()
+    try:
+        db.query(AutomationJob).filter_by(id=job_id).update(values)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _run(job_id: str, work: Awaitable[dict], timeout: float) -> None:
+    await asyncio.to_thread(
+        _update, job_id, status="running", started_at=datetime.now(timezone.utc)
+    )
+    try:
+        result = await asyncio.wait_for(work, timeout)
+    except asyncio.TimeoutError:
+        logger.warning("automation job %s timed out", job_id)
+        values = {"status": "failed", "failed": 1, "detail": f"Timed out after {timeout:g}s"}
+    except Exception as e:
+        logger.warning("automation job %s failed: %s", job_id, e)
+        values = {"status": "failed", "failed": 1, "detail": str(e) or type(e).__name__}
+    else:
+        values = {"status": "completed", "succeeded": 1, "results": [result]}
+    await asyncio.to_thread(
+        _update, job_id, finished_at=datetime.now(timezone.utc), **values
+    )
+
+
+def start(
+    kind: str,
+    work: Awaitable[dict],
+    params: Optional[dict] = None,
+    max_wait: float = DEFAULT_MAX_WAIT,
+) -> str:
+    """
+    Record a queued job, start `work` in the background and return the job
+    id. `max_wait` is how long (s) the work may legitimately take.
+    """
+    job_id = uuid.uuid4().hex
+    timeout = max_wait + GRACE
+    db = SessionLocal()
+    try:
+        db.add(AutomationJob(
+            id=job_id,
+            kind=kind,
+            status="queued",
+            params={**(params or {}), "timeout": timeout},
+            total=1,
+            results=[],
+        ))
+        db.commit()
+    finally:
+        db.close()
+    browser_pool.submit(_run(job_id, work, timeout))
+    return job_id
+
+
+def expire(job: AutomationJob, now: Optional[datetime] = None) -> bool:
+    """
+    Mark an in-process job failed if it is unfinished past its deadline
+    (plus GRACE for the final write); the caller commits. Jobs without a
+    deadline, such as Celery-run cookie refreshes, are left alone.
+    """
+    timeout = (job.params or {}).get("timeout")
+    if job.status in FINISHED or timeout is None or job.created_at is None:
+        return False
+    created = job.created_at
+    if created.tzinfo is None:  # SQLite drops the zone; stored as UTC
+        created = created.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    if now < created + timedelta(seconds=timeout + GRACE):
+        return False
+    job.status = "failed"
+    job.failed = 1
+    job.detail = INTERRUPTED
+    job.finished_at = now
+    return True
+
+
+def reap(db: Session, now: Optional[datetime] = None) -> int:
+    """Fail every orphaned in-process job (see `expire`); returns how many."""
+    jobs = db.query(AutomationJob).filter(AutomationJob.status.notin_(FINISHED))
+    reaped = sum(expire(job, now) for job in jobs.all())
+    db.commit()
+    if reaped:
+        logger.warning("marked %d interrupted automation jobs failed", reaped)
+    return reaped
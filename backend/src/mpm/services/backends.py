@@ -0,0 +1,35 @@
+"""
+Backend selection for the services that keep shared state: the list index,
+rate limiter, send scheduler, domain throttle and event bus.
+
+Each has an in-process implementation, which only works when the API and
+the workers share one process, and a Redis one shared by every process.
+The service's own *_BACKEND variable picks one ("memory" or "redis", the
+default). Redis backends share one client, and so one connection pool, per
+process.
+"""
+import functools
+import os
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+@functools.lru_cache(maxsize=None)
+def redis_client():
+    """Client for REDIS_URL, falling back to the Celery broker's URL."""
+    import redis
+
+    url = os.getenv(
+        "REDIS_URL", os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0")
+    )
+    return redis.Redis.from_url(url, socket_connect_timeout=2)
+
+
+def select_backend(
+    env_var: str, memory: Callable[[], T], redis: Callable[[Any], T]
+) -> T:
+    """`memory()` when `env_var` is "memory", otherwise `redis(redis_client())`."""
+    if os.getenv(env_var, "redis") == "memory":
+        return memory()
+    return redis(redis_client())
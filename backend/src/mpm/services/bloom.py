@@ -0,0 +1,313 @@
+"""
+Bloom-filter pre-screen for very large suppression lists.
+
+A filter is a memory-mappable file (`BLOOM_FILTER_DIR/profile_{id}_{type}.bloom`)
+built from ListEntry rows. Workers map it lazily, so its pages are shared by
+every process on the host and worker RSS stays flat as lists grow. A hit only
+means "probably listed" and is confirmed against list_entries; a miss is
+definitive.
+
+Rebuild with:
+
+    python -m mpm.services.bloom rebuild --profile-id 1 --fp-rate 0.001
+"""
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+
+import mpm.models as models
+from mpm.database import SessionLocal
+
+FILTER_DIR = os.getenv("BLOOM_FILTER_DIR", "./bloom_filters")
+DEFAULT_FP_RATE = float(os.getenv("BLOOM_FP_RATE", 0.001))
+# Extra capacity so entries added after a rebuild don't raise the FP rate
+HEADROOM = 1.25
+CONFIRM_CHUNK = 500
+
+_MAGIC = b"MPMBLOOM"
+# magic, format version, k, m (bits), n (items added)
+_HEADER = struct.Struct("<8sIIQQ")
+_MASK64 = (1 << 64) - 1
+_blake2b = hashlib.blake2b
+
+
+def _normalize(value: str) -> str:
+    return value.strip().lower()
+
+
+class BloomFilter:
+    """Bloom filter over a memory-mapped file (double hashing on blake2b)."""
+
+    def __init__(self, path: str, writable: bool = False):
+        self.path = path
+        self._file = open(path, "r+b" if writable else "rb")
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=access)
+        magic, _, self.k, self.m, _ = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a bloom filter file")
+        self.writable = writable
+
+    @staticmethod
+    def optimal_params(capacity: int, fp_rate: float) -> Tuple[int, int]:
+        capacity = max(capacity, 1)
+        m = math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2))
+        k = max(1, round(m / capacity * math.log(2)))
+        return m, k
+
+    @classmethod
+    def create(cls, path: str, capacity: int, fp_rate: float = DEFAULT_FP_RATE):
+        m, k = cls.optimal_params(capacity, fp_rate)
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, 1, k, m, 0))
+            f.truncate(_HEADER.size + (m + 7) // 8)
+        return cls(path, writable=True)
+
+    @property
+    def count(self) -> int:
+        return _HEADER.unpack_from(self._mm, 0)[4]
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._mm)
+
+    def _positions(self, value: str) -> range:
+        h = int.from_bytes(
+            _blake2b(value.strip().lower().encode(), digest_size=16).digest(), "little"
+        )
+        h1, h2 = h & _MASK64, (h >> 64) | 1
+        # h1 + i*h2 for i in 0..k-1, reduced mod m by the caller
+        return range(h1, h1 + self.k * h2, h2)
+
+    def add_many(self, values: Iterable[str]) -> int:
+        """
+        Set the values' bits. This is a read-modify-write of shared pages,
+        so concurrent writers must hold `writer_lock` for the filter's path.
+        """
+        if not self.writable:
+            raise ValueError("bloom filter opened read-only")
+        mm, base, added = self._mm, _HEADER.size, 0
+        for value in values:
+            for pos in self._positions(value):
+                pos %= self.m
+                i = base + (pos >> 3)
+                mm[i] = mm[i] | (1 << (pos & 7))
+            added += 1
+        magic, version, k, m, n = _HEADER.unpack_from(mm, 0)
+        _HEADER.pack_into(mm, 0, magic, version, k, m, n + added)
+        return added
+
+    def __contains__(self, value: str) -> bool:
+        mm, base, m = self._mm, _HEADER.size, self.m
+        for pos in self._positions(value):
+            pos %= m
+            if not mm[base + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def contains_many(self, values: Sequence[str]) -> List[bool]:
+        return [v in self for v in values]
+
+    def flush(self) -> None:
+        self._mm.flush()
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+def filter_path(profile_id: int, list_type: str) -> str:
+    list_type = getattr(list_type, "value", list_type)
+    return os.path.join(FILTER_DIR, f"profile_{profile_id}_{list_type}.bloom")
+
+
+@contextlib.contextmanager
+def writer_lock(path: str):
+    """
+    Exclusive lock for writing the filter at `path`, held across processes
+    (the API and import workers) via flock on a sidecar file. A bit lost to
+    a racing writer would be a false negative, i.e. a listed address let
+    through.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(f"{path}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# Filters mapped by this process, keyed by path; remapped when the file is
+# replaced by a rebuild (new inode).
+_loaded: Dict[str, Tuple[int, BloomFilter]] = {}
+_lock = threading.Lock()
+
+
+def get_filter(
+    profile_id: int, list_type: str, writable: bool = False
+) -> Optional[BloomFilter]:
+    """The filter for (profile, type) if one has been built, else None."""
+    path = filter_path(profile_id, list_type)
+    try:
+        ino = os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+    with _lock:
+        cached = _loaded.get(path)
+        if cached and cached[0] == ino and (cached[1].writable or not writable):
+            return cached[1]
+        bf = BloomFilter(path, writable=writable)
+        _loaded[path] = (ino, bf)
+        # the replaced mapping is left to the GC; readers may still hold it
+        return bf
+
+
+def confirm(profile_id: int, list_type: str, values: Sequence[str]) -> List[bool]:
+    """Exact membership for a (small) set of candidates, from the database."""
+    listed = set()
+    db = SessionLocal()
+    try:
+        for start in range(0, len(values), CONFIRM_CHUNK):
+            chunk = {_normalize(v) for v in values[start : start + CONFIRM_CHUNK]}
+            listed.update(
+                db.scalars(
+                    select(func.lower(models.ListEntry.value))
+                    .where(models.ListEntry.profile_id == profile_id)
+                    .where(models.ListEntry.type == list_type)
+                    .where(func.lower(models.ListEntry.value).in_(chunk))
+                )
+            )
+    finally:
+        db.close()
+    return [_normalize(v) in listed for v in values]
+
+
+def has_entries(profile_id: int, list_type: str) -> bool:
+    """
+    Whether the list has any rows, from the database: a filter's count only
+    grows, so it can't tell that a list has been emptied.
+    """
+    db = SessionLocal()
+    try:
+        return db.scalar(
+            select(
+                select(models.ListEntry.id)
+                .where(models.ListEntry.profile_id == profile_id)
+                .where(models.ListEntry.type == list_type)
+                .exists()
+            )
+        )
+    finally:
+        db.close()
+
+
+def screened_contains_many(
+    bf: BloomFilter, profile_id: int, list_type: str, values: Sequence[str]
+) -> List[bool]:
+    """Bloom pre-screen; only the (rare) hits go to the database."""
+    hits = [i for i, v in enumerate(values) if v in bf]
+    out = [False] * len(values)
+    if hits:
+        confirmed = confirm(profile_id, list_type, [values[i] for i in hits])
+        for i, ok in zip(hits, confirmed):
+            out[i] = ok
+    return out
+
+
+def rebuild(
+    profile_id: int, list_type: str = "blacklist", fp_rate: float = DEFAULT_FP_RATE
+) -> BloomFilter:
+    """
+    Build a filter from list_entries into a temp file and atomically swap it
+    in; workers pick up the new file on their next lookup. The writer lock
+    is held throughout, so entries added meanwhile wait and go into the new
+    file rather than the one being replaced.
+    """
+    os.makedirs(FILTER_DIR, exist_ok=True)
+    path = filter_path(profile_id, list_type)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with writer_lock(path):
+        db = SessionLocal()
+        try:
+            where = (
+                models.ListEntry.profile_id == profile_id,
+                models.ListEntry.type == list_type,
+            )
+            total = db.scalar(
+                select(func.count()).select_from(models.ListEntry).where(*where)
+            )
+            bf = BloomFilter.create(tmp, int((total or 0) * HEADROOM) + 1000, fp_rate)
+            rows = db.scalars(
+                select(models.ListEntry.value)
+                .where(*where)
+                .execution_options(yield_per=10_000)
+            )
+            bf.add_many(rows)
+            bf.flush()
+            bf.close()
+        finally:
+            db.close()
+        os.replace(tmp, path)
+    return get_filter(profile_id, list_type)
+
+
+def add_values(profile_id: int, list_type: str, values: Iterable[str]) -> None:
+    """Keep an existing filter current when entries are added."""
+    path = filter_path(profile_id, list_type)
+    if not os.path.exists(path):
+        return
+    values = list(values)
+    with writer_lock(path):
+        # looked up under the lock: a rebuild may just have swapped the file
+        bf = get_filter(profile_id, list_type, writable=True)
+        if bf is not None:
+            bf.add_many(values)
+            bf.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m mpm.services.bloom")
+    sub = parser.add_subparsers(dest="command", required=True)
+    cmd = sub.add_parser("rebuild", help="(re)build suppression filters")
+    target = cmd.add_mutually_exclusive_group(required=True)
+    target.add_argument("--profile-id", type=int)
+    target.add_argument("--all", action="store_true", help="every profile with entries")
+    cmd.add_argument("--type", default="blacklist", choices=["blacklist", "whitelist"])
+    cmd.add_argument("--fp-rate", type=float, default=DEFAULT_FP_RATE)
+    args = parser.parse_args(argv)
+
+    if args.all:
+        db = SessionLocal()
+        try:
+            profile_ids = list(
+                db.scalars(
+                    select(models.ListEntry.profile_id)
+                    .where(models.ListEntry.type == args.type)
+                    .distinct()
+                )
+            )
+        finally:
+            db.close()
+    else:
+        profile_ids = [args.profile_id]
+
+    for profile_id in profile_ids:
+        bf = rebuild(profile_id, args.type, args.fp_rate)
+        print(
+            f"profile {profile_id} {args.type}: {bf.count} entries, "
+            f"{bf.nbytes / 1024:.1f} KiB, k={bf.k}"
+        )
+
+
+if __name__ == "__main__":
+    main()
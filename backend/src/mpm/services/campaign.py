@@ -0,0 +1,342 @@
+"""
+Campaign engine: persisted runs with a resumable recipient cursor.
+
+A run's recipients are stored in campaign_recipients and handed to the broker
+in bounded windows: `claim_next` marks up to `window - in_flight` pending
+recipients as queued and advances the cursor, and each finished send calls
+`complete_recipient`, which asks for a refill once the window has drained to
+half. Broker memory is therefore O(window) however large the campaign is, and
+after a crash `resume` re-queues whatever was in flight and has outlived its
+send lease.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func, insert, update
+from sqlalchemy.orm import Session
+
+from mpm.models import CampaignRecipient, CampaignRun
+from mpm.services import events
+from mpm.services.list_index import list_index
+from mpm.services.mx_cache import mx_cache
+
+DEFAULT_WINDOW = int(os.getenv("CAMPAIGN_WINDOW", 50))
+# A running run with work in flight but no progress for this long is resumed
+STALE_AFTER = int(os.getenv("CAMPAIGN_STALE_AFTER", 600))
+# A queued recipient claimed more recently than this may still be mid-send,
+# so `resume` leaves it in flight
+SEND_LEASE = int(os.getenv("CAMPAIGN_SEND_LEASE", 300))
+INSERT_CHUNK = 5000
+
+ACTIVE = ("running", "paused")
+_COUNTERS = {"sent": "sent", "error": "failed", "suppressed": "suppressed"}
+
+
+def create_run(
+    db: Session,
+    profile_id: int,
+    template_id: int,
+    recipients: Sequence[str],
+    vars_list: Sequence[dict],
+    window: Optional[int] = None,
+    batch_size: int = 1,
+    min_delay: float = 1.0,
+    max_delay: float = 5.0,
+    delay_distribution: str = "uniform",
+) -> CampaignRun:
+    """
+    Persist a run and its recipients, marking suppressed ones up front.
+    Email runs should go through `mark_undeliverable` before the first
+    `claim_next`, in the worker that starts sending them.
+    """
+    run = CampaignRun(
+        profile_id=profile_id,
+        template_id=template_id,
+        status="running",
+        total=len(recipients),
+        window=window or DEFAULT_WINDOW,
+        batch_size=batch_size,
+        min_delay=min_delay,
+        max_delay=max_delay,
+        delay_distribution=delay_distribution,
+    )
+    db.add(run)
+    db.flush()
+
+    _, suppressed = list_index.filter_recipients(profile_id, list(recipients))
+    suppressed_at = set(suppressed)
+    rows: List[dict] = []
+    for position, (recipient, ctx) in enumerate(zip(recipients, vars_list)):
+        rows.append(
+            {
+                "run_id": run.id,
+                "position": position,
+                "recipient": recipient,
+                "context": ctx,
+                "status": "suppressed" if position in suppressed_at else "pending",
+                "attempt": 0,
+            }
+        )
+        if len(rows) >= INSERT_CHUNK:
+            db.execute(insert(CampaignRecipient), rows)
+            rows.clear()
+    if rows:
+        db.execute(insert(CampaignRecipient), rows)
+    run.suppressed = len(suppressed_at)
+    db.commit()
+    db.refresh(run)
+    return run
+
+
+def mark_undeliverable(db: Session, run_id: int) -> int:
+    """
+    Fail the run's pending recipients whose domain can't receive mail, after
+    one concurrent MX warm-up for all of them (which also fills this
+    process's mx_cache for the sends that follow). Returns how many failed.
+    """
+    pending = (
+        db.query(CampaignRecipient.id, CampaignRecipient.recipient)
+        .filter(
+            CampaignRecipient.run_id == run_id,
+            CampaignRecipient.status == "pending",
+        )
+        .all()
+    )
+    dead = [pending[i].id for i in mx_cache.undeliverable([r for _, r in pending])]
+    for start in range(0, len(dead), INSERT_CHUNK):
+        db.execute(
+            update(CampaignRecipient)
+            .where(CampaignRecipient.id.in_(dead[start : start + INSERT_CHUNK]))
+            .values(status="error", detail="recipient domain does not accept mail")
+        )
+    if dead:
+        db.execute(
+            update(CampaignRun)
+            .where(CampaignRun.id == run_id)
+            .values(failed=CampaignRun.failed + len(dead))
+        )
+    db.commit()
+    return len(dead)
+
+
+def claim_next(db: Session, run_id: int) -> Tuple[Optional[dict], List[dict]]:
+    """
+    Mark the next recipients as queued, up to the run's free window, and
+    return `(run_info, items)` for the caller to enqueue. Completes the run
+    when nothing is pending or in flight.
+    """
+    run = (
+        db.query(CampaignRun).filter_by(id=run_id).with_for_update().one_or_none()
+    )
+    if run is None or run.status != "running":
+        db.commit()
+        return None, []
+
+    free = run.window - run.in_flight
+    batch = []
+    if free > 0:
+        batch = (
+            db.query(CampaignRecipient)
+            .filter(
+                CampaignRecipient.run_id == run_id,
+                CampaignRecipient.position >= run.cursor,
+                CampaignRecipient.status == "pending",
+            )
+            .order_by(CampaignRecipient.position)
+            .limit(free)
+            .all()
+        )
+    if not batch:
+        if run.in_flight <= 0:
+            run.status = "completed"
+            run.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        return None, []
+
+    now = datetime.now(timezone.utc)
+    for rec in batch:
+        rec.status = "queued"
+        rec.attempt += 1
+        rec.claimed_at = now
+    run.cursor = batch[-1].position + 1
+    run.in_flight += len(batch)
+    info = {
+        "run_id": run.id,
+        "profile_id": run.profile_id,
+        "template_id": run.template_id,
+        "batch_size": run.batch_size,
+        "min_delay": run.min_delay,
+        "max_delay": run.max_delay,
+        "delay_distribution": run.delay_distribution,
+    }
+    items = [
+        {
+            "id": rec.id,
+            "recipient": rec.recipient,
+            "context": rec.context or {},
+            "attempt": rec.attempt,
+        }
+        for rec in batch
+    ]
+    db.commit()
+    return info, items
+
+
+def claim_recipient(db: Session, recipient_id: int, attempt: int) -> bool:
+    """
+    Called by a send task before sending. False means skip: the item is
+    stale (re-queued since), or its run was paused or stopped meanwhile, in
+    which case it is released from the window here. True renews the item's
+    lease for the send that follows.
+    """
+    rec = db.query(CampaignRecipient).get(recipient_id)
+    if rec is None or rec.status != "queued" or rec.attempt != attempt:
+        return False
+    run = db.query(CampaignRun).get(rec.run_id)
+    if run.status == "running":
+        rec.claimed_at = datetime.now(timezone.utc)
+        db.commit()
+        return True
+    if run.status == "paused":
+        rec.status = "pending"
+        values = {
+            "cursor": case(
+                (CampaignRun.cursor > rec.position, rec.position),
+                else_=CampaignRun.cursor,
+            )
+        }
+    else:
+        rec.status = "cancelled"
+        values = {}
+    db.execute(
+        update(CampaignRun)
+        .where(CampaignRun.id == run.id)
+        .values(in_flight=CampaignRun.in_flight - 1, **values)
+    )
+    db.commit()
+    return False
+
+
+def complete_recipient(
+    db: Session,
+    recipient_id: int,
+    attempt: int,
+    status: str,
+    detail: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Record a send outcome ("sent", "error" or "suppressed") and release its
+    window slot. Returns the run id when the window should be refilled.
+    """
+    rec = db.query(CampaignRecipient).get(recipient_id)
+    if rec is None or rec.attempt != attempt or rec.status not in ("queued", "pending"):
+        return None
+    # "pending" here means a resume reset the item after its lease ran out
+    # while it was being sent; the resume already took it out of in_flight,
+    # so only the outcome is recorded
+    in_flight = CampaignRun.in_flight - (1 if rec.status == "queued" else 0)
+    rec.status = status
+    rec.detail = detail
+    counter = _COUNTERS[status]
+    db.execute(
+        update(CampaignRun)
+        .where(CampaignRun.id == rec.run_id)
+        .values(in_flight=in_flight, **{counter: getattr(CampaignRun, counter) + 1})
+    )
+    db.commit()
+    run = db.query(CampaignRun).get(rec.run_id)
+    db.refresh(run)
+    events.publish(
+        "campaign",
+        run_id=run.id,
+        profile_id=run.profile_id,
+        recipient=rec.recipient,
+        outcome=status,
+        detail=detail,
+        run_status=run.status,
+        sent=run.sent,
+        failed=run.failed,
+        suppressed=run.suppressed,
+        in_flight=run.in_flight,
+    )
+    if run.status == "running" and run.in_flight <= run.window // 2:
+        return run.id
+    return None
+
+
+def active_run(db: Session, profile_id: int) -> Optional[CampaignRun]:
+    return (
+        db.query(CampaignRun)
+        .filter(CampaignRun.profile_id == profile_id, CampaignRun.status.in_(ACTIVE))
+        .order_by(CampaignRun.id.desc())
+        .first()
+    )
+
+
+def pause(db: Session, run: CampaignRun) -> None:
+    """Stop handing out recipients; queued sends return to pending as they arrive."""
+    run.status = "paused"
+    db.commit()
+
+
+def stop(db: Session, run: CampaignRun) -> None:
+    """End the run for good; queued sends are cancelled as they arrive."""
+    run.status = "stopped"
+    run.finished_at = datetime.now(timezone.utc)
+    db.commit()
+
+
+def resume(db: Session, run_id: int) -> bool:
+    """
+    Put queued recipients whose lease has run out back to pending and rewind
+    the cursor. Their tasks still sitting on the broker carry an old attempt
+    number and will be skipped. Recipients claimed or started within
+    SEND_LEASE stay in flight, since their send may be under way; a send
+    that outlives its lease can still go out twice. A run that was stopped
+    or completed in the meantime is left alone; returns whether it resumed.
+    """
+    run = (
+        db.query(CampaignRun).filter_by(id=run_id).with_for_update().one_or_none()
+    )
+    if run is None or run.status not in ACTIVE:
+        db.commit()
+        return False
+
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=SEND_LEASE)
+    queued = (CampaignRecipient.run_id == run_id) & (CampaignRecipient.status == "queued")
+    db.execute(
+        update(CampaignRecipient)
+        .where(
+            queued,
+            CampaignRecipient.claimed_at.is_(None) | (CampaignRecipient.claimed_at < cutoff),
+        )
+        .values(status="pending")
+    )
+    in_flight = db.query(func.count(CampaignRecipient.id)).filter(queued).scalar()
+    first_pending = (
+        db.query(func.min(CampaignRecipient.position))
+        .filter(
+            CampaignRecipient.run_id == run_id,
+            CampaignRecipient.status == "pending",
+        )
+        .scalar()
+    )
+    run.status = "running"
+    run.in_flight = in_flight
+    run.cursor = first_pending if first_pending is not None else run.total
+    db.commit()
+    return True
+
+
+def stale_runs(db: Session) -> List[int]:
+    """Running runs with work in flight that have made no progress lately."""
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=STALE_AFTER)
+    return [
+        run_id
+        for (run_id,) in db.query(CampaignRun.id).filter(
+            CampaignRun.status == "running",
+            CampaignRun.in_flight > 0,
+            CampaignRun.updated_at < cutoff,
+        )
+    ]
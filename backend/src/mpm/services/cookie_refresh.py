@@ -0,0 +1,197 @@
+"""
+Bulk cookie refresh for Telegram profiles (AutomationJob kind "cookie_refresh").
+
+Each profile's saved storage state (services.state_store) is reopened on the
+shared browser pool (services.browser_pool). At most
+COOKIE_REFRESH_CONCURRENCY refreshes run at once, and at most
+COOKIE_REFRESH_PER_PROXY through any one proxy. Profiles without a proxy
+count as one group, because they share the host's address.
+
+Results come back to the job's thread. Every COOKIE_REFRESH_WRITE_BATCH
+results, or every WRITE_INTERVAL seconds, they are written in one commit:
+the job's counters and per-profile results, plus the profiles whose state
+actually changed.
+"""
+import asyncio
+import os
+import queue
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from mpm.models import AutomationJob, PlatformEnum, Profile
+from mpm.services.browser_pool import browser_pool
+from mpm.services.state_store import set_profile_state, state_store
+
+CONCURRENCY = int(os.getenv("COOKIE_REFRESH_CONCURRENCY", 16))
+PER_PROXY = int(os.getenv("COOKIE_REFRESH_PER_PROXY", 4))
+TIMEOUT = float(os.getenv("COOKIE_REFRESH_TIMEOUT", 60))
+WRITE_BATCH = int(os.getenv("COOKIE_REFRESH_WRITE_BATCH", 50))
+# Seconds between writes while results trickle in
+WRITE_INTERVAL = 2.0
+KIND = "cookie_refresh"
+
+# (storage_state, proxy) -> {storage_state, user_agent, ...}
+Refresher = Callable[[dict, Optional[str]], Awaitable[dict]]
+Outcome = Tuple["Target", Optional[dict], Optional[str]]
+
+
+@dataclass
+class Target:
+    profile_id: int
+    proxy: Optional[str]
+    storage_state_ref: Optional[str]
+
+
+def select_targets(
+    db: Session, profile_ids: Optional[List[int]] = None, proxy: Optional[str] = None
+) -> List[Target]:
+    """Telegram profiles to refresh: all of them, or those matching the filters."""
+    q = db.query(Profile).filter(Profile.platform == PlatformEnum.telegram)
+    if profile_ids:
+        q = q.filter(Profile.id.in_(profile_ids))
+    if proxy:
+        q = q.filter(Profile.proxy == proxy)
+    return [
+        Target(p.id, p.proxy or None, p.storage_state_ref)
+        for p in q.order_by(Profile.id)
+    ]
+
+
+async def refresh_all(
+    targets: List[Target],
+    on_result: Callable[[Target, Optional[dict], Optional[str]], None],
+    refresh: Refresher,
+    concurrency: int = CONCURRENCY,
+    per_proxy: int = PER_PROXY,
+    timeout: float = TIMEOUT,
+) -> None:
+    """
+    Refresh every target under the global and per-proxy caps, calling
+    `on_result(target, result, error)` as each one finishes.
+    """
+    overall = asyncio.Semaphore(concurrency)
+    lanes = {}
+
+    async def one(t: Target) -> None:
+        lane = lanes.setdefault(t.proxy, asyncio.Semaphore(per_proxy))
+        # take the proxy's slot first, so a busy proxy doesn't hold global ones
+        async with lane, overall:
+            try:
+                if not t.storage_state_ref:
+                    raise ValueError("No storage state on this profile. Capture first.")
+                try:
+                    state = await asyncio.to_thread(state_store.get, t.storage_state_ref)
+                except KeyError:
+                    raise ValueError("Stored state is missing. Capture again.") from None
+                result = await asyncio.wait_for(refresh(state, t.proxy), timeout)
+            except Exception as e:
+                on_result(t, None, str(e) or type(e).__name__)
+            else:
+                on_result(t, result, None)
+
+    await asyncio.gather(*(one(t) for t in targets))
+
+
+def create_job(
+    db: Session,
+    profile_ids: Optional[List[int]] = None,
+    proxy: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    per_proxy: Optional[int] = None,
+) -> AutomationJob:
+    job = AutomationJob(
+        id=uuid.uuid4().hex,
+        kind=KIND,
+        status="queued",
+        params={
+            "profile_ids": profile_ids,
+            "proxy": proxy,
+            "concurrency": concurrency,
+            "per_proxy": per_proxy,
+        },
+        results=[],
+    )
+    db.add(job)
+    db.commit()
+    return job
+
+
+def _write(db: Session, job: AutomationJob, outcomes: List[Outcome]) -> None:
+    refreshed = {t.profile_id: result for t, result, _ in outcomes if result is not None}
+    changed = set()
+    for prof in db.query(Profile).filter(Profile.id.in_(refreshed)):
+        result = refreshed[prof.id]
+        if set_profile_state(prof, result["storage_state"], result.get("user_agent")):
+            changed.add(prof.id)
+    job.results = list(job.results or []) + [
+        {
+            "profile_id": t.profile_id,
+            "status": "ok" if error is None else "error",
+            "changed": t.profile_id in changed,
+            "detail": error,
+        }
+        for t, _, error in outcomes
+    ]
+    job.succeeded += len(refreshed)
+    job.failed += len(outcomes) - len(refreshed)
+    db.commit()
+
+
+def run_refresh_job(db: Session, job_id: str, refresh: Optional[Refresher] = None) -> None:
+    """Run a queued cookie refresh job to completion, recording progress as it goes."""
+    job = db.query(AutomationJob).get(job_id)
+    if job is None or job.status != "queued":
+        return
+    if refresh is None:
+        from mpm.connectors.playwright_automation import PlaywrightAutomation
+
+        refresh = PlaywrightAutomation(headless=True).load_storage_state_async
+    params = job.params or {}
+    targets = select_targets(db, params.get("profile_ids"), params.get("proxy"))
+    job.status = "running"
+    job.started_at = datetime.now(timezone.utc)
+    job.total = len(targets)
+    db.commit()
+
+    done: "queue.Queue[Outcome]" = queue.Queue()
+    try:
+        future = browser_pool.submit(
+            refresh_all(
+                targets,
+                lambda *outcome: done.put(outcome),
+                refresh,
+                concurrency=params.get("concurrency") or CONCURRENCY,
+                per_proxy=params.get("per_proxy") or PER_PROXY,
+            )
+        )
+        pending: List[Outcome] = []
+        last_write = time.monotonic()
+        # every result is queued before the future completes
+        while not (future.done() and done.empty()):
+            try:
+                pending.append(done.get(timeout=0.2))
+            except queue.Empty:
+                pass
+            if len(pending) >= WRITE_BATCH or (
+                pending and time.monotonic() - last_write >= WRITE_INTERVAL
+            ):
+                _write(db, job, pending)
+                pending = []
+                last_write = time.monotonic()
+        if pending:
+            _write(db, job, pending)
+        future.result()
+    except Exception as e:
+        db.rollback()
+        job.status = "failed"
+        job.detail = str(e)
+    else:
+        job.status = "completed"
+    finally:
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
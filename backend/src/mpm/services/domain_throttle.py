@@ -0,0 +1,430 @@
+"""
+Per-destination throttling for email sends.
+
+Receiving providers throttle by mail server, so besides the per-profile
+bucket every send also passes the caps of its recipient domain's primary MX
+host (`throttle_key`; domains hosted together, e.g. on Google Workspace,
+share one set). Below, "domain" means that key:
+
+* a rate cap: a token bucket per domain whose rate adapts AIMD-style, halved
+  on every 4xx deferral (down to a floor) and raised by a small step on every
+  success (up to the configured cap);
+* a concurrency cap: at most N SMTP transactions per domain at once across
+  all workers (leases in a Redis sorted set, so a crashed worker's slots
+  expire);
+* a backoff window after a deferral, growing exponentially with consecutive
+  deferrals, during which the domain gets no sends at all.
+
+Sends that can't go now are put on the domain's own retry queue in the send
+scheduler (`domain_queue(domain)`), so they wait without holding up the
+profile's other domains. Counters per domain (sent / deferred / failed, the
+current rate and backoff) are exposed by `GET /domains`.
+
+Caps default to DOMAIN_RATE_PER_HOUR / DOMAIN_BURST / DOMAIN_CONCURRENCY and
+can be set per MX host or per recipient domain with DOMAIN_LIMITS, e.g.
+'{"gmail.com": {"per_hour": 1800, "burst": 10, "concurrency": 3}}'. A domain
+named there is throttled on its own rather than under its MX host.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+from mpm.services.backends import select_backend
+from mpm.services.mx_cache import OK, mx_cache
+from mpm.services.mx_cache import recipient_domain  # noqa: F401 (re-exported)
+from mpm.services.rate_limit import rate_limiter
+
+DEFAULT_PER_HOUR = float(os.getenv("DOMAIN_RATE_PER_HOUR", 3600))
+# Sends a domain's bucket lets through back to back
+DEFAULT_BURST = int(os.getenv("DOMAIN_BURST", 5))
+DEFAULT_CONCURRENCY = int(os.getenv("DOMAIN_CONCURRENCY", 5))
+DOMAIN_LIMITS: Dict[str, dict] = json.loads(os.getenv("DOMAIN_LIMITS", "{}") or "{}")
+# Floor for the adaptive rate, as a fraction of the domain's cap
+MIN_RATE_FRACTION = 0.05
+# Additive increase per success, as a fraction of the domain's cap
+INCREASE_FRACTION = 0.02
+DECREASE_FACTOR = 0.5
+BACKOFF_BASE = float(os.getenv("DOMAIN_BACKOFF_BASE", 30))
+BACKOFF_MAX = float(os.getenv("DOMAIN_BACKOFF_MAX", 1800))
+# Deferrals of one message before it is given up as an error
+MAX_DEFERRALS = int(os.getenv("DOMAIN_MAX_DEFERRALS", 5))
+# A concurrency lease not released after this long is considered dead
+SLOT_TTL = 300
+# Delay before retrying a send that found every domain slot taken
+SLOT_RETRY = 1.0
+
+
+def throttle_key(domain: str) -> str:
+    """
+    What a recipient domain is throttled as: its primary MX host, or the
+    domain itself when it has its own DOMAIN_LIMITS entry or no known MX.
+    """
+    domain = domain.lower()
+    if domain in DOMAIN_LIMITS:
+        return domain
+    result = mx_cache.lookup(domain)
+    if result.status == OK and result.hosts:
+        return result.hosts[0].lower()
+    return domain
+
+
+def domain_queue(domain: str) -> str:
+    """Scheduler queue holding a domain's retries."""
+    return f"domain:{domain}"
+
+
+def domain_limits(domain: str) -> Tuple[float, int]:
+    """(max sends per hour, max concurrent transactions) for a domain."""
+    conf = DOMAIN_LIMITS.get(domain, {})
+    return (
+        float(conf.get("per_hour", DEFAULT_PER_HOUR)),
+        int(conf.get("concurrency", DEFAULT_CONCURRENCY)),
+    )
+
+
+def domain_burst(domain: str) -> int:
+    """Size of a domain's token bucket."""
+    return int(DOMAIN_LIMITS.get(domain, {}).get("burst", DEFAULT_BURST))
+
+
+def classify(code: Optional[int]) -> str:
+    """"sent" for 2xx, "deferred" for 4xx, otherwise "failed"."""
+    if code is not None and 200 <= code < 300:
+        return "sent"
+    if code is not None and 400 <= code < 500:
+        return "deferred"
+    return "failed"
+
+
+class DomainStateStore(ABC):
+    """
+    Adaptive state and counters per domain. `rate` is None until the first
+    deferral (i.e. the domain runs at its cap).
+    """
+
+    @abstractmethod
+    def state(self, domain: str) -> dict:
+        ...
+
+    @abstractmethod
+    def record_success(self, domain: str, cap: float) -> None:
+        ...
+
+    @abstractmethod
+    def record_deferral(self, domain: str, cap: float, code: Optional[int]) -> float:
+        """Cut the rate and open a backoff window; returns its length (s)."""
+
+    @abstractmethod
+    def record_failure(self, domain: str, code: Optional[int]) -> None:
+        ...
+
+    @abstractmethod
+    def acquire_slot(self, domain: str, limit: int) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def release_slot(self, domain: str, token: str) -> None:
+        ...
+
+    @abstractmethod
+    def domains(self) -> List[str]:
+        ...
+
+    @abstractmethod
+    def reset(self, domain: str) -> None:
+        ...
+
+
+def _backoff(deferrals: int) -> float:
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(0, deferrals - 1))
+
+
+class MemoryDomainStateStore(DomainStateStore):
+    """Per-domain state dicts and slot leases, on an injectable clock."""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._states: Dict[str, dict] = {}
+        self._slots: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, domain):
+        return self._states.setdefault(
+            domain,
+            {
+                "rate": None,
+                "backoff_until": 0.0,
+                "consecutive_deferrals": 0,
+                "sent": 0,
+                "deferred": 0,
+                "failed": 0,
+                "last_code": None,
+            },
+        )
+
+    def state(self, domain):
+        with self._lock:
+            st = dict(self._get(domain))
+            st["in_flight"] = len(self._live_slots(domain))
+        return st
+
+    def record_success(self, domain, cap):
+        with self._lock:
+            st = self._get(domain)
+            st["sent"] += 1
+            st["consecutive_deferrals"] = 0
+            if st["rate"] is not None:
+                st["rate"] = min(cap, st["rate"] + cap * INCREASE_FRACTION)
+                if st["rate"] >= cap:
+                    st["rate"] = None
+
+    def record_deferral(self, domain, cap, code):
+        with self._lock:
+            st = self._get(domain)
+            st["deferred"] += 1
+            st["last_code"] = code
+            st["consecutive_deferrals"] += 1
+            rate = cap if st["rate"] is None else st["rate"]
+            st["rate"] = max(cap * MIN_RATE_FRACTION, rate * DECREASE_FACTOR)
+            backoff = _backoff(st["consecutive_deferrals"])
+            st["backoff_until"] = self._clock() + backoff
+        return backoff
+
+    def record_failure(self, domain, code):
+        with self._lock:
+            st = self._get(domain)
+            st["failed"] += 1
+            st["last_code"] = code
+
+    def _live_slots(self, domain):
+        slots = self._slots.setdefault(domain, {})
+        now = self._clock()
+        for token in [t for t, exp in slots.items() if exp <= now]:
+            del slots[token]
+        return slots
+
+    def acquire_slot(self, domain, limit):
+        with self._lock:
+            slots = self._live_slots(domain)
+            if len(slots) >= limit:
+                return None
+            token = uuid.uuid4().hex
+            slots[token] = self._clock() + SLOT_TTL
+        return token
+
+    def release_slot(self, domain, token):
+        with self._lock:
+            self._slots.get(domain, {}).pop(token, None)
+
+    def domains(self):
+        with self._lock:
+            return sorted(self._states)
+
+    def reset(self, domain):
+        with self._lock:
+            self._states.pop(domain, None)
+            self._slots.pop(domain, None)
+
+
+# KEYS: state hash; ARGV: cap, now, min fraction, factor, backoff base, max
+_DEFERRAL_LUA = """
+local cap = tonumber(ARGV[1])
+local rate = tonumber(redis.call('HGET', KEYS[1], 'rate')) or cap
+rate = math.max(cap * tonumber(ARGV[3]), rate * tonumber(ARGV[4]))
+local n = redis.call('HINCRBY', KEYS[1], 'consecutive_deferrals', 1)
+local backoff = math.min(tonumber(ARGV[6]), tonumber(ARGV[5]) * 2 ^ (n - 1))
+redis.call('HSET', KEYS[1], 'rate', tostring(rate),
+  'backoff_until', tostring(tonumber(ARGV[2]) + backoff))
+redis.call('HINCRBY', KEYS[1], 'deferred', 1)
+return tostring(backoff)
+"""
+
+# KEYS: state hash; ARGV: cap, increase fraction
+_SUCCESS_LUA = """
+redis.call('HINCRBY', KEYS[1], 'sent', 1)
+redis.call('HSET', KEYS[1], 'consecutive_deferrals', 0)
+local rate = tonumber(redis.call('HGET', KEYS[1], 'rate'))
+if rate then
+  local cap = tonumber(ARGV[1])
+  rate = rate + cap * tonumber(ARGV[2])
+  if rate >= cap then
+    redis.call('HDEL', KEYS[1], 'rate')
+  else
+    redis.call('HSET', KEYS[1], 'rate', tostring(rate))
+  end
+end
+return 1
+"""
+
+# KEYS: slots zset; ARGV: now, limit, token, ttl
+_SLOT_LUA = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+  return 0
+end
+redis.call('ZADD', KEYS[1], tonumber(ARGV[1]) + tonumber(ARGV[4]), ARGV[3])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return 1
+"""
+
+
+class RedisDomainStateStore(DomainStateStore):
+    """
+    `mpm:domain:{domain}` hash (rate, backoff and counters),
+    `mpm:domain:{domain}:slots` lease zset, and a `mpm:domains` registry.
+    """
+
+    def __init__(self, client, prefix: str = "mpm:domain"):
+        self.r = client
+        self.prefix = prefix
+        self._deferral = client.register_script(_DEFERRAL_LUA)
+        self._success = client.register_script(_SUCCESS_LUA)
+        self._slot = client.register_script(_SLOT_LUA)
+
+    def _key(self, domain):
+        return f"{self.prefix}:{domain}"
+
+    def _register(self, domain):
+        self.r.sadd(f"{self.prefix}s", domain)
+
+    def state(self, domain):
+        raw = {
+            (k.decode() if isinstance(k, bytes) else k): v
+            for k, v in self.r.hgetall(self._key(domain)).items()
+        }
+        self.r.zremrangebyscore(f"{self._key(domain)}:slots", "-inf", time.time())
+        return {
+            "rate": float(raw["rate"]) if raw.get("rate") else None,
+            "backoff_until": float(raw.get("backoff_until") or 0),
+            "consecutive_deferrals": int(raw.get("consecutive_deferrals") or 0),
+            "sent": int(raw.get("sent") or 0),
+            "deferred": int(raw.get("deferred") or 0),
+            "failed": int(raw.get("failed") or 0),
+            "last_code": int(raw["last_code"]) if raw.get("last_code") else None,
+            "in_flight": self.r.zcard(f"{self._key(domain)}:slots"),
+        }
+
+    def record_success(self, domain, cap):
+        self._register(domain)
+        self._success(keys=[self._key(domain)], args=[cap, INCREASE_FRACTION])
+
+    def record_deferral(self, domain, cap, code):
+        self._register(domain)
+        if code is not None:
+            self.r.hset(self._key(domain), "last_code", code)
+        backoff = self._deferral(
+            keys=[self._key(domain)],
+            args=[cap, time.time(), MIN_RATE_FRACTION, DECREASE_FACTOR, BACKOFF_BASE, BACKOFF_MAX],
+        )
+        return float(backoff)
+
+    def record_failure(self, domain, code):
+        self._register(domain)
+        pipe = self.r.pipeline()
+        pipe.hincrby(self._key(domain), "failed", 1)
+        if code is not None:
+            pipe.hset(self._key(domain), "last_code", code)
+        pipe.execute()
+
+    def acquire_slot(self, domain, limit):
+        token = uuid.uuid4().hex
+        ok = self._slot(
+            keys=[f"{self._key(domain)}:slots"], args=[time.time(), limit, token, SLOT_TTL]
+        )
+        return token if ok else None
+
+    def release_slot(self, domain, token):
+        self.r.zrem(f"{self._key(domain)}:slots", token)
+
+    def domains(self):
+        return sorted(
+            d.decode() if isinstance(d, bytes) else d
+            for d in self.r.smembers(f"{self.prefix}s")
+        )
+
+    def reset(self, domain):
+        self.r.delete(self._key(domain), f"{self._key(domain)}:slots")
+        self.r.srem(f"{self.prefix}s", domain)
+
+
+domain_state: DomainStateStore = select_backend(
+    "RATE_LIMIT_BACKEND", MemoryDomainStateStore, RedisDomainStateStore
+)
+
+
+def current_rate(domain: str, st: Optional[dict] = None) -> float:
+    """The domain's adaptive rate, in sends per hour."""
+    cap, _ = domain_limits(domain)
+    st = st if st is not None else domain_state.state(domain)
+    return cap if st["rate"] is None else st["rate"]
+
+
+def admit(domain: str, n: int = 1) -> float:
+    """
+    Seconds until `n` sends to `domain` may go: the rest of a backoff window,
+    or until the domain's bucket holds `n` tokens. 0 means go (the tokens
+    are taken); otherwise nothing is taken.
+    """
+    st = domain_state.state(domain)
+    remaining = st["backoff_until"] - time.time()
+    if remaining > 0:
+        return remaining
+    rate = current_rate(domain, st) / 3600.0
+    return rate_limiter.acquire(
+        f"domain:{domain}", rate, domain_burst(domain), n, reserve=False
+    )
+
+
+def acquire_slot(domain: str) -> Optional[str]:
+    """A concurrency lease for one transaction to `domain`, or None if all are taken."""
+    _, concurrency = domain_limits(domain)
+    return domain_state.acquire_slot(domain, concurrency)
+
+
+def release_slot(domain: str, token: Optional[str]) -> None:
+    if token is not None:
+        domain_state.release_slot(domain, token)
+
+
+def record(domain: str, code: Optional[int]) -> Tuple[str, float]:
+    """
+    Feed a send outcome back into the domain's state. Returns the outcome
+    class and, for a deferral, the backoff before retrying.
+    """
+    outcome = classify(code)
+    cap, _ = domain_limits(domain)
+    if outcome == "sent":
+        domain_state.record_success(domain, cap)
+        return outcome, 0.0
+    if outcome == "deferred":
+        return outcome, domain_state.record_deferral(domain, cap, code)
+    domain_state.record_failure(domain, code)
+    return outcome, 0.0
+
+
+def stats() -> List[dict]:
+    """Per-domain metrics for every domain seen so far."""
+    out = []
+    now = time.time()
+    for domain in domain_state.domains():
+        st = domain_state.state(domain)
+        cap, concurrency = domain_limits(domain)
+        out.append(
+            {
+                "domain": domain,
+                "sent": st["sent"],
+                "deferred": st["deferred"],
+                "failed": st["failed"],
+                "in_flight": st["in_flight"],
+                "rate_per_hour": current_rate(domain, st),
+                "max_rate_per_hour": cap,
+                "concurrency": concurrency,
+                "backoff_seconds": max(0.0, st["backoff_until"] - now),
+                "last_code": st["last_code"],
+            }
+        )
+    return out
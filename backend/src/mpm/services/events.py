@@ -0,0 +1,241 @@
+"""
+Live delivery events for the API's event stream (GET /events).
+
+Workers publish an event for every log record (services.log_writer, in one
+batch per buffer flush) and every campaign item outcome (services.campaign)
+to one capped Redis stream
+(`mpm:events`, about EVENTS_STREAM_MAXLEN entries). Each API process runs a
+single EventHub thread that reads the stream and fans events out to its
+subscribers, so an event costs one Redis read per process however many
+clients are watching.
+
+Every subscriber has a bounded queue (EVENTS_CLIENT_BUFFER). A client that
+falls that far behind is cut off instead of letting the queue grow; it
+reconnects with the id of the last event it received and catches up from
+the stream, which keeps recent history for exactly that. Event ids are
+stream ids ("<ms>-<seq>") and only increase.
+"""
+import asyncio
+import collections
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Deque, Iterable, List, Optional, Set, Tuple
+
+from mpm.services.backends import select_backend
+
+STREAM_MAXLEN = int(os.getenv("EVENTS_STREAM_MAXLEN", 100_000))
+CLIENT_BUFFER = int(os.getenv("EVENTS_CLIENT_BUFFER", 1000))
+# Seconds the hub's read blocks waiting for new events
+READ_BLOCK = 1.0
+READ_COUNT = 500
+
+Event = Tuple[str, dict]
+
+logger = logging.getLogger(__name__)
+
+
+def id_key(event_id: str) -> Tuple[int, int]:
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class EventBus(ABC):
+    @abstractmethod
+    def publish(self, event: dict) -> str:
+        """Append an event; returns its id."""
+
+    def publish_many(self, events: List[dict]) -> None:
+        for event in events:
+            self.publish(event)
+
+    @abstractmethod
+    def read(self, after: str, block: float = 0, count: int = READ_COUNT) -> List[Event]:
+        """Events with ids after `after`, oldest first, waiting up to `block` seconds for one."""
+
+    @abstractmethod
+    def last_id(self) -> str:
+        ...
+
+
+class MemoryEventBus(EventBus):
+    """A capped deque with stream-style ids; readers block on a condition."""
+
+    def __init__(self, maxlen: int = STREAM_MAXLEN):
+        self._events: Deque[Event] = collections.deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self._last = (0, 0)
+
+    def publish(self, event):
+        with self._cond:
+            ms = int(time.time() * 1000)
+            last_ms, seq = self._last
+            self._last = (ms, 0) if ms > last_ms else (last_ms, seq + 1)
+            event_id = f"{self._last[0]}-{self._last[1]}"
+            self._events.append((event_id, event))
+            self._cond.notify_all()
+        return event_id
+
+    def read(self, after, block=0, count=READ_COUNT):
+        key = id_key(after)
+        deadline = time.monotonic() + block
+        with self._cond:
+            while True:
+                out = [e for e in self._events if id_key(e[0]) > key][:count]
+                remaining = deadline - time.monotonic()
+                if out or remaining <= 0:
+                    return out
+                self._cond.wait(remaining)
+
+    def last_id(self):
+        with self._cond:
+            return self._events[-1][0] if self._events else "0-0"
+
+
+class RedisEventBus(EventBus):
+    def __init__(self, client, key: str = "mpm:events", maxlen: int = STREAM_MAXLEN):
+        self.r = client
+        self.key = key
+        self.maxlen = maxlen
+
+    def publish(self, event):
+        event_id = self.r.xadd(
+            self.key, {"data": json.dumps(event)}, maxlen=self.maxlen, approximate=True
+        )
+        return event_id.decode()
+
+    def publish_many(self, events):
+        # one round trip for the batch
+        pipe = self.r.pipeline(transaction=False)
+        for event in events:
+            pipe.xadd(
+                self.key, {"data": json.dumps(event)}, maxlen=self.maxlen, approximate=True
+            )
+        pipe.execute()
+
+    def read(self, after, block=0, count=READ_COUNT):
+        if block:
+            reply = self.r.xread({self.key: after}, count=count, block=int(block * 1000))
+            entries = reply[0][1] if reply else []
+        else:
+            # exclusive start: everything after `after`
+            entries = self.r.xrange(self.key, min=f"({after}", count=count)
+        return [(eid.decode(), json.loads(fields[b"data"])) for eid, fields in entries]
+
+    def last_id(self):
+        last = self.r.xrevrange(self.key, count=1)
+        return last[0][0].decode() if last else "0-0"
+
+
+event_bus: EventBus = select_backend("EVENTS_BACKEND", MemoryEventBus, RedisEventBus)
+
+
+def publish(kind: str, **fields) -> None:
+    """Publish an event; failures are logged, never raised into the send path."""
+    try:
+        event_bus.publish({"type": kind, **fields})
+    except Exception as e:
+        logger.warning("event publish failed: %s", e)
+
+
+def publish_many(kind: str, fields: Iterable[dict]) -> None:
+    """`publish` for a batch of events of one kind."""
+    try:
+        event_bus.publish_many([{"type": kind, **f} for f in fields])
+    except Exception as e:
+        logger.warning("event publish failed: %s", e)
+
+
+class Subscription:
+    """One client's filter and bounded queue; None in the queue means it was cut off."""
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        profile_ids: Iterable[int] = (),
+        run_ids: Iterable[int] = (),
+        buffer: int = CLIENT_BUFFER,
+    ):
+        self.loop = loop
+        self.profile_ids: Set[int] = set(profile_ids or ())
+        self.run_ids: Set[int] = set(run_ids or ())
+        self.queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue(maxsize=buffer + 1)
+        self.buffer = buffer
+        self.overflowed = False
+
+    def matches(self, event: dict) -> bool:
+        if not self.profile_ids and not self.run_ids:
+            return True
+        return event.get("profile_id") in self.profile_ids or (
+            event.get("run_id") is not None and event.get("run_id") in self.run_ids
+        )
+
+    def offer(self, item: Event) -> None:
+        # runs on the subscriber's event loop
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.buffer:
+            # too far behind: drop the backlog and tell the reader to disconnect
+            self.overflowed = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+            return
+        self.queue.put_nowait(item)
+
+
+class EventHub:
+    """Reads the bus on one background thread and fans events out to subscribers."""
+
+    def __init__(self, bus: Optional[EventBus] = None):
+        self._bus = bus
+        self._subs: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def bus(self) -> EventBus:
+        return self._bus or event_bus
+
+    def subscribe(self, loop, profile_ids=(), run_ids=(), buffer=CLIENT_BUFFER) -> Subscription:
+        sub = Subscription(loop, profile_ids, run_ids, buffer)
+        with self._lock:
+            self._subs.add(sub)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, args=(self.bus.last_id(),), name="event-hub", daemon=True
+                )
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            self._subs.discard(sub)
+
+    def _run(self, last: str) -> None:
+        while True:
+            try:
+                events = self.bus.read(last, block=READ_BLOCK)
+            except Exception as e:
+                logger.warning("event stream read failed: %s", e)
+                time.sleep(READ_BLOCK)
+                continue
+            if not events:
+                continue
+            last = events[-1][0]
+            with self._lock:
+                subs = list(self._subs)
+            for sub in subs:
+                try:
+                    for item in events:
+                        if sub.matches(item[1]):
+                            sub.loop.call_soon_threadsafe(sub.offer, item)
+                except RuntimeError:
+                    # its event loop is closed
+                    self.unsubscribe(sub)
+
+
+hub = EventHub()
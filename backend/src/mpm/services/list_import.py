@@ -0,0 +1,220 @@
+import csv
+import io
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import BinaryIO, Callable, List, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+import mpm.models as models
+from mpm.services.list_index import safe_update
+
+BATCH_SIZE = int(os.getenv("LIST_IMPORT_BATCH_SIZE", 5000))
+# Per-line error reasons kept in the result; counts keep going past this
+MAX_REPORTED_ERRORS = 100
+REQUIRED_COLUMNS = {"profile_id", "type", "value"}
+
+_LIST_TYPES = {t.value for t in models.ListTypeEnum}
+
+
+class ImportFormatError(ValueError):
+    """The upload can't be imported at all (e.g. missing CSV headers)."""
+
+
+class ImportCancelled(Exception):
+    """Raised from the batch callback when a job's cancel flag is set."""
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    skipped: int = 0
+    errors: List[dict] = field(default_factory=list)
+
+    def skip(self, line: int, reason: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": reason})
+
+    def as_dict(self) -> dict:
+        return {"inserted": self.inserted, "skipped": self.skipped, "errors": self.errors}
+
+
+def _insert_batch(db: Session, rows: List[dict]) -> None:
+    """
+    One round trip per batch: COPY on Postgres, executemany elsewhere
+    (SQLAlchemy turns that into multi-row INSERTs where the driver allows).
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        columns = list(rows[0])
+        cursor = db.connection().connection.cursor()
+        buf = io.StringIO()
+        csv.writer(buf).writerows([r[c] for c in columns] for r in rows)
+        sql = (
+            f"COPY list_entries ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        )
+        if hasattr(cursor, "copy_expert"):  # psycopg2
+            buf.seek(0)
+            cursor.copy_expert(sql, buf)
+            return
+        if hasattr(cursor, "copy"):  # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buf.getvalue())
+            return
+    db.execute(insert(models.ListEntry), rows)
+
+
+def import_list_entries(
+    db: Session,
+    stream: BinaryIO,
+    batch_size: Optional[int] = None,
+    on_batch: Optional[Callable[[List[dict], ImportResult], None]] = None,
+    extra: Optional[dict] = None,
+) -> ImportResult:
+    """
+    Stream a `profile_id,type,value` CSV from a binary file object into
+    list_entries. Rows are parsed incrementally and inserted in batches with
+    one commit per batch, so memory stays flat regardless of file size.
+    `on_batch(rows, result)` is called after each committed batch; `extra`
+    column values are added to every inserted row.
+    """
+    batch_size = batch_size or BATCH_SIZE
+    text = io.TextIOWrapper(stream, encoding="utf-8", errors="ignore", newline="")
+    reader = csv.reader(text)
+    header = [h.strip().lower() for h in next(reader, [])]
+    missing = REQUIRED_COLUMNS - set(header)
+    if missing:
+        raise ImportFormatError(
+            f"CSV must contain headers: {', '.join(sorted(REQUIRED_COLUMNS))}. "
+            f"Missing: {', '.join(sorted(missing))}"
+        )
+    col = {name: header.index(name) for name in REQUIRED_COLUMNS}
+    known_profiles = set(db.scalars(select(models.Profile.id)))
+
+    result = ImportResult()
+    batch: List[dict] = []
+
+    def flush():
+        _insert_batch(db, batch)
+        db.commit()
+        result.inserted += len(batch)
+        by_key: dict = {}
+        for r in batch:
+            by_key.setdefault((r["profile_id"], r["type"]), []).append(r["value"])
+        for (profile_id, list_type), values in by_key.items():
+            safe_update("add", profile_id, list_type, values)
+        if on_batch is not None:
+            on_batch(batch, result)
+        batch.clear()
+
+    for row in reader:
+        line = reader.line_num
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        try:
+            profile_id = int(row[col["profile_id"]])
+            list_type = row[col["type"]].strip().lower()
+            value = row[col["value"]].strip()
+        except IndexError:
+            result.skip(line, "missing columns")
+            continue
+        except ValueError:
+            result.skip(line, "profile_id is not an integer")
+            continue
+        if profile_id not in known_profiles:
+            result.skip(line, f"unknown profile_id {profile_id}")
+        elif list_type not in _LIST_TYPES:
+            result.skip(line, f"invalid type {list_type!r}")
+        elif not value:
+            result.skip(line, "empty value")
+        else:
+            batch.append(
+                {"profile_id": profile_id, "type": list_type, "value": value, **(extra or {})}
+            )
+            if len(batch) >= batch_size:
+                flush()
+
+    if batch:
+        flush()
+    text.detach()
+    return result
+
+
+def delete_job_entries(db: Session, job_id: str, batch_size: Optional[int] = None) -> int:
+    """Delete the rows a background import created, in committed batches."""
+    batch_size = batch_size or BATCH_SIZE
+    touched = db.execute(
+        select(models.ListEntry.profile_id, models.ListEntry.type)
+        .where(models.ListEntry.import_job_id == job_id)
+        .distinct()
+    ).all()
+    deleted = 0
+    while True:
+        ids = select(models.ListEntry.id).where(
+            models.ListEntry.import_job_id == job_id
+        ).limit(batch_size)
+        n = db.execute(
+            delete(models.ListEntry).where(models.ListEntry.id.in_(ids))
+        ).rowcount
+        db.commit()
+        deleted += n
+        if n < batch_size:
+            break
+    # Values may also be listed by other rows; rebuild rather than SREM
+    for profile_id, list_type in touched:
+        safe_update("invalidate", profile_id, list_type)
+    return deleted
+
+
+def run_import_job(db: Session, job_id: str) -> None:
+    """
+    Import a spooled upload for an ImportJob, recording progress after every
+    committed batch. A cancel request stops the import after the current
+    batch; with `rollback_on_cancel` the rows already committed are removed.
+    """
+    job = db.query(models.ImportJob).get(job_id)
+    if job is None or job.status != "queued":
+        return
+    job.status = "running"
+    job.started_at = datetime.now(timezone.utc)
+    db.commit()
+
+    try:
+        with open(job.path, "rb") as f:
+
+            def on_batch(rows: List[dict], result: ImportResult) -> None:
+                job.bytes_processed = f.tell()
+                job.inserted = result.inserted
+                job.skipped = result.skipped
+                job.errors = list(result.errors)
+                db.commit()  # expires `job`, so the flag below is re-read
+                if job.cancel_requested:
+                    raise ImportCancelled()
+
+            result = import_list_entries(
+                db, f, on_batch=on_batch, extra={"import_job_id": job.id}
+            )
+    except ImportCancelled:
+        if job.rollback_on_cancel:
+            delete_job_entries(db, job.id)
+            job.inserted = 0
+        job.status = "cancelled"
+    except Exception as e:
+        db.rollback()
+        job.status = "failed"
+        job.detail = str(e)
+    else:
+        job.inserted = result.inserted
+        job.skipped = result.skipped
+        job.errors = list(result.errors)
+        job.bytes_processed = job.bytes_total
+        job.status = "completed"
+    finally:
+        job.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        try:
+            os.remove(job.path)
+        except OSError:
+            pass
@@ -0,0 +1,312 @@
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import mpm.models as models
+from mpm.database import SessionLocal
+from mpm.services import bloom
+from mpm.services.backends import select_backend
+
+logger = logging.getLogger(__name__)
+
+# Chunk size for bulk membership checks (one round trip per chunk)
+CHECK_CHUNK = 10_000
+# Redis sets are rebuilt from the database at least this often, which bounds
+# how long an update lost while Redis was unreachable can go unnoticed
+REBUILD_AFTER = int(os.getenv("LIST_INDEX_TTL", 3600))
+
+
+def normalize(value: str) -> str:
+    """Recipients are matched case-insensitively, ignoring outer whitespace."""
+    return value.strip().lower()
+
+
+class ListIndex(ABC):
+    """
+    Membership index over ListEntry rows, one set per (profile_id, type).
+    Sets are loaded from the database on first use and kept current through
+    `add` / `remove`, which the lists router and the bulk importer call after
+    committing, so send-time checks never have to query list_entries.
+    `remove` must only be passed values that no longer have any row.
+    """
+
+    @abstractmethod
+    def contains_many(
+        self, profile_id: int, list_type: str, values: Sequence[str]
+    ) -> List[bool]:
+        ...
+
+    @abstractmethod
+    def size(self, profile_id: int, list_type: str) -> int:
+        ...
+
+    @abstractmethod
+    def add(self, profile_id: int, list_type: str, values: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    def remove(self, profile_id: int, list_type: str, values: Iterable[str]) -> None:
+        ...
+
+    @abstractmethod
+    def invalidate(self, profile_id: int, list_type: Optional[str] = None) -> None:
+        ...
+
+    @abstractmethod
+    def version(self, profile_id: int, list_type: str) -> int:
+        ...
+
+    def contains(self, profile_id: int, list_type: str, value: str) -> bool:
+        return self.check(profile_id, list_type, [value])[0]
+
+    def check(
+        self, profile_id: int, list_type: str, values: Sequence[str]
+    ) -> List[bool]:
+        """
+        Membership via the profile's bloom filter when one has been built
+        (hits confirmed against the database), otherwise via the exact set.
+        """
+        bf = bloom.get_filter(profile_id, list_type)
+        if bf is not None:
+            return bloom.screened_contains_many(bf, profile_id, list_type, values)
+        return self.contains_many(profile_id, list_type, values)
+
+    def has_entries(self, profile_id: int, list_type: str) -> bool:
+        # lists big enough for a bloom filter aren't loaded into the index
+        if bloom.get_filter(profile_id, list_type) is not None:
+            return bloom.has_entries(profile_id, list_type)
+        return self.size(profile_id, list_type) > 0
+
+    def filter_recipients(
+        self, profile_id: int, recipients: Sequence[str]
+    ) -> Tuple[List[int], List[int]]:
+        """
+        Split recipient positions into (allowed, suppressed). Blacklisted
+        recipients are always suppressed; when the profile has a non-empty
+        whitelist, recipients not on it are suppressed too.
+        """
+        blocked = self.check(profile_id, "blacklist", recipients)
+        if self.has_entries(profile_id, "whitelist"):
+            listed = self.check(profile_id, "whitelist", recipients)
+            blocked = [b or not w for b, w in zip(blocked, listed)]
+        allowed = [i for i, b in enumerate(blocked) if not b]
+        suppressed = [i for i, b in enumerate(blocked) if b]
+        return allowed, suppressed
+
+    @staticmethod
+    def _load(profile_id: int, list_type: str) -> Iterable[str]:
+        db: Session = SessionLocal()
+        try:
+            rows = db.execute(
+                select(models.ListEntry.value)
+                .where(models.ListEntry.profile_id == profile_id)
+                .where(models.ListEntry.type == list_type)
+                .execution_options(yield_per=10_000)
+            )
+            for (value,) in rows:
+                yield normalize(value)
+        finally:
+            db.close()
+
+
+class MemoryListIndex(ListIndex):
+    """
+    In-process hash sets with a version stamp per key. Router updates only
+    reach lookups made in the same process.
+    """
+
+    def __init__(self):
+        self._sets: Dict[Tuple[int, str], Set[str]] = {}
+        self._versions: Dict[Tuple[int, str], int] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, profile_id: int, list_type: str) -> Set[str]:
+        key = (profile_id, list_type)
+        for _ in range(3):
+            with self._lock:
+                members = self._sets.get(key)
+                version = self._versions.get(key, 0)
+            if members is not None:
+                return members
+            loaded = set(self._load(profile_id, list_type))
+            with self._lock:
+                # an update while loading may be missing from the snapshot
+                if self._versions.get(key, 0) == version:
+                    return self._sets.setdefault(key, loaded)
+        # still changing: answer from a fresh load without caching it
+        return set(self._load(profile_id, list_type))
+
+    def contains_many(self, profile_id, list_type, values):
+        members = self._get(profile_id, list_type)
+        return [normalize(v) in members for v in values]
+
+    def size(self, profile_id, list_type):
+        return len(self._get(profile_id, list_type))
+
+    def add(self, profile_id, list_type, values):
+        key = (profile_id, list_type)
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            members = self._sets.get(key)
+            if members is not None:
+                members.update(normalize(v) for v in values)
+
+    def remove(self, profile_id, list_type, values):
+        key = (profile_id, list_type)
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            members = self._sets.get(key)
+            if members is not None:
+                members.difference_update(normalize(v) for v in values)
+
+    def invalidate(self, profile_id, list_type=None):
+        with self._lock:
+            for t in [list_type] if list_type else ["whitelist", "blacklist"]:
+                key = (profile_id, t)
+                self._sets.pop(key, None)
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def version(self, profile_id, list_type):
+        with self._lock:
+            return self._versions.get((profile_id, list_type), 0)
+
+
+class RedisListIndex(ListIndex):
+    """
+    Redis sets keyed `mpm:lists:{profile_id}:{type}`, shared by the API and
+    every Celery worker. A `:loaded` marker records that the set has been
+    built from the database; `:version` is bumped on every change. Adds go
+    to the set whether or not it is loaded, so a rebuild in progress can't
+    lose them.
+    """
+
+    def __init__(self, client, prefix: str = "mpm:lists"):
+        self.r = client
+        self.prefix = prefix
+
+    def _key(self, profile_id: int, list_type) -> str:
+        # ListTypeEnum members format as "ListTypeEnum.x" on newer Pythons
+        return f"{self.prefix}:{profile_id}:{getattr(list_type, 'value', list_type)}"
+
+    def _ensure_loaded(self, profile_id: int, list_type: str) -> str:
+        from redis.exceptions import WatchError
+
+        key = self._key(profile_id, list_type)
+        if self.r.exists(f"{key}:loaded"):
+            return key
+        # Build into a temp key and swap it in, so readers never see a
+        # half-built set
+        version_key = f"{key}:version"
+        version = self.r.get(version_key)
+        tmp = f"{key}:building:{os.getpid()}"
+        self.r.delete(tmp)
+        chunk: List[str] = []
+        for value in self._load(profile_id, list_type):
+            chunk.append(value)
+            if len(chunk) >= CHECK_CHUNK:
+                self.r.sadd(tmp, *chunk)
+                chunk.clear()
+        if chunk:
+            self.r.sadd(tmp, *chunk)
+        with self.r.pipeline() as pipe:
+            try:
+                pipe.watch(version_key)
+                if pipe.get(version_key) != version:
+                    raise WatchError(version_key)
+                built = pipe.exists(tmp)
+                pipe.multi()
+                if built:
+                    pipe.rename(tmp, key)
+                else:
+                    pipe.delete(key)
+                pipe.set(f"{key}:loaded", 1, ex=REBUILD_AFTER)
+                pipe.incr(version_key)
+                pipe.execute()
+                return key
+            except WatchError:
+                pass
+        # The list changed during the build, so the snapshot may predate an
+        # add that went to `key`: merge instead of replacing, and leave the
+        # set unmarked so the next lookup rebuilds it
+        pipe = self.r.pipeline()
+        pipe.sunionstore(key, key, tmp)
+        pipe.delete(tmp)
+        pipe.execute()
+        return key
+
+    def contains_many(self, profile_id, list_type, values):
+        key = self._ensure_loaded(profile_id, list_type)
+        out: List[bool] = []
+        for start in range(0, len(values), CHECK_CHUNK):
+            chunk = [normalize(v) for v in values[start : start + CHECK_CHUNK]]
+            if chunk:
+                out.extend(bool(x) for x in self.r.smismember(key, chunk))
+        return out
+
+    def size(self, profile_id, list_type):
+        return self.r.scard(self._ensure_loaded(profile_id, list_type))
+
+    def add(self, profile_id, list_type, values):
+        key = self._key(profile_id, list_type)
+        values = [normalize(v) for v in values]
+        pipe = self.r.pipeline()
+        # Sets that aren't built yet still take the values: a rebuild may be
+        # reading a snapshot from before they were committed
+        if values:
+            for start in range(0, len(values), CHECK_CHUNK):
+                pipe.sadd(key, *values[start : start + CHECK_CHUNK])
+        pipe.incr(f"{key}:version")
+        pipe.execute()
+
+    def remove(self, profile_id, list_type, values):
+        key = self._key(profile_id, list_type)
+        values = [normalize(v) for v in values]
+        pipe = self.r.pipeline()
+        if values:
+            pipe.srem(key, *values)
+        pipe.incr(f"{key}:version")
+        pipe.execute()
+
+    def invalidate(self, profile_id, list_type=None):
+        pipe = self.r.pipeline()
+        for t in [list_type] if list_type else ["whitelist", "blacklist"]:
+            key = self._key(profile_id, t)
+            pipe.delete(key, f"{key}:loaded")
+            pipe.incr(f"{key}:version")
+        pipe.execute()
+
+    def version(self, profile_id, list_type):
+        return int(self.r.get(f"{self._key(profile_id, list_type)}:version") or 0)
+
+
+list_index: ListIndex = select_backend(
+    "LIST_INDEX_BACKEND", MemoryListIndex, RedisListIndex
+)
+
+
+def safe_update(op: str, profile_id: int, list_type: str, values: Iterable[str] = ()):
+    """
+    Apply an index update ("add", "remove" or "invalidate") after a committed
+    write. The database is the source of truth, so an unreachable index must
+    not fail the write; if the update can't be applied, the key is dropped so
+    it is rebuilt on next use.
+    """
+    try:
+        if op == "invalidate":
+            list_index.invalidate(profile_id, list_type)
+        else:
+            getattr(list_index, op)(profile_id, list_type, values)
+        if op == "add":
+            # Bloom filters only grow; removals are caught by the DB confirm
+            bloom.add_values(profile_id, list_type, values)
+    except Exception as e:
+        logger.warning("list index %s failed for %s/%s: %s", op, profile_id, list_type, e)
+        try:
+            list_index.invalidate(profile_id, list_type)
+        except Exception:
+            pass
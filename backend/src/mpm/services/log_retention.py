@@ -0,0 +1,197 @@
+"""
+Send-log retention and archival.
+
+Each profile keeps its logs for `log_retention_days` (NULL: LOG_RETENTION_DAYS;
+0 keeps them forever). Everything removed is first written to gzipped NDJSON
+under LOG_ARCHIVE_DIR. The stats rollups (services.log_stats) are not touched,
+so dashboards keep their history; only the minute rollup is pruned, after
+LOG_STATS_MINUTE_DAYS.
+
+On Postgres, log_entries is partitioned by month (log_entries_yYYYYmMM, plus
+a default partition). `ensure_partitions` keeps the next few months created,
+and a month older than the longest retention of any profile is archived and
+dropped whole, so inserts and queries only ever touch live partitions.
+Months are dropped whole, so rows can outlive that retention by up to a
+month. Profiles with a shorter retention have their older rows removed in
+batched deletes.
+
+SQLite has no partitions; every profile's expired rows go through the
+batched deletes.
+"""
+import gzip
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import Session
+
+from mpm.models import LogEntry, LogStatMinute, Profile
+
+DEFAULT_RETENTION_DAYS = int(os.getenv("LOG_RETENTION_DAYS", 0))
+ARCHIVE_DIR = os.getenv("LOG_ARCHIVE_DIR", "./log_archive")
+DELETE_BATCH = int(os.getenv("LOG_RETENTION_BATCH", 5000))
+MINUTE_STATS_DAYS = int(os.getenv("LOG_STATS_MINUTE_DAYS", 30))
+# Months of partitions kept created ahead of now
+MONTHS_AHEAD = 2
+ARCHIVE_FETCH_SIZE = 10_000
+
+PARTITION_PREFIX = "log_entries_y"
+COLUMNS = [c.name for c in LogEntry.__table__.columns]
+
+logger = logging.getLogger(__name__)
+
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+
+def _month_start(ts: datetime) -> datetime:
+    return ts.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(ts: datetime) -> datetime:
+    return (ts.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARTITION_PREFIX}{month.year:04d}m{month.month:02d}"
+
+
+def retention_days(db: Session) -> Dict[int, int]:
+    """Effective retention per profile id (0 = forever)."""
+    return {
+        pid: DEFAULT_RETENTION_DAYS if days is None else days
+        for pid, days in db.execute(select(Profile.id, Profile.log_retention_days))
+    }
+
+
+def _archive(path: str, rows: Iterable[tuple]) -> int:
+    """Append rows to a gzipped NDJSON file (each call adds a gzip member)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    n = 0
+    with gzip.open(path, "at", encoding="utf-8") as f:
+        for row in rows:
+            record = dict(zip(COLUMNS, row))
+            if record["timestamp"] is not None:
+                record["timestamp"] = record["timestamp"].isoformat()
+            f.write(json.dumps(record) + "\n")
+            n += 1
+    return n
+
+
+def purge_profile(db: Session, profile_id: int, cutoff: datetime) -> int:
+    """
+    Archive and delete a profile's rows older than `cutoff`, DELETE_BATCH at
+    a time with a commit after each batch, so locks stay short. Returns the
+    rows removed.
+    """
+    path = os.path.join(
+        ARCHIVE_DIR, f"log_entries_p{profile_id}_{cutoff:%Y%m%d}.ndjson.gz"
+    )
+    cols = [getattr(LogEntry, c) for c in COLUMNS]
+    total = 0
+    while True:
+        rows = db.execute(
+            select(*cols)
+            .where(LogEntry.profile_id == profile_id, LogEntry.timestamp < cutoff)
+            .order_by(LogEntry.id)
+            .limit(DELETE_BATCH)
+        ).all()
+        if not rows:
+            return total
+        _archive(path, rows)
+        db.execute(delete(LogEntry).where(LogEntry.id.in_([r.id for r in rows])))
+        db.commit()
+        total += len(rows)
+
+
+def ensure_partitions(db: Session, now: Optional[datetime] = None) -> List[str]:
+    """Create this month's and the next MONTHS_AHEAD months' partitions (Postgres)."""
+    if not _is_postgres(db):
+        return []
+    month = _month_start(now or datetime.now(timezone.utc))
+    created = []
+    for _ in range(MONTHS_AHEAD + 1):
+        name = partition_name(month)
+        end = _next_month(month)
+        db.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF log_entries "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+            )
+        )
+        created.append(name)
+        month = end
+    db.commit()
+    return created
+
+
+def partitions(db: Session) -> List[Tuple[str, datetime]]:
+    """Monthly partitions of log_entries as (name, month start), oldest first."""
+    names = db.scalars(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'log_entries'"
+        )
+    )
+    out = []
+    for name in names:
+        if not name.startswith(PARTITION_PREFIX):
+            continue  # the default partition
+        year, month = name[len(PARTITION_PREFIX):].split("m")
+        out.append((name, datetime(int(year), int(month), 1, tzinfo=timezone.utc)))
+    return sorted(out, key=lambda p: p[1])
+
+
+def drop_partition(db: Session, name: str) -> int:
+    """Archive a whole monthly partition, then detach and drop it."""
+    path = os.path.join(ARCHIVE_DIR, f"{name}.ndjson.gz")
+    tmp = path + ".tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    query = text(f"SELECT {', '.join(COLUMNS)} FROM {name} ORDER BY timestamp, id")
+    rows = db.execute(query.execution_options(yield_per=ARCHIVE_FETCH_SIZE))
+    n = _archive(tmp, rows)
+    # the archive is complete before anything is dropped
+    os.replace(tmp, path)
+    db.execute(text(f"ALTER TABLE log_entries DETACH PARTITION {name}"))
+    db.execute(text(f"DROP TABLE {name}"))
+    db.commit()
+    return n
+
+
+def run_retention(db: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Apply every profile's retention; returns counts of what was removed."""
+    now = now or datetime.now(timezone.utc)
+    days = retention_days(db)
+    result = {"partitions_dropped": 0, "rows_archived": 0, "minute_stats_deleted": 0}
+
+    # Partitions can only go once no profile wants any of their rows
+    horizon = None
+    if _is_postgres(db) and days and all(days.values()):
+        horizon = max(days.values())
+        for name, month in partitions(db):
+            if _next_month(month) > now - timedelta(days=horizon):
+                break
+            result["rows_archived"] += drop_partition(db, name)
+            result["partitions_dropped"] += 1
+            logger.info("archived and dropped log partition %s", name)
+
+    for pid, keep in days.items():
+        if keep and (horizon is None or keep < horizon):
+            result["rows_archived"] += purge_profile(db, pid, now - timedelta(days=keep))
+
+    if MINUTE_STATS_DAYS:
+        deleted = db.execute(
+            delete(LogStatMinute).where(
+                LogStatMinute.bucket < now - timedelta(days=MINUTE_STATS_DAYS)
+            )
+        )
+        result["minute_stats_deleted"] = deleted.rowcount
+        db.commit()
+    return result
@@ -0,0 +1,102 @@
+"""
+Delivery statistics rolled up from LogEntry rows.
+
+Counts per (bucket, profile_id, action, status) are kept in two tables, one
+with minute buckets and one with hour buckets. The log writer (see
+services.log_writer) upserts the counts for each batch in the same
+transaction as the batch's rows, so the rollups never drift from the raw
+log. GET /logs/stats reads only the rollups.
+
+`backfill` rebuilds a range of both tables from the raw rows, for logs
+written before the rollups existed. Run it over closed ranges (the default
+stops at the start of the current hour): a batch committed while a range is
+being rebuilt can be counted twice.
+"""
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from mpm.models import LogEntry, LogStatHour, LogStatMinute
+
+PERIODS = {"minute": LogStatMinute, "hour": LogStatHour}
+BACKFILL_FETCH_SIZE = 10_000
+# keys per upsert statement (SQLite caps bound parameters per statement)
+UPSERT_SLICE = 1000
+
+
+def bucket(ts: datetime, period: str) -> datetime:
+    """Start of the minute or hour containing `ts`, in UTC (naive means UTC)."""
+    ts = ts.astimezone(timezone.utc) if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+    ts = ts.replace(second=0, microsecond=0)
+    return ts.replace(minute=0) if period == "hour" else ts
+
+
+def aggregate(rows: Iterable[dict]) -> Dict[str, Counter]:
+    """Per-period counts for log rows (dicts with LogEntry's columns)."""
+    counts = {period: Counter() for period in PERIODS}
+    for row in rows:
+        ts = row.get("timestamp") or datetime.now(timezone.utc)
+        for period, c in counts.items():
+            c[(bucket(ts, period), row["profile_id"], row["action"], row["status"])] += 1
+    return counts
+
+
+def _upsert(db: Session, model, counts: Counter) -> None:
+    if not counts:
+        return
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    # a fixed key order, so concurrent writers lock rows in the same order
+    values = [
+        {"bucket": b, "profile_id": p, "action": a, "status": s, "count": n}
+        for (b, p, a, s), n in sorted(counts.items())
+    ]
+    for lo in range(0, len(values), UPSERT_SLICE):
+        stmt = insert(model).values(values[lo : lo + UPSERT_SLICE])
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["bucket", "profile_id", "action", "status"],
+                set_={"count": model.count + stmt.excluded.count},
+            )
+        )
+
+
+def record(db: Session, rows: Iterable[dict]) -> None:
+    """Add `rows` to the rollups; the caller commits."""
+    for period, counts in aggregate(rows).items():
+        _upsert(db, PERIODS[period], counts)
+
+
+def backfill(
+    db: Session, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> int:
+    """
+    Rebuild both rollups for [since, until) from LogEntry, widened to whole
+    hours. Without `since` everything logged so far is rebuilt; `until`
+    defaults to the start of the current hour. Returns the rows counted.
+    """
+    until = bucket(until or datetime.now(timezone.utc), "hour")
+    since = bucket(since, "hour") if since is not None else None
+    for model in PERIODS.values():
+        stmt = delete(model).where(model.bucket < until)
+        if since is not None:
+            stmt = stmt.where(model.bucket >= since)
+        db.execute(stmt)
+
+    query = select(
+        LogEntry.profile_id, LogEntry.action, LogEntry.status, LogEntry.timestamp
+    ).where(LogEntry.timestamp < until)
+    if since is not None:
+        query = query.where(LogEntry.timestamp >= since)
+    rows = db.execute(query.execution_options(yield_per=BACKFILL_FETCH_SIZE)).mappings()
+
+    total = 0
+    for chunk in rows.partitions():
+        record(db, chunk)
+        total += len(chunk)
+    db.commit()
+    return total
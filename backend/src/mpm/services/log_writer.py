@@ -0,0 +1,229 @@
+"""
+Buffered LogEntry writes for the send tasks.
+
+Tasks hand their log records to `log_writer.write` instead of committing a
+LogEntry each: records are buffered per worker process and inserted in one
+multi-row INSERT once LOG_BATCH_SIZE are waiting or the oldest has waited
+LOG_FLUSH_INTERVAL seconds (a daemon thread flushes on the timer), together
+with the batch's counts for the stats rollups (services.log_stats). The
+buffer is flushed on worker shutdown and at interpreter exit. Each flush
+also publishes its records as live events (services.events) in one batch,
+so the send path never waits on the event stream.
+
+If an insert fails (database down, locked, ...) the batch is appended to a
+JSON-lines spool file (LOG_SPOOL_PATH) instead of being dropped; every later
+flush replays the spool in its own insert, so a spool that can't be written
+yet never holds back new records. A batch rejected for its data (integrity
+or data errors, e.g. a profile deleted since) is split until the offending
+records are found; those go to `<LOG_SPOOL_PATH>.rejected` and the rest are
+written. Timestamps are taken when the record is written, not when it is
+flushed. Records still buffered when a
+worker is killed outright (SIGKILL, OOM) are lost; set LOG_BATCH_SIZE=1 to
+commit every record as before.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+
+from mpm.database import SessionLocal
+from mpm.models import LogEntry
+from mpm.services import events, log_stats
+
+BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 200))
+FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 1.0))
+SPOOL_PATH = os.getenv("LOG_SPOOL_PATH", "./log_spool.jsonl")
+
+logger = logging.getLogger(__name__)
+
+
+class LogWriter:
+    def __init__(
+        self,
+        session_factory: Callable = SessionLocal,
+        batch_size: int = BATCH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        spool_path: str = SPOOL_PATH,
+        clock=time.monotonic,
+    ):
+        self.session_factory = session_factory
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self._clock = clock
+        self._reset()
+
+    def _reset(self):
+        # also called in a forked child: the parent's buffer, lock and
+        # timer thread don't carry over
+        self._pid = os.getpid()
+        self._buffer: List[dict] = []
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+        # held for the whole insert so flushes (and spool replays) don't interleave
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _start_timer(self):
+        if self._thread is None and self.flush_interval > 0:
+            self._thread = threading.Thread(
+                target=self._run, name="log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush(due_only=True)
+            except Exception:
+                logger.exception("log flush failed")
+
+    def write(
+        self, profile_id: int, action: str, status: str, detail: Optional[str] = None
+    ) -> None:
+        if os.getpid() != self._pid:
+            self._reset()
+        record = {
+            "profile_id": profile_id,
+            "action": action,
+            "status": status,
+            "detail": detail,
+            "timestamp": datetime.now(timezone.utc),
+        }
+        with self._lock:
+            self._buffer.append(record)
+            if self._oldest is None:
+                self._oldest = self._clock()
+            full = len(self._buffer) >= self.batch_size
+            self._start_timer()
+        if full:
+            self.flush()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._buffer)
+
+    def flush(self, due_only: bool = False) -> int:
+        """
+        Insert everything buffered, then replay the spool; returns the number
+        of buffered records written to the database. With `due_only` nothing
+        happens unless the oldest record has waited a full interval.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._buffer or (
+                    due_only and self._clock() - self._oldest < self.flush_interval
+                ):
+                    return 0
+                rows, self._buffer, self._oldest = self._buffer, [], None
+            spooled, replay = [], None
+            try:
+                written = self._write_or_spool(rows)
+                self._publish(rows)
+                rows = []
+                spooled, replay = self._take_spool()
+                if spooled:
+                    self._write_or_spool(spooled)
+                    spooled = []
+                if replay:
+                    os.remove(replay)
+                    replay = None
+                return written
+            finally:
+                # something unexpected (a full disk, ...): nothing is lost,
+                # the records wait in the buffer and in the claimed spool
+                # file, which the next flush replays first
+                if rows:
+                    with self._lock:
+                        self._buffer[:0] = rows
+                        self._oldest = self._oldest or self._clock()
+
+    @staticmethod
+    def _publish(rows: List[dict]) -> None:
+        events.publish_many(
+            "log",
+            ({**row, "timestamp": row["timestamp"].isoformat()} for row in rows),
+        )
+
+    def _write_or_spool(self, rows: List[dict]) -> int:
+        """Write `rows`, spooling them if the database is unavailable."""
+        try:
+            return self._insert_isolating(rows)
+        except SQLAlchemyError as e:
+            logger.error("log insert failed, spooling %d records: %s", len(rows), e)
+            self._spool(rows)
+            return 0
+
+    def _insert_isolating(self, rows: List[dict]) -> int:
+        """
+        Insert `rows`; if the batch is rejected for its data, split it and
+        retry the halves, quarantining single records that still fail.
+        Returns the number written.
+        """
+        try:
+            self._insert(rows)
+            return len(rows)
+        except (IntegrityError, DataError) as e:
+            if len(rows) == 1:
+                logger.error("log record rejected, quarantining it: %s", e)
+                self._spool(rows, f"{self.spool_path}.rejected")
+                return 0
+        half = len(rows) // 2
+        return self._insert_isolating(rows[:half]) + self._insert_isolating(rows[half:])
+
+    def _insert(self, rows: List[dict]) -> None:
+        db = self.session_factory()
+        try:
+            db.execute(insert(LogEntry), rows)
+            log_stats.record(db, rows)
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _spool(self, rows: List[dict], path: Optional[str] = None) -> None:
+        with open(path or self.spool_path, "a", encoding="utf-8") as f:
+            for row in rows:
+                f.write(
+                    json.dumps({**row, "timestamp": row["timestamp"].isoformat()}) + "\n"
+                )
+
+    def _take_spool(self) -> Tuple[List[dict], Optional[str]]:
+        """
+        Claim the spool for replay by renaming it, so records other worker
+        processes append meanwhile go to a fresh file instead of being lost.
+        A claimed file left by an interrupted flush is replayed first.
+        """
+        replay = f"{self.spool_path}.{os.getpid()}"
+        if not os.path.exists(replay):
+            try:
+                os.replace(self.spool_path, replay)
+            except FileNotFoundError:
+                return [], None
+        with open(replay, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        for row in rows:
+            row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+        return rows, replay
+
+    def close(self) -> None:
+        """Stop the timer thread and flush what is left."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 1)
+            self._thread = None
+        self.flush()
+
+
+log_writer = LogWriter()
+atexit.register(log_writer.close)
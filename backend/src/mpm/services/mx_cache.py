@@ -0,0 +1,224 @@
+"""
+In-process MX resolution cache for recipient domains.
+
+Answers are kept for their DNS TTL (clamped to [MX_MIN_TTL, MX_MAX_TTL]);
+domains that definitively can't receive mail (NXDOMAIN, or no MX/A records)
+are cached negatively for MX_NEGATIVE_TTL, and transient failures (timeouts,
+SERVFAIL) for a short MX_TEMPFAIL_TTL without being treated as
+undeliverable. One cache (`mx_cache`) is shared by every task in a worker
+process; the worker that starts an email campaign `warm`s it with the whole
+recipient list's domains concurrently (see campaign.mark_undeliverable), and
+batch sends warm it with their chunk's domains, so recipients whose domain
+can't receive mail are flagged before they take a send slot.
+
+Uses dnspython when it is installed (real MX records and TTLs), otherwise
+falls back to the system resolver via getaddrinfo. That only sees A/AAAA
+records, and a domain may have MX records without them, so the fallback can
+clear a domain but never flags one as undeliverable.
+"""
+import os
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import dns.exception
+    import dns.resolver
+except ImportError:  # optional dependency
+    dns = None
+
+MIN_TTL = int(os.getenv("MX_MIN_TTL", 60))
+MAX_TTL = int(os.getenv("MX_MAX_TTL", 86400))
+NEGATIVE_TTL = int(os.getenv("MX_NEGATIVE_TTL", 900))
+TEMPFAIL_TTL = int(os.getenv("MX_TEMPFAIL_TTL", 30))
+# TTL used when the resolver doesn't report one (getaddrinfo)
+DEFAULT_TTL = 3600
+MAX_ENTRIES = int(os.getenv("MX_CACHE_SIZE", 100_000))
+WARM_CONCURRENCY = int(os.getenv("MX_WARM_CONCURRENCY", 32))
+
+OK, NO_DOMAIN, NO_MAIL, TEMPFAIL = "ok", "nxdomain", "no_mail", "tempfail"
+# No address records, and no way to ask for MX ones (SocketResolver)
+UNKNOWN = "unknown"
+
+
+@dataclass(frozen=True)
+class MXResult:
+    domain: str
+    status: str
+    # mail hosts, most preferred first
+    hosts: Tuple[str, ...] = ()
+    ttl: int = DEFAULT_TTL
+
+    @property
+    def deliverable(self) -> bool:
+        """False only when the domain definitively can't receive mail."""
+        return self.status not in (NO_DOMAIN, NO_MAIL)
+
+
+def recipient_domain(address: str) -> str:
+    return address.rpartition("@")[2].strip().lower()
+
+
+class Resolver(ABC):
+    @abstractmethod
+    def resolve(self, domain: str) -> MXResult:
+        ...
+
+
+class DnsPythonResolver(Resolver):
+    def __init__(self, timeout: float = 5.0):
+        self._resolver = dns.resolver.Resolver()
+        self._resolver.lifetime = timeout
+
+    def resolve(self, domain):
+        try:
+            answer = self._resolver.resolve(domain, "MX")
+        except dns.resolver.NXDOMAIN:
+            return MXResult(domain, NO_DOMAIN, ttl=NEGATIVE_TTL)
+        except dns.resolver.NoAnswer:
+            # No MX: RFC 5321 implicit MX, the domain's own address
+            return self._implicit_mx(domain)
+        except (dns.resolver.NoNameservers, dns.exception.Timeout):
+            return MXResult(domain, TEMPFAIL, ttl=TEMPFAIL_TTL)
+        records = sorted((r.preference, str(r.exchange).rstrip(".")) for r in answer)
+        hosts = tuple(h for _, h in records if h)
+        if not hosts:
+            # "MX 0 ." null MX (RFC 7505): the domain accepts no mail
+            return MXResult(domain, NO_MAIL, ttl=answer.rrset.ttl)
+        return MXResult(domain, OK, hosts, answer.rrset.ttl)
+
+    def _implicit_mx(self, domain):
+        try:
+            answer = self._resolver.resolve(domain, "A")
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            return MXResult(domain, NO_MAIL, ttl=NEGATIVE_TTL)
+        except (dns.resolver.NoNameservers, dns.exception.Timeout):
+            return MXResult(domain, TEMPFAIL, ttl=TEMPFAIL_TTL)
+        return MXResult(domain, OK, (domain,), answer.rrset.ttl)
+
+
+class SocketResolver(Resolver):
+    """
+    Address lookup through the system resolver; treats the domain as its own
+    MX. A failed lookup says nothing about MX records, so it gives UNKNOWN
+    (still deliverable) rather than NO_DOMAIN.
+    """
+
+    def resolve(self, domain):
+        try:
+            socket.getaddrinfo(domain, 25, proto=socket.IPPROTO_TCP)
+        except socket.gaierror as e:
+            if e.errno in (socket.EAI_NONAME, getattr(socket, "EAI_NODATA", None)):
+                return MXResult(domain, UNKNOWN, ttl=NEGATIVE_TTL)
+            return MXResult(domain, TEMPFAIL, ttl=TEMPFAIL_TTL)
+        except UnicodeError:
+            return MXResult(domain, UNKNOWN, ttl=NEGATIVE_TTL)
+        return MXResult(domain, OK, (domain,), DEFAULT_TTL)
+
+
+def default_resolver() -> Resolver:
+    return DnsPythonResolver() if dns is not None else SocketResolver()
+
+
+class MXCache:
+    """Thread-safe TTL cache in front of a Resolver, LRU-bounded to `max_entries`."""
+
+    def __init__(
+        self,
+        resolver: Optional[Resolver] = None,
+        max_entries: int = MAX_ENTRIES,
+        clock=time.monotonic,
+    ):
+        self.resolver = resolver or default_resolver()
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[float, MXResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    @staticmethod
+    def _ttl(result: MXResult) -> int:
+        if result.status == TEMPFAIL:
+            return TEMPFAIL_TTL
+        if not result.deliverable:
+            return NEGATIVE_TTL
+        return min(MAX_TTL, max(MIN_TTL, result.ttl))
+
+    def get(self, domain: str) -> Optional[MXResult]:
+        """The cached answer, or None if absent or expired."""
+        domain = domain.lower()
+        with self._lock:
+            entry = self._entries.get(domain)
+            if entry is None or entry[0] <= self._clock():
+                return None
+            self._entries.move_to_end(domain)
+            return entry[1]
+
+    def put(self, result: MXResult) -> MXResult:
+        with self._lock:
+            self._entries[result.domain] = (self._clock() + self._ttl(result), result)
+            self._entries.move_to_end(result.domain)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def _resolve(self, domain: str) -> MXResult:
+        try:
+            result = self.resolver.resolve(domain)
+        except Exception:
+            result = MXResult(domain, TEMPFAIL, ttl=TEMPFAIL_TTL)
+        return self.put(result)
+
+    def lookup(self, domain: str) -> MXResult:
+        domain = domain.lower()
+        cached = self.get(domain)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+        return self._resolve(domain)
+
+    def warm(
+        self, domains: Iterable[str], concurrency: int = WARM_CONCURRENCY
+    ) -> Dict[str, MXResult]:
+        """Resolve every distinct domain not already cached, concurrently."""
+        out: Dict[str, MXResult] = {}
+        todo: List[str] = []
+        for domain in {d.lower() for d in domains if d}:
+            cached = self.get(domain)
+            if cached is not None:
+                out[domain] = cached
+            else:
+                todo.append(domain)
+        if todo:
+            self.misses += len(todo)
+            with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(todo)))) as pool:
+                for result in pool.map(self._resolve, todo):
+                    out[result.domain] = result
+        return out
+
+    def known_undeliverable(self, domain: str) -> bool:
+        """True if a cached answer says the domain can't receive mail (no lookup)."""
+        cached = self.get(domain)
+        return cached is not None and not cached.deliverable
+
+    def undeliverable(self, recipients: List[str]) -> List[int]:
+        """Positions of recipients whose domain can't receive mail (warms the cache)."""
+        answers = self.warm(recipient_domain(r) for r in recipients)
+        return [
+            i
+            for i, r in enumerate(recipients)
+            if not answers.get(recipient_domain(r), MXResult("", NO_DOMAIN)).deliverable
+        ]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+mx_cache = MXCache()
@@ -1,26 +1,28 @@
-from playwright.async_api import async_playwright
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
 from .. import models
+from .browser_pool import browser_pool
+from .state_store import set_profile_state
 
-async def run_cookie_capture_and_store(url: str, profile_id: int, db: AsyncSession):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        context = await browser.new_context()
+async def _capture(url: str) -> dict:
+    async with browser_pool.context() as context:
         page = await context.new_page()
         await page.goto(url)
-        cookies = await context.cookies()
-        await browser.close()
+        return await context.storage_state()
+
+
+async def run_cookie_capture_and_store(url: str, profile_id: int, db: AsyncSession):
+    state = await browser_pool.call(_capture(url))
 
-        # Fetch profile and update cookies
-        result = await db.execute(select(models.Profile).where(models.Profile.id == profile_id))
-        profile = result.scalar_one_or_none()
-        if not profile:
-            raise ValueError(f"Profile with id={profile_id} not found")
+    # Fetch profile and update its storage state
+    result = await db.execute(select(models.Profile).where(models.Profile.id == profile_id))
+    profile = result.scalar_one_or_none()
+    if not profile:
+        raise ValueError(f"Profile with id={profile_id} not found")
 
-        profile.cookies = cookies
+    if set_profile_state(profile, state):
         await db.commit()
         await db.refresh(profile)
 
-        return profile
+    return profile
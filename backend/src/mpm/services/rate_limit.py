@@ -0,0 +1,121 @@
+"""
+Per-profile send rate limiting shared by every Celery worker.
+
+Each profile has a token bucket refilled at `rate_limit_per_hour` and holding
+at most `rate_limit_burst` tokens. `acquire` always takes its tokens and, when
+the bucket is short, returns how long the caller must wait for them: the
+bucket goes into debt, so concurrent callers are handed consecutive slots
+instead of all waking at the same instant and racing for one token. Send
+tasks reschedule themselves for that delay rather than sleeping in a worker.
+Callers that only want to probe (the per-domain caps) pass `reserve=False`.
+
+In Redis the bucket is a hash updated by one Lua script, so the
+read-refill-take step is atomic across workers and uses the Redis clock.
+"""
+import math
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Tuple
+
+from mpm.services.backends import select_backend
+
+DEFAULT_PER_HOUR = int(os.getenv("SEND_RATE_PER_HOUR", 1000))
+DEFAULT_BURST = int(os.getenv("SEND_RATE_BURST", 1))
+
+# KEYS[1] bucket hash; ARGV: refill rate (tokens/s), burst, tokens to take,
+# reserve (1: always take, going into debt; 0: take only if available).
+# Returns the wait in seconds as a string (Lua numbers become integers).
+_ACQUIRE_LUA = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local n = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens - n < 0 then wait = (n - tokens) / rate end
+if ARGV[4] == '1' or wait == 0 then tokens = tokens - n end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((wait + burst / rate) * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+def profile_limits(profile) -> Tuple[float, int]:
+    """(tokens per second, burst) for a Profile row, falling back to defaults."""
+    per_hour = profile.rate_limit_per_hour or DEFAULT_PER_HOUR
+    burst = profile.rate_limit_burst or DEFAULT_BURST
+    return per_hour / 3600.0, max(1, burst)
+
+
+class RateLimiter(ABC):
+    @abstractmethod
+    def acquire(
+        self, key, rate: float, burst: int, n: int = 1, reserve: bool = True
+    ) -> float:
+        """
+        Take `n` tokens; returns 0 or the seconds until they are covered.
+        With `reserve=False` nothing is taken unless all `n` are available now.
+        """
+
+    @abstractmethod
+    def reset(self, key) -> None:
+        ...
+
+
+class MemoryRateLimiter(RateLimiter):
+    """(tokens, last refill) pairs per key, on an injectable clock."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key, rate, burst, n=1, reserve=True):
+        with self._lock:
+            now = self._clock()
+            tokens, ts = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + max(0.0, now - ts) * rate)
+            wait = (n - tokens) / rate if tokens < n else 0.0
+            if reserve or not wait:
+                tokens -= n
+            self._buckets[key] = (tokens, now)
+        return wait
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+class RedisRateLimiter(RateLimiter):
+    def __init__(self, client, prefix: str = "mpm:rate"):
+        self.r = client
+        self.prefix = prefix
+        self._acquire = client.register_script(_ACQUIRE_LUA)
+
+    def acquire(self, key, rate, burst, n=1, reserve=True):
+        wait = self._acquire(
+            keys=[f"{self.prefix}:{key}"], args=[rate, burst, n, 1 if reserve else 0]
+        )
+        return float(wait)
+
+    def reset(self, key):
+        self.r.delete(f"{self.prefix}:{key}")
+
+
+rate_limiter: RateLimiter = select_backend(
+    "RATE_LIMIT_BACKEND", MemoryRateLimiter, RedisRateLimiter
+)
+
+
+def acquire_for_profile(profile, n: int = 1) -> float:
+    """Reserve `n` sends for a profile; returns the delay before sending."""
+    rate, burst = profile_limits(profile)
+    wait = rate_limiter.acquire(f"profile:{profile.id}", rate, burst, n)
+    # round up so a rescheduled task never lands just before its slot
+    return math.ceil(wait * 1000) / 1000 if wait > 0 else 0.0
@@ -0,0 +1,161 @@
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Hashable, Iterable, Iterator, Optional, Tuple
+
+from jinja2 import Environment, Template as JinjaTemplate, meta
+
+# One Environment for every render in the process; compiled templates are
+# cached below, keyed so that edits invalidate them.
+env = Environment()
+
+
+class TemplateCache:
+    """
+    Size-bounded LRU of compiled Jinja templates with hit/miss counters.
+    Keys are arbitrary hashables, e.g. `(template_id, updated_at)`.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compile(self, key: Hashable, compile: Callable[[], object]):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        # Compile outside the lock; a concurrent miss just compiles twice
+        value = compile()
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+@dataclass
+class CompiledPart:
+    """
+    A compiled subject or body plus what batch rendering needs to know about
+    it: the context names it actually references, and its output when it
+    references none (rendered once, shared by every recipient).
+    """
+
+    template: JinjaTemplate
+    names: frozenset
+    static: Optional[str] = None
+    # Outputs memoised by the projected context, reset when it grows too big
+    memo: dict = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_source(cls, source: str) -> "CompiledPart":
+        names = frozenset(meta.find_undeclared_variables(env.parse(source)))
+        template = env.from_string(source)
+        static = None if names else template.render()
+        return cls(template=template, names=names, static=static)
+
+    def render(self, vars: dict) -> str:
+        if self.static is not None:
+            return self.static
+        return self.template.render(**vars)
+
+    def render_projected(self, vars: dict, memo_size: int = 1024) -> str:
+        """
+        Render using only the referenced names; recipients whose referenced
+        values are identical share one rendered output.
+        """
+        if self.static is not None:
+            return self.static
+        ctx = {n: vars[n] for n in self.names if n in vars}
+        try:
+            key = tuple(sorted(ctx.items()))
+            hash(key)
+        except TypeError:
+            # Unhashable values (lists, dicts): render every time
+            return self.template.render(**ctx)
+        out = self.memo.get(key)
+        if out is None:
+            if len(self.memo) >= memo_size:
+                self.memo.clear()
+            out = self.memo[key] = self.template.render(**ctx)
+        return out
+
+
+template_cache = TemplateCache(maxsize=int(os.getenv("TEMPLATE_CACHE_SIZE", 256)))
+
+
+class Renderer:
+    def __init__(self, cache: Optional[TemplateCache] = None):
+        self.cache = cache or template_cache
+
+    def compile(self, template_str: str) -> JinjaTemplate:
+        """Compiled template for an ad-hoc source string (keyed by the source)."""
+        return self.cache.get_or_compile(
+            ("source", template_str), lambda: env.from_string(template_str)
+        )
+
+    def compile_template(self, tmpl) -> Tuple[CompiledPart, CompiledPart]:
+        """
+        Compiled (subject, body) pair for a Template row. The key includes
+        `updated_at`, so an edit through the templates router yields a new
+        entry and the stale one ages out of the LRU. An unsaved template
+        (no id yet, e.g. a preview) is keyed by its source.
+        """
+        if tmpl.id is None:
+            key = ("template-source", tmpl.subject, tmpl.body)
+        else:
+            key = ("template", tmpl.id, tmpl.updated_at)
+        return self.cache.get_or_compile(
+            key,
+            lambda: (
+                CompiledPart.from_source(str(tmpl.subject or "")),
+                CompiledPart.from_source(str(tmpl.body)),
+            ),
+        )
+
+    def render(self, template_str: str, vars: dict) -> str:
+        return self.compile(template_str).render(**vars)
+
+    def render_template(self, tmpl, vars: dict) -> Tuple[str, str]:
+        """Render a Template row's subject and body with the same context."""
+        subject, body = self.compile_template(tmpl)
+        return subject.render(vars), body.render(vars)
+
+    def render_many(
+        self, tmpl, vars_list: Iterable[dict]
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Lazily render a Template row for a batch of contexts, yielding
+        `(subject, body)` per context so a whole campaign never has to sit in
+        memory. Only the variables the template references are read from each
+        context, and parts that don't vary between recipients are reused.
+        """
+        subject, body = self.compile_template(tmpl)
+        for vars in vars_list:
+            yield subject.render_projected(vars), body.render_projected(vars)
@@ -0,0 +1,270 @@
+"""
+Send scheduler: upcoming sends are kept per queue in a time-ordered set
+(a Redis sorted set scored by due time) and only handed to Celery once due,
+so workers never hold countdown/ETA tasks and their memory stays
+O(in-flight) however many sends are waiting. A queue is a profile id, or
+`domain:<name>` for a destination domain's retries (see domain_throttle).
+
+`schedule` paces a profile's sends one after another: each new send is due a
+jittered delay after the profile's previously scheduled send (or now, if that
+is already past). `schedule_at` puts a send at a fixed delay from now without
+touching the pacing, which is what rate-limit retries use. The beat task
+`mpm.tasks.dispatch_scheduled_task` calls `pop_due` for every queue with
+pending sends.
+
+Delays come from a named distribution (see `DISTRIBUTIONS`); register more
+with `@distribution("name")`.
+"""
+import heapq
+import itertools
+import json
+import math
+import os
+import random
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from mpm.services.backends import select_backend
+
+# Seconds between dispatcher runs (the beat interval)
+TICK = float(os.getenv("SCHEDULER_TICK", 1.0))
+# Most sends released per queue per tick
+POP_LIMIT = int(os.getenv("SCHEDULER_POP_LIMIT", 500))
+
+# Relative activity by local hour; time_of_day delays are divided by it, so
+# sends slow down at night the way a person's would
+HOURLY_ACTIVITY = [
+    0.15, 0.1, 0.1, 0.1, 0.1, 0.15, 0.3, 0.5, 0.8, 1.0, 1.0, 1.0,
+    0.9, 0.9, 1.0, 1.0, 1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.35, 0.2,
+]
+
+# a profile id, or "domain:<name>"
+Queue = Union[int, str]
+Distribution = Callable[[float, float, random.Random, float], float]
+DISTRIBUTIONS: Dict[str, Distribution] = {}
+
+
+def distribution(name: str):
+    """Register a delay distribution `(min_delay, max_delay, rng, now) -> seconds`."""
+
+    def register(fn: Distribution) -> Distribution:
+        DISTRIBUTIONS[name] = fn
+        return fn
+
+    return register
+
+
+@distribution("uniform")
+def _uniform(min_delay, max_delay, rng, now):
+    return rng.uniform(min_delay, max_delay)
+
+
+@distribution("lognormal")
+def _lognormal(min_delay, max_delay, rng, now):
+    # median at the midpoint, long right tail, clipped to [min, 3 * max]
+    median = max((min_delay + max_delay) / 2, 1e-3)
+    sigma = 0.5
+    return min(max(rng.lognormvariate(math.log(median), sigma), min_delay), 3 * max_delay)
+
+
+@distribution("time_of_day")
+def _time_of_day(min_delay, max_delay, rng, now):
+    activity = HOURLY_ACTIVITY[time.localtime(now).tm_hour]
+    return rng.uniform(min_delay, max_delay) / max(activity, 0.05)
+
+
+_rng = random.Random()
+
+
+def sample_delay(
+    name: str, min_delay: float, max_delay: float, now: Optional[float] = None
+) -> float:
+    try:
+        fn = DISTRIBUTIONS[name]
+    except KeyError:
+        raise ValueError(f"Unknown delay distribution {name!r}") from None
+    return max(0.0, fn(min_delay, max_delay, _rng, time.time() if now is None else now))
+
+
+def _encode(task: str, args: list, kwargs: dict) -> str:
+    # the uid keeps identical sends distinct members of the set
+    return json.dumps({"uid": uuid.uuid4().hex, "task": task, "args": args, "kwargs": kwargs})
+
+
+class SendScheduler(ABC):
+    @abstractmethod
+    def schedule(
+        self, queue: Queue, task: str, args: list, kwargs: dict, delay: float
+    ) -> float:
+        """Queue a send `delay` after the queue's last paced send; returns its due time."""
+
+    @abstractmethod
+    def schedule_at(
+        self, queue: Queue, task: str, args: list, kwargs: dict, delay: float
+    ) -> float:
+        """Queue a send `delay` seconds from now, outside the pacing."""
+
+    @abstractmethod
+    def pop_due(
+        self, queue: Queue, now: Optional[float] = None, limit: int = POP_LIMIT
+    ) -> List[dict]:
+        """Remove and return the queue's due sends, earliest first."""
+
+    @abstractmethod
+    def queues(self) -> List[Queue]:
+        """Queues with at least one pending send."""
+
+    @abstractmethod
+    def pending(self, queue: Queue) -> int:
+        ...
+
+    @abstractmethod
+    def clear(self, queue: Queue) -> None:
+        ...
+
+
+class MemorySendScheduler(SendScheduler):
+    """A heap per queue ordered by due time, plus each queue's pacing tail."""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._heaps: Dict[Queue, List[Tuple[float, int, str]]] = {}
+        self._tails: Dict[Queue, float] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _push(self, queue, due, member):
+        heapq.heappush(self._heaps.setdefault(queue, []), (due, next(self._seq), member))
+
+    def schedule(self, queue, task, args, kwargs, delay):
+        with self._lock:
+            due = max(self._clock(), self._tails.get(queue, 0.0)) + delay
+            self._tails[queue] = due
+            self._push(queue, due, _encode(task, args, kwargs))
+        return due
+
+    def schedule_at(self, queue, task, args, kwargs, delay):
+        with self._lock:
+            due = self._clock() + delay
+            self._push(queue, due, _encode(task, args, kwargs))
+        return due
+
+    def pop_due(self, queue, now=None, limit=POP_LIMIT):
+        now = self._clock() if now is None else now
+        out = []
+        with self._lock:
+            heap = self._heaps.get(queue, [])
+            while heap and heap[0][0] <= now and len(out) < limit:
+                out.append(json.loads(heapq.heappop(heap)[2]))
+            if not heap:
+                self._heaps.pop(queue, None)
+        return out
+
+    def queues(self):
+        with self._lock:
+            return list(self._heaps)
+
+    def pending(self, queue):
+        with self._lock:
+            return len(self._heaps.get(queue, []))
+
+    def clear(self, queue):
+        with self._lock:
+            self._heaps.pop(queue, None)
+            self._tails.pop(queue, None)
+
+
+# KEYS: queue zset, tail key, queues set; ARGV: delay, member, queue name,
+# paced (1/0). Due time is computed from the Redis clock so every producer
+# agrees on "now".
+_SCHEDULE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local due = now + tonumber(ARGV[1])
+if ARGV[4] == '1' then
+  local tail = tonumber(redis.call('GET', KEYS[2]) or '0')
+  due = math.max(now, tail) + tonumber(ARGV[1])
+  redis.call('SET', KEYS[2], tostring(due), 'EX', math.ceil(due - now) + 3600)
+end
+redis.call('ZADD', KEYS[1], due, ARGV[2])
+redis.call('SADD', KEYS[3], ARGV[3])
+return tostring(due)
+"""
+
+# KEYS: queue zset, queues set; ARGV: now (or '' for the Redis clock),
+# limit, queue name
+_POP_LUA = """
+local now = tonumber(ARGV[1])
+if not now then
+  local t = redis.call('TIME')
+  now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+end
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, tonumber(ARGV[2]))
+if #due > 0 then
+  redis.call('ZREM', KEYS[1], unpack(due))
+end
+if redis.call('ZCARD', KEYS[1]) == 0 then
+  redis.call('SREM', KEYS[2], ARGV[3])
+end
+return due
+"""
+
+
+class RedisSendScheduler(SendScheduler):
+    """
+    One sorted set per queue (`mpm:sched:{queue}`, member = JSON payload,
+    score = due time), a `:tail` key holding the last paced due time, and a
+    `mpm:sched:queues` set of queues with pending sends.
+    """
+
+    def __init__(self, client, prefix: str = "mpm:sched"):
+        self.r = client
+        self.prefix = prefix
+        self._schedule = client.register_script(_SCHEDULE_LUA)
+        self._pop = client.register_script(_POP_LUA)
+
+    def _key(self, queue: Queue) -> str:
+        return f"{self.prefix}:{queue}"
+
+    def _add(self, queue, task, args, kwargs, delay, paced):
+        key = self._key(queue)
+        due = self._schedule(
+            keys=[key, f"{key}:tail", f"{self.prefix}:queues"],
+            args=[delay, _encode(task, args, kwargs), queue, 1 if paced else 0],
+        )
+        return float(due)
+
+    def schedule(self, queue, task, args, kwargs, delay):
+        return self._add(queue, task, args, kwargs, delay, True)
+
+    def schedule_at(self, queue, task, args, kwargs, delay):
+        return self._add(queue, task, args, kwargs, delay, False)
+
+    def pop_due(self, queue, now=None, limit=POP_LIMIT):
+        members = self._pop(
+            keys=[self._key(queue), f"{self.prefix}:queues"],
+            args=["" if now is None else now, limit, queue],
+        )
+        return [json.loads(m) for m in members]
+
+    def queues(self):
+        names = (q.decode() for q in self.r.smembers(f"{self.prefix}:queues"))
+        return [int(q) if q.isdigit() else q for q in names]
+
+    def pending(self, queue):
+        return self.r.zcard(self._key(queue))
+
+    def clear(self, queue):
+        key = self._key(queue)
+        pipe = self.r.pipeline()
+        pipe.delete(key, f"{key}:tail")
+        pipe.srem(f"{self.prefix}:queues", queue)
+        pipe.execute()
+
+
+send_scheduler: SendScheduler = select_backend(
+    "SCHEDULER_BACKEND", MemorySendScheduler, RedisSendScheduler
+)
@@ -0,0 +1,163 @@
+"""
+Content-addressed store for Playwright storage states (cookies + localStorage).
+
+A state is serialised canonically (sorted keys, no whitespace), named by
+its SHA-256 and written gzipped under STATE_STORE_DIR as <aa>/<rest>.json.gz.
+Identical states are stored once, and writing a state that already exists
+only refreshes the blob's mtime. Profiles keep only the hash (`storage_state_ref`) and a
+small summary (`storage_state_summary`: cookie, domain and origin counts and
+the earliest cookie expiry), so profile rows and /profiles responses stay
+small however large the states get.
+
+Recently used states stay decoded in an in-process LRU (STATE_CACHE_SIZE
+entries), so the browser pool can open contexts from hot states without
+touching the disk. A blob is never modified after it is written, so cached
+entries can't go stale.
+"""
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+STORE_DIR = os.getenv("STATE_STORE_DIR", "./state_store")
+CACHE_SIZE = int(os.getenv("STATE_CACHE_SIZE", 256))
+
+
+def canonical(state: dict) -> bytes:
+    return json.dumps(state, sort_keys=True, separators=(",", ":")).encode()
+
+
+def summarize(state: dict) -> dict:
+    """Counts and the earliest expiry of a state's persistent cookies."""
+    cookies = state.get("cookies") or []
+    expiries = [c["expires"] for c in cookies if (c.get("expires") or -1) > 0]
+    return {
+        "cookie_count": len(cookies),
+        "domain_count": len({c.get("domain", "").lstrip(".") for c in cookies}),
+        "origin_count": len(state.get("origins") or []),
+        "expires_at": (
+            datetime.fromtimestamp(min(expiries), timezone.utc).isoformat()
+            if expiries else None
+        ),
+    }
+
+
+class StateStore:
+    def __init__(self, root: str = STORE_DIR, cache_size: int = CACHE_SIZE):
+        self.root = root
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, ref: str) -> str:
+        return os.path.join(self.root, ref[:2], f"{ref[2:]}.json.gz")
+
+    def _remember(self, ref: str, state: dict) -> None:
+        with self._lock:
+            self._cache[ref] = state
+            self._cache.move_to_end(ref)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def put(self, state: dict) -> str:
+        """
+        Store a state (if new) and return its ref. An existing blob gets its
+        mtime refreshed, so `prune` spares it until the new reference to it
+        is committed.
+        """
+        data = canonical(state)
+        ref = hashlib.sha256(data).hexdigest()
+        path = self.path(ref)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # write-then-rename: readers never see a partial blob
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(data))
+            os.replace(tmp, path)
+        self._remember(ref, state)
+        return ref
+
+    def get(self, ref: str) -> dict:
+        """The state for `ref` (shared: don't modify it); KeyError if it isn't stored."""
+        with self._lock:
+            state = self._cache.get(ref)
+            if state is not None:
+                self._cache.move_to_end(ref)
+                return state
+        try:
+            with open(self.path(ref), "rb") as f:
+                state = json.loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            raise KeyError(ref) from None
+        self._remember(ref, state)
+        return state
+
+    def prune(self, keep: Iterable[str], min_age: float = 3600) -> int:
+        """
+        Delete blobs whose ref isn't in `keep`, sparing ones newer than
+        `min_age` seconds (their profile row may not be committed yet).
+        Returns how many went.
+        """
+        keep = set(keep)
+        cutoff = time.time() - min_age
+        removed = 0
+        if not os.path.isdir(self.root):
+            return 0
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                if (
+                    name.endswith(".json.gz")
+                    and prefix + name[: -len(".json.gz")] not in keep
+                    and os.path.getmtime(path) < cutoff
+                ):
+                    os.remove(path)
+                    removed += 1
+        with self._lock:
+            for ref in [r for r in self._cache if r not in keep]:
+                del self._cache[ref]
+        return removed
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+state_store = StateStore()
+
+
+def profile_state(profile) -> Optional[dict]:
+    """A profile's stored storage state, or None if it has none."""
+    if not profile.storage_state_ref:
+        return None
+    return state_store.get(profile.storage_state_ref)
+
+
+def set_profile_state(profile, state: dict, user_agent: Optional[str] = None) -> bool:
+    """
+    Point the profile at `state`; the caller commits. Returns False, leaving
+    the profile untouched, when neither the state nor the user agent changed.
+    """
+    ref = state_store.put(state)
+    creds = profile.credentials or {}
+    ua_changed = user_agent is not None and creds.get("user_agent") != user_agent
+    if ref == profile.storage_state_ref and not ua_changed:
+        return False
+    if ref != profile.storage_state_ref:
+        profile.storage_state_ref = ref
+        profile.storage_state_summary = summarize(state)
+    if ua_changed:
+        profile.credentials = {**creds, "user_agent": user_agent}
+    return True
@@ -1,38 +1,179 @@
+import asyncio
+import collections
 import os
-import random
+import smtplib
+from datetime import datetime
 from celery import Celery
+from celery.signals import worker_process_shutdown
 from celery.utils.log import get_task_logger
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from database import SessionLocal
-from connectors.smtp_connector import SMTPConnector
-from connectors.playwright_auth import PlaywrightAuth
-from jinja2 import Template as JinjaTemplate
-from models import Profile, Template as TemplateModel, LogEntry
+from mpm.database import SessionLocal
+from mpm.connectors.async_smtp_connector import AsyncSMTPConnector
+from mpm.connectors.smtp_connector import SMTPConnector, smtp_error_code
+from mpm.connectors.smtp_pool import SMTPSessionPool
+from mpm.services import campaign, cookie_refresh, domain_throttle, log_retention, log_stats
+from mpm.services.browser_pool import browser_pool
+from mpm.services.domain_throttle import domain_queue, recipient_domain
+from mpm.services.list_import import run_import_job
+from mpm.services.list_index import list_index
+from mpm.services.log_writer import log_writer
+from mpm.services.mx_cache import mx_cache
+from mpm.services.rate_limit import acquire_for_profile
+from mpm.services.scheduler import TICK, sample_delay, send_scheduler
+from mpm.services.state_store import state_store
+from mpm.services.renderer import Renderer
+from mpm.models import Profile, Template as TemplateModel
 
 # 1) Configure Celery broker (Redis):
 celery = Celery(
     "mpm_tasks",
     broker=os.getenv("CELERY_BROKER_URL", "redis://redis:6379/0"),
 )
-# Optional: default rate (you can also set per-task)
-celery.conf.task_default_rate_limit = "1/s"
+celery.conf.beat_schedule = {
+    # Release due sends from the scheduler (see services.scheduler)
+    "dispatch-scheduled": {
+        "task": "mpm.tasks.dispatch_scheduled_task",
+        "schedule": TICK,
+    },
+    # Resume campaign runs whose worker died with sends in flight
+    "campaign-watchdog": {
+        "task": "mpm.tasks.campaign_watchdog_task",
+        "schedule": float(os.getenv("CAMPAIGN_WATCHDOG_INTERVAL", 60)),
+    },
+    # Archive and drop expired send logs (see services.log_retention)
+    "log-retention": {
+        "task": "mpm.tasks.log_retention_task",
+        "schedule": float(os.getenv("LOG_RETENTION_INTERVAL", 86400)),
+    },
+    # Refresh every Telegram profile's cookies (see services.cookie_refresh)
+    "cookie-refresh": {
+        "task": "mpm.tasks.scheduled_cookie_refresh_task",
+        "schedule": float(os.getenv("COOKIE_REFRESH_INTERVAL", 86400)),
+    },
+}
 
 logger = get_task_logger(__name__)
 
+# Concurrent sessions per async batch, and per recipient domain within it
+SMTP_ASYNC_CONNECTIONS = int(os.getenv("SMTP_ASYNC_CONNECTIONS", 10))
+SMTP_ASYNC_PER_DOMAIN = int(os.getenv("SMTP_ASYNC_PER_DOMAIN", 5))
+# Campaign batches go through send_batch_async_task instead of send_batch_task
+SMTP_ASYNC_BATCHES = os.getenv("SMTP_ASYNC_BATCHES", "false").lower() == "true"
 
-# 2) Helper to render Jinja2 templates
-class Renderer:
-    def render(self, template_str: str, vars: dict) -> str:
-        return JinjaTemplate(template_str).render(**vars)
+# Authenticated SMTP sessions shared by every task in this worker process
+smtp_pool = SMTPSessionPool(
+    max_idle=float(os.getenv("SMTP_POOL_MAX_IDLE", 60)),
+    max_messages=int(os.getenv("SMTP_POOL_MAX_MESSAGES", 100)),
+    max_idle_per_key=int(os.getenv("SMTP_POOL_MAX_IDLE_PER_PROFILE", 2)),
+)
+
+
+@worker_process_shutdown.connect
+def _close_smtp_pool(**kwargs):
+    smtp_pool.close_all()
+
+
+@worker_process_shutdown.connect
+def _flush_logs(**kwargs):
+    log_writer.close()
+
+
+@worker_process_shutdown.connect
+def _close_browser_pool(**kwargs):
+    browser_pool.close()
+
+
+def smtp_connector_for(profile: Profile) -> SMTPConnector:
+    """Build a pooled SMTPConnector from an email profile's credentials."""
+    creds = profile.credentials or {}
+    return SMTPConnector(
+        host=creds.get("host", ""),
+        port=int(creds.get("port", 0)),
+        user=creds.get("user"),
+        password=creds.get("password"),
+        use_ssl=not creds.get("use_mailcatcher", False),
+        use_mailcatcher=creds.get("use_mailcatcher", False),
+        pool=smtp_pool,
+    )
+
+
+def async_smtp_connector_for(profile: Profile) -> AsyncSMTPConnector:
+    """AsyncSMTPConnector for an email profile's credentials."""
+    creds = profile.credentials or {}
+    return AsyncSMTPConnector(
+        host=creds.get("host", ""),
+        port=int(creds.get("port", 0)),
+        user=creds.get("user"),
+        password=creds.get("password"),
+        use_ssl=not creds.get("use_mailcatcher", False),
+        use_mailcatcher=creds.get("use_mailcatcher", False),
+        max_connections=SMTP_ASYNC_CONNECTIONS,
+        per_domain_limit=SMTP_ASYNC_PER_DOMAIN,
+        max_messages=smtp_pool.max_messages,
+    )
 
 
-# 3) Core send task, rate-limited per profile (~1 msg/3.6s to hit 1 000/hr)
-@celery.task(bind=True, rate_limit="1/3.6s")
+def _finish_campaign_item(db: Session, recipient_id, attempt: int, status: str, detail=None):
+    """Record a campaign send outcome and refill the run's window if due."""
+    if recipient_id is None:
+        return
+    run_id = campaign.complete_recipient(db, recipient_id, attempt, status, detail)
+    if run_id is not None:
+        _advance_campaign(db, run_id)
+
+
+# 2) Core send task, rate-limited per profile by a token bucket shared by
+# all workers (see services.rate_limit), and for email per recipient domain
+# (see services.domain_throttle)
+@celery.task(bind=True)
 def send_message_task(
-    self, profile_id: int, template_id: int, recipient: str, context_vars: dict
+    self,
+    profile_id: int,
+    template_id: int,
+    recipient: str,
+    context_vars: dict,
+    campaign_recipient_id: int = None,
+    attempt: int = 0,
+    token_reserved: bool = False,
+    deferrals: int = 0,
 ):
+    """
+    Send one message. Campaign sends pass `campaign_recipient_id` and
+    `attempt` so the run's cursor and counters are updated (see
+    services.campaign); stale or paused items are skipped.
+    When the profile is over its rate, the task is re-queued for the slot
+    it reserved, with `token_reserved` set. Email sends the recipient's
+    domain can't take now (backoff, rate or concurrency cap) go on that
+    domain's retry queue; a 4xx reply re-queues the send there after the
+    domain's backoff, up to MAX_DEFERRALS times.
+    """
     db: Session = SessionLocal()
+    outcome, detail = "error", None
+
+    def requeue(queue, delay, **changes):
+        kwargs = {
+            "campaign_recipient_id": campaign_recipient_id,
+            "attempt": attempt,
+            "token_reserved": token_reserved,
+            "deferrals": deferrals,
+        }
+        kwargs.update(changes)
+        send_scheduler.schedule_at(
+            queue,
+            send_message_task.name,
+            [profile_id, template_id, recipient, context_vars],
+            kwargs,
+            delay,
+        )
+
     try:
+        if campaign_recipient_id is not None and not campaign.claim_recipient(
+            db, campaign_recipient_id, attempt
+        ):
+            campaign_recipient_id = None
+            return
+
         # Load profile & template
         profile = db.query(Profile).get(profile_id)
         if profile is None:
@@ -43,23 +184,75 @@ def send_message_task(
         if tmpl is None:
             raise ValueError(f"Template with id {template_id} not found")
 
-        # Render body (and subject for email)
-        renderer = Renderer()
-        body = renderer.render(str(tmpl.body), context_vars)
-        subject = renderer.render(str(tmpl.subject or ""), context_vars)
+        # Lists may have changed since the campaign was queued
+        if not list_index.filter_recipients(profile_id, [recipient])[0]:
+            outcome = "suppressed"
+            log_writer.write(
+                profile_id,
+                "send_message",
+                "suppressed",
+                f"{recipient}: blacklisted or not whitelisted",
+            )
+            return
+
+        domain = recipient_domain(recipient) if profile.platform == "email" else None
+        if domain is not None:
+            # Dead domains fail before taking any token or slot (the answer
+            # is cached, so only a domain's first send here waits on DNS)
+            if not mx_cache.lookup(domain).deliverable:
+                raise ValueError(f"{recipient}: domain does not accept mail")
+            # throttled per MX host from here on
+            domain = domain_throttle.throttle_key(domain)
+            wait = domain_throttle.admit(domain)
+            if wait > 0:
+                requeue(domain_queue(domain), wait)
+                # still in flight; the re-queued task records the outcome
+                campaign_recipient_id = None
+                return
+
+        if not token_reserved:
+            wait = acquire_for_profile(profile)
+            if wait > 0:
+                requeue(profile_id, wait, token_reserved=True)
+                campaign_recipient_id = None
+                return
+
+        # Render body (and subject for email) from the compiled-template cache
+        subject, body = Renderer().render_template(tmpl, context_vars)
 
         # Dispatch via the right connector
         if profile.platform == "email":
-            creds = profile.credentials or {}
-            smtp = SMTPConnector(
-                host=creds.get("host", ""),
-                port=int(creds.get("port", 0)),
-                user=creds.get("user"),
-                password=creds.get("password"),
-                use_ssl=not creds.get("use_mailcatcher", False),
-                use_mailcatcher=creds.get("use_mailcatcher", False),
-            )
-            smtp.send_email(recipient, subject, body)
+            slot = domain_throttle.acquire_slot(domain)
+            if slot is None:
+                requeue(domain_queue(domain), domain_throttle.SLOT_RETRY, token_reserved=True)
+                campaign_recipient_id = None
+                return
+            try:
+                smtp = smtp_connector_for(profile)
+                smtp.send_email(recipient, subject, body)
+            except smtplib.SMTPException as e:
+                code = smtp_error_code(e)
+                if code is not None:
+                    kind, backoff = domain_throttle.record(domain, code)
+                    if kind == "deferred" and deferrals < domain_throttle.MAX_DEFERRALS:
+                        log_writer.write(
+                            profile_id,
+                            "send_message_email",
+                            "deferred",
+                            f"{recipient}: {code} {e}",
+                        )
+                        requeue(
+                            domain_queue(domain),
+                            backoff,
+                            token_reserved=False,
+                            deferrals=deferrals + 1,
+                        )
+                        campaign_recipient_id = None
+                        return
+                raise
+            finally:
+                domain_throttle.release_slot(domain, slot)
+            domain_throttle.record(domain, 250)
             action = "send_message_email"
         else:
             # Placeholder for Telegram connector logic
@@ -67,32 +260,428 @@ def send_message_task(
             # TODO: integrate your Telegram connector here
 
         # Log success
-        log = LogEntry(
-            profile_id=profile_id,
-            action=action,
-            status="success",
-            detail=None,
-        )
-        db.add(log)
-        db.commit()
+        outcome = "sent"
+        log_writer.write(profile_id, action, "success")
 
     except Exception as e:
         # Log failure
         logger.error("send_message_task failed: %s", e)
-        log = LogEntry(
-            profile_id=profile_id,
-            action="send_message",
-            status="error",
-            detail=str(e),
+        db.rollback()
+        detail = str(e)
+        log_writer.write(profile_id, "send_message", "error", detail)
+
+    finally:
+        try:
+            _finish_campaign_item(db, campaign_recipient_id, attempt, outcome, detail)
+        finally:
+            db.close()
+
+
+def _defer_single(profile_id, template_id, recipient, ctx, item, delay, deferrals=0):
+    """Move one recipient of a batch to its domain's retry queue as a single send."""
+    rid, attempt = item
+    send_scheduler.schedule_at(
+        domain_queue(domain_throttle.throttle_key(recipient_domain(recipient))),
+        send_message_task.name,
+        [profile_id, template_id, recipient, ctx],
+        {"campaign_recipient_id": rid, "attempt": attempt, "deferrals": deferrals},
+        delay,
+    )
+
+
+def _send_batch(
+    task,
+    deliver,
+    profile_id: int,
+    template_id: int,
+    recipients: list,
+    vars_list: list,
+    campaign_items: list = None,
+    token_reserved: bool = False,
+    parallel: int = 1,
+) -> list:
+    """
+    Shared body of the batch tasks; `deliver(profile, messages, slots)`
+    sends the rendered messages and returns send_many-style results. Each
+    message names its domain (MX host) in "slot", and `slots` maps each
+    domain to the concurrency leases held for it: up to `parallel`, the
+    number of transactions `deliver` may run to one domain at once.
+    """
+    db: Session = SessionLocal()
+    items = campaign_items or [(None, 0)] * len(recipients)
+    outcomes = []
+    leases = []
+    # recipients not yet sent, deferred or suppressed, by their position
+    # after claiming; if the batch fails only these are recorded as errors
+    unresolved = dict(enumerate(zip(items, recipients)))
+    try:
+        if campaign_items:
+            keep = [
+                i
+                for i, (rid, attempt) in enumerate(items)
+                if campaign.claim_recipient(db, rid, attempt)
+            ]
+            recipients = [recipients[i] for i in keep]
+            vars_list = [vars_list[i] for i in keep]
+            items = [items[i] for i in keep]
+            if not recipients:
+                return []
+            unresolved = dict(enumerate(zip(items, recipients)))
+        pos = list(unresolved)
+
+        profile = db.query(Profile).get(profile_id)
+        if profile is None:
+            raise ValueError(f"Profile with id {profile_id} not found")
+        tmpl = db.query(TemplateModel).get(template_id)
+        if tmpl is None:
+            raise ValueError(f"Template with id {template_id} not found")
+        if profile.platform != "email":
+            raise ValueError("send_batch_task only supports email profiles")
+
+        allowed, suppressed = list_index.filter_recipients(profile_id, recipients)
+        for i in suppressed:
+            log_writer.write(
+                profile_id,
+                "send_message_email",
+                "suppressed",
+                f"{recipients[i]}: blacklisted or not whitelisted",
+            )
+            unresolved.pop(pos[i])
+        outcomes = [(items[i], "suppressed", None) for i in suppressed]
+        recipients = [recipients[i] for i in allowed]
+        vars_list = [vars_list[i] for i in allowed]
+        items = [items[i] for i in allowed]
+        pos = [pos[i] for i in allowed]
+
+        # Recipients whose domain can't take a send now wait on that
+        # domain's retry queue as single sends
+        admitted, keys = [], {}
+        answers = mx_cache.warm(recipient_domain(r) for r in recipients)
+        for i, recipient in enumerate(recipients):
+            domain = recipient_domain(recipient)
+            if domain not in answers or not answers[domain].deliverable:
+                log_writer.write(
+                    profile_id,
+                    "send_message_email",
+                    "error",
+                    f"{recipient}: domain does not accept mail",
+                )
+                outcomes.append((items[i], "error", "domain does not accept mail"))
+                unresolved.pop(pos[i])
+                continue
+            keys[i] = domain_throttle.throttle_key(domain)
+            wait = domain_throttle.admit(keys[i])
+            if wait > 0:
+                _defer_single(profile_id, template_id, recipient, vars_list[i], items[i], wait)
+                unresolved.pop(pos[i])
+            else:
+                admitted.append(i)
+
+        # Concurrency leases, held across the chunk's sends; recipients of
+        # a domain with every lease taken are retried as single sends
+        wanted = collections.Counter(keys[i] for i in admitted)
+        for key, n in wanted.items():
+            for _ in range(min(n, parallel)):
+                token = domain_throttle.acquire_slot(key)
+                if token is None:
+                    break
+                leases.append((key, token))
+        slots = collections.Counter(key for key, _ in leases)
+        for i in admitted:
+            if not slots[keys[i]]:
+                _defer_single(
+                    profile_id,
+                    template_id,
+                    recipients[i],
+                    vars_list[i],
+                    items[i],
+                    domain_throttle.SLOT_RETRY,
+                )
+                unresolved.pop(pos[i])
+        admitted = [i for i in admitted if slots[keys[i]]]
+        recipients = [recipients[i] for i in admitted]
+        vars_list = [vars_list[i] for i in admitted]
+        items = [items[i] for i in admitted]
+        keys = [keys[i] for i in admitted]
+        pos = [pos[i] for i in admitted]
+
+        if recipients and not token_reserved:
+            wait = acquire_for_profile(profile, len(recipients))
+            if wait > 0:
+                send_scheduler.schedule_at(
+                    profile_id,
+                    task.name,
+                    [profile_id, template_id, recipients, vars_list],
+                    {
+                        "campaign_items": items if campaign_items else None,
+                        "token_reserved": True,
+                    },
+                    wait,
+                )
+                unresolved.clear()
+                return []
+
+        rendered = Renderer().render_many(tmpl, vars_list)
+        messages = (
+            {"to": recipient, "subject": subject, "body": body, "slot": key}
+            for recipient, key, (subject, body) in zip(recipients, keys, rendered)
+        )
+        results = deliver(profile, messages, dict(slots))
+
+        for i, r in enumerate(results):
+            status = "success" if r["status"] == "success" else "error"
+            if r["code"] is not None:
+                kind, backoff = domain_throttle.record(keys[i], r["code"])
+                if kind == "deferred":
+                    # 4xx: retry on the domain's queue after its backoff
+                    _defer_single(
+                        profile_id, template_id, r["to"], vars_list[i], items[i], backoff, 1
+                    )
+                    status = "deferred"
+            log_writer.write(
+                profile_id,
+                "send_message_email",
+                status,
+                None
+                if status == "success"
+                else f"{r['to']}: {r['code'] or ''} {r['detail'] or ''}".strip(),
+            )
+            if status != "deferred":
+                outcomes.append((items[i], "sent" if status == "success" else "error", r["detail"]))
+            unresolved.pop(pos[i])
+        return results
+
+    except Exception as e:
+        logger.error("%s failed: %s", task.name, e)
+        db.rollback()
+        log_writer.write(profile_id, "send_batch", "error", str(e))
+        outcomes += [(item, "error", str(e)) for item, _ in unresolved.values()]
+        return [
+            {"to": r, "status": "error", "code": None, "detail": str(e)}
+            for _, r in unresolved.values()
+        ]
+
+    finally:
+        for key, token in leases:
+            domain_throttle.release_slot(key, token)
+        try:
+            if campaign_items:
+                for (rid, attempt), status, detail in outcomes:
+                    _finish_campaign_item(db, rid, attempt, status, detail)
+        finally:
+            db.close()
+
+
+@celery.task(bind=True)
+def send_batch_task(
+    self,
+    profile_id: int,
+    template_id: int,
+    recipients: list,
+    vars_list: list,
+    campaign_items: list = None,
+    token_reserved: bool = False,
+) -> list:
+    """
+    Render and send a chunk of messages over one SMTP session.
+    Logs one record per recipient (see services.log_writer) and returns the
+    per-recipient results from `SMTPConnector.send_many`.
+    `campaign_items` is a parallel list of (campaign_recipient_id, attempt)
+    pairs for campaign sends.
+    The whole chunk takes its tokens from the profile's bucket at once; if
+    that overdraws it, the chunk is re-queued for when the debt is repaid
+    and an empty list is returned.
+    """
+    return _send_batch(
+        send_batch_task,
+        # one session, one transaction at a time: a lease per domain will do
+        lambda profile, messages, slots: smtp_connector_for(profile).send_many(messages),
+        profile_id,
+        template_id,
+        recipients,
+        vars_list,
+        campaign_items,
+        token_reserved,
+    )
+
+
+@celery.task(bind=True)
+def send_batch_async_task(
+    self,
+    profile_id: int,
+    template_id: int,
+    recipients: list,
+    vars_list: list,
+    campaign_items: list = None,
+    token_reserved: bool = False,
+) -> list:
+    """
+    send_batch_task over AsyncSMTPConnector: the chunk is spread over
+    several concurrent SMTP sessions inside this worker process.
+    """
+    return _send_batch(
+        send_batch_async_task,
+        lambda profile, messages, slots: asyncio.run(
+            async_smtp_connector_for(profile).send_many(messages, slots)
+        ),
+        profile_id,
+        template_id,
+        recipients,
+        vars_list,
+        campaign_items,
+        token_reserved,
+        parallel=SMTP_ASYNC_PER_DOMAIN,
+    )
+
+
+@celery.task
+def import_list_task(job_id: str):
+    """Run a spooled /lists/bulk upload in the background (see ImportJob)."""
+    db: Session = SessionLocal()
+    try:
+        run_import_job(db, job_id)
+    finally:
+        db.close()
+
+
+@celery.task
+def cookie_refresh_task(job_id: str):
+    """Run a bulk cookie refresh AutomationJob (POST /automation/cookies/refresh/bulk)."""
+    db: Session = SessionLocal()
+    try:
+        cookie_refresh.run_refresh_job(db, job_id)
+    finally:
+        db.close()
+
+
+@celery.task
+def scheduled_cookie_refresh_task() -> str:
+    """
+    Refresh every Telegram profile as one job, then delete stored states no
+    profile points at any more; returns the job id.
+    """
+    db: Session = SessionLocal()
+    try:
+        job = cookie_refresh.create_job(db)
+        cookie_refresh.run_refresh_job(db, job.id)
+        state_store.prune(db.scalars(select(Profile.storage_state_ref)))
+        return job.id
+    finally:
+        db.close()
+
+
+@celery.task
+def log_retention_task() -> dict:
+    """Create upcoming log partitions, then apply every profile's retention."""
+    db: Session = SessionLocal()
+    try:
+        log_retention.ensure_partitions(db)
+        return log_retention.run_retention(db)
+    finally:
+        db.close()
+
+
+@celery.task
+def backfill_log_stats_task(since: str = None, until: str = None) -> int:
+    """
+    Rebuild the stats rollups from the raw log between two ISO timestamps
+    (see services.log_stats.backfill); returns the log rows counted.
+    """
+    db: Session = SessionLocal()
+    try:
+        return log_stats.backfill(
+            db,
+            datetime.fromisoformat(since) if since else None,
+            datetime.fromisoformat(until) if until else None,
+        )
+    finally:
+        db.close()
+
+
+# 3) Campaign control tasks
+def _advance_campaign(db: Session, run_id: int) -> None:
+    """
+    Claim the next window of a run's recipients and schedule them, each a
+    jittered delay after the profile's previous send.
+    """
+    info, items = campaign.claim_next(db, run_id)
+    if not items:
+        return
+    profile_id = info["profile_id"]
+    args = [profile_id, info["template_id"]]
+
+    def delay():
+        return sample_delay(
+            info["delay_distribution"], info["min_delay"], info["max_delay"]
+        )
+
+    batch_size = info["batch_size"]
+    if batch_size > 1:
+        batch_task = send_batch_async_task if SMTP_ASYNC_BATCHES else send_batch_task
+        for start in range(0, len(items), batch_size):
+            chunk = items[start : start + batch_size]
+            send_scheduler.schedule(
+                profile_id,
+                batch_task.name,
+                args
+                + [
+                    [it["recipient"] for it in chunk],
+                    [it["context"] for it in chunk],
+                ],
+                {"campaign_items": [(it["id"], it["attempt"]) for it in chunk]},
+                delay(),
+            )
+        return
+    for it in items:
+        send_scheduler.schedule(
+            profile_id,
+            send_message_task.name,
+            args + [it["recipient"], it["context"]],
+            {"campaign_recipient_id": it["id"], "attempt": it["attempt"]},
+            delay(),
         )
-        db.add(log)
-        db.commit()
 
+
+def dispatch_scheduled(now: float = None) -> int:
+    """Hand every due send to the broker; returns how many were released."""
+    released = 0
+    for queue in send_scheduler.queues():
+        for send in send_scheduler.pop_due(queue, now=now):
+            try:
+                celery.tasks[send["task"]].apply_async(
+                    args=send["args"], kwargs=send["kwargs"]
+                )
+            except Exception as e:
+                # broker unavailable: put it back rather than lose the send
+                logger.error("dispatching %s failed: %s", send["task"], e)
+                send_scheduler.schedule_at(
+                    queue, send["task"], send["args"], send["kwargs"], TICK
+                )
+                continue
+            released += 1
+    return released
+
+
+@celery.task
+def dispatch_scheduled_task():
+    return dispatch_scheduled()
+
+
+@celery.task
+def campaign_tick_task(run_id: int, check_domains: bool = False):
+    """
+    Refill a run's send window (also used to kick off a new run; with
+    `check_domains`, undeliverable email recipients are failed first).
+    """
+    db: Session = SessionLocal()
+    try:
+        if check_domains:
+            campaign.mark_undeliverable(db, run_id)
+        _advance_campaign(db, run_id)
     finally:
         db.close()
 
 
-# 4) Campaign control tasks
 @celery.task
 def start_campaign_task(
     profile_id: int,
@@ -101,26 +690,89 @@ def start_campaign_task(
     vars_list: list,
     min_delay: float = 1.0,
     max_delay: float = 5.0,
+    batch_size: int = 1,
+    window: int = None,
 ):
     """
-    Enqueue send_message_task for each recipient with a random delay.
+    Persist a campaign run and start sending it.
     `recipients` is a list of recipient identifiers (emails or user IDs).
     `vars_list` is a parallel list of dicts for template rendering.
+    With `batch_size` > 1 (email profiles), recipients are sent in chunks
+    through send_batch_task instead, one SMTP session per chunk.
+    At most `window` recipients are on the broker at a time; suppressed
+    recipients (and, for email, recipients whose domain can't receive mail)
+    are marked before the first window and never queued.
+    Returns the run id.
     """
-    for recipient, ctx in zip(recipients, vars_list):
-        delay = random.uniform(min_delay, max_delay)
-        send_message_task.apply_async(
-            args=[profile_id, template_id, recipient, ctx],
-            countdown=delay,
+    db: Session = SessionLocal()
+    try:
+        profile = db.query(Profile).get(profile_id)
+        if profile is None:
+            raise ValueError(f"Profile with id {profile_id} not found")
+        run = campaign.create_run(
+            db,
+            profile_id,
+            template_id,
+            recipients,
+            vars_list,
+            window=window,
+            batch_size=batch_size,
+            min_delay=min_delay,
+            max_delay=max_delay,
         )
+        if profile.platform == "email":
+            campaign.mark_undeliverable(db, run.id)
+        if run.suppressed:
+            log_writer.write(
+                profile_id,
+                "start_campaign",
+                "suppressed",
+                f"{run.suppressed} recipients suppressed by lists",
+            )
+        _advance_campaign(db, run.id)
+        return run.id
+    finally:
+        db.close()
 
 
 @celery.task
-def stop_campaign_task(profile_id: int):
+def stop_campaign_task(profile_id: int, pause: bool = False):
     """
-    Signal to stop an in-progress campaign.
-    You’ll need to implement a check in send_message_task (e.g. via a DB flag)
-    to actually halt further sends.
+    Stop (or pause) the profile's active campaign run. Sends already on the
+    broker check the run's status before sending and are skipped.
     """
-    # TODO: flip a “campaign_active” flag in the Profile or Campaign table
-    pass
+    db: Session = SessionLocal()
+    try:
+        run = campaign.active_run(db, profile_id)
+        if run is None:
+            return
+        if pause:
+            campaign.pause(db, run)
+        else:
+            campaign.stop(db, run)
+    finally:
+        db.close()
+
+
+@celery.task
+def resume_campaign_task(run_id: int):
+    """Continue a paused (or stalled) run from its cursor."""
+    db: Session = SessionLocal()
+    try:
+        if campaign.resume(db, run_id):
+            _advance_campaign(db, run_id)
+    finally:
+        db.close()
+
+
+@celery.task
+def campaign_watchdog_task():
+    """Resume running campaigns that have stopped making progress."""
+    db: Session = SessionLocal()
+    try:
+        run_ids = campaign.stale_runs(db)
+    finally:
+        db.close()
+    for run_id in run_ids:
+        logger.warning("campaign run %s stalled; resuming", run_id)
+        resume_campaign_task.delay(run_id)
@@ -1,9 +1,20 @@
+import os
 import tempfile
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+# in-process list index, rate limiter, scheduler and event bus instead of Redis
+os.environ.setdefault("LIST_INDEX_BACKEND", "memory")
+os.environ.setdefault("RATE_LIMIT_BACKEND", "memory")
+os.environ.setdefault("SCHEDULER_BACKEND", "memory")
+os.environ.setdefault("EVENTS_BACKEND", "memory")
+os.environ.setdefault(
+    "LOG_SPOOL_PATH", os.path.join(tempfile.gettempdir(), "mpm-test-log-spool.jsonl")
+)
+os.environ.setdefault("STATE_STORE_DIR", tempfile.mkdtemp(prefix="mpm-test-states-"))
+
 # point to your main app
 from mpm.main import app
 from mpm.database import Base, get_db
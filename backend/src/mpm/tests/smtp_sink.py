@@ -0,0 +1,98 @@
+"""
+Minimal asyncio SMTP sink for tests and benchmarks: accepts everything
+except recipients starting with "refuse" (550) or "defer" (451), records
+delivered recipients, and can add a fixed latency per command to imitate a
+remote server.
+"""
+import asyncio
+import threading
+from typing import List, Optional
+
+
+class SMTPSink:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.delivered: List[str] = []
+        self.connections = 0
+        self.max_concurrent = 0
+        self._active = 0
+        self.port: Optional[int] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._ready = threading.Event()
+
+    async def _reply(self, writer, line: str):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(f"{line}\r\n".encode())
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        self._active += 1
+        self.max_concurrent = max(self.max_concurrent, self._active)
+        rcpts: List[str] = []
+        try:
+            await self._reply(writer, "220 sink ESMTP")
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                cmd = line.decode(errors="replace").strip()
+                verb = cmd[:4].upper()
+                if verb in ("EHLO", "HELO"):
+                    await self._reply(writer, "250 sink")
+                elif verb == "MAIL":
+                    rcpts = []
+                    await self._reply(writer, "250 OK")
+                elif verb == "RCPT":
+                    addr = cmd.partition(":")[2].strip().strip("<>")
+                    if addr.startswith("refuse"):
+                        await self._reply(writer, "550 no such user")
+                    elif addr.startswith("defer"):
+                        await self._reply(writer, "451 try again later")
+                    else:
+                        rcpts.append(addr)
+                        await self._reply(writer, "250 OK")
+                elif verb == "DATA":
+                    await self._reply(writer, "354 go ahead")
+                    while (await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        pass
+                    self.delivered.extend(rcpts)
+                    await self._reply(writer, "250 queued")
+                elif verb == "QUIT":
+                    await self._reply(writer, "221 bye")
+                    break
+                else:
+                    # RSET, NOOP, ...
+                    await self._reply(writer, "250 OK")
+        finally:
+            self._active -= 1
+            writer.close()
+
+    def start(self) -> "SMTPSink":
+        """Serve on 127.0.0.1 from a background thread; sets `port`."""
+
+        async def serve():
+            self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+            self.port = self._server.sockets[0].getsockname()[1]
+            self._ready.set()
+            async with self._server:
+                await self._server.serve_forever()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            try:
+                self._loop.run_until_complete(serve())
+            except asyncio.CancelledError:
+                pass
+            finally:
+                self._loop.close()
+
+        threading.Thread(target=run, daemon=True).start()
+        self._ready.wait(5)
+        return self
+
+    def stop(self) -> None:
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
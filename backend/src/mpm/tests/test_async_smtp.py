@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from mpm.connectors.async_smtp_connector import AsyncSMTPConnector
+from mpm.services.log_writer import log_writer
+from mpm.tests.smtp_sink import SMTPSink
+
+
+@pytest.fixture
+def sink():
+    s = SMTPSink(latency=0.01).start()
+    yield s
+    s.stop()
+
+
+def _connector(sink, **kw):
+    return AsyncSMTPConnector(
+        host="127.0.0.1", port=sink.port, use_ssl=False, use_mailcatcher=True, **kw
+    )
+
+
+def test_send_many_runs_sessions_concurrently(sink):
+    messages = [
+        {"to": f"user{i}@example.com", "subject": "Hi", "body": "Hello"} for i in range(20)
+    ]
+    messages[3]["to"] = "refuse@example.com"
+
+    results = asyncio.run(_connector(sink, max_connections=4).send_many(messages))
+
+    assert [r["to"] for r in results] == [m["to"] for m in messages]
+    assert results[3]["status"] == "refused" and results[3]["code"] == 550
+    assert all(r["status"] == "success" for i, r in enumerate(results) if i != 3)
+    assert sorted(sink.delivered) == sorted(m["to"] for i, m in enumerate(messages) if i != 3)
+    assert sink.max_concurrent == 4
+
+
+def test_per_domain_limit_and_session_rotation(sink):
+    messages = [{"to": f"u{i}@slow.example", "body": "x"} for i in range(6)]
+    conn = _connector(sink, max_connections=3, per_domain_limit=1, max_messages=1)
+
+    results = asyncio.run(conn.send_many(messages))
+
+    assert all(r["status"] == "success" for r in results)
+    # every message used a fresh session (max_messages=1)
+    assert sink.connections == 6
+
+
+def test_unreachable_server_fails_every_message():
+    conn = AsyncSMTPConnector(
+        host="127.0.0.1", port=1, use_ssl=False, use_mailcatcher=True, timeout=2
+    )
+    results = asyncio.run(conn.send_many([{"to": "a@x.com", "body": "x"}] * 3))
+    assert [r["status"] for r in results] == ["error"] * 3
+
+
+def test_async_batch_task_delivers_and_logs(client, sink, monkeypatch):
+    import mpm.tasks as tasks
+    from mpm.database import SessionLocal
+    from mpm.models import LogEntry
+    from mpm.services import domain_throttle
+
+    # keep the whole batch within example.com's domain caps
+    monkeypatch.setitem(
+        domain_throttle.DOMAIN_LIMITS,
+        "example.com",
+        {"per_hour": 10**6, "burst": 50, "concurrency": 50},
+    )
+
+    pid = client.post("/profiles", json={
+        "name": "p-async",
+        "platform": "email",
+        "credentials": {"host": "127.0.0.1", "port": sink.port, "use_mailcatcher": True},
+        "proxy": None,
+        "rate_limit_per_hour": 3_600_000,
+        "rate_limit_burst": 100,
+    }).json()["id"]
+    tid = client.post(
+        "/templates", json={"name": "async", "subject": "Hi {Name}", "body": "Hello {Name}"}
+    ).json()["id"]
+    recipients = [f"a{i}@example.com" for i in range(5)] + ["refuse@example.com"]
+    try:
+        results = tasks.send_batch_async_task(
+            pid, tid, recipients, [{"Name": r} for r in recipients]
+        )
+        assert [r["status"] for r in results] == ["success"] * 5 + ["refused"]
+        assert sorted(sink.delivered) == sorted(recipients[:5])
+        log_writer.flush()
+        db = SessionLocal()
+        try:
+            statuses = [e.status for e in db.query(LogEntry).filter_by(profile_id=pid)]
+        finally:
+            db.close()
+        assert sorted(statuses) == ["error"] + ["success"] * 5
+    finally:
+        log_writer.flush()
+        db = SessionLocal()
+        db.query(LogEntry).filter_by(profile_id=pid).delete()
+        db.commit()
+        db.close()
+        client.delete(f"/templates/{tid}")
+        client.delete(f"/profiles/{pid}")
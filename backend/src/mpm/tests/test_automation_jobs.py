@@ -0,0 +1,190 @@
+import asyncio
+import threading
+import time
+
+from mpm.connectors import playwright_auth
+from mpm.connectors.playwright_auth import LoginCompletion, wait_for_login
+from mpm.connectors.playwright_automation import PlaywrightAutomation
+
+
+def test_capture_runs_as_a_background_job(client, monkeypatch):
+    release = threading.Event()
+
+    async def fake_capture(self, login_url, max_wait_ms, proxy, completion=None, **kwargs):
+        while not release.is_set():  # the operator is still logging in
+            await asyncio.sleep(0.01)
+        state = {"cookies": [{"name": "sid", "value": "1", "domain": ".t.me"}], "origins": []}
+        return {
+            "cookies": state["cookies"],
+            "storage_state": state,
+            "user_agent": "UA",
+            "logged_in": completion == LoginCompletion(selector="#chats"),
+        }
+
+    monkeypatch.setattr(PlaywrightAutomation, "capture_cookies_async", fake_capture)
+    pid = client.post("/profiles", json={
+        "name": "p-capture-job", "platform": "telegram", "credentials": {}, "proxy": None,
+    }).json()["id"]
+
+    res = client.post("/automation/cookies/capture", json={
+        "profile_id": pid, "login_url": "https://web.telegram.org/a/",
+        "completion": {"selector": "#chats"},
+    })
+    assert res.status_code == 202
+    job_id = res.json()["job_id"]
+
+    # the API keeps answering while the capture waits
+    started = time.monotonic()
+    assert client.get("/profiles").status_code == 200
+    job = client.get(f"/automation/jobs/{job_id}?wait=0.2").json()
+    assert job["status"] in ("queued", "running")
+    assert time.monotonic() - started < 2
+
+    release.set()
+    job = client.get(f"/automation/jobs/{job_id}?wait=10").json()
+    assert job["status"] == "completed" and job["kind"] == "cookie_capture"
+    assert job["results"][0]["profile_id"] == pid
+    assert job["results"][0]["logged_in"] is True
+    assert job["results"][0]["storage_state_summary"]["cookie_count"] == 1
+    cookies = client.get(f"/automation/cookies/{pid}").json()
+    assert cookies["cookies"] == [{"name": "sid", "value": "1", "domain": ".t.me"}]
+    assert cookies["user_agent"] == "UA"
+    profile = client.get(f"/profiles/{pid}").json()
+    assert profile["storage_state_ref"] == cookies["storage_state_ref"]
+    assert "cookies" not in profile and "cookies" not in profile["credentials"]
+
+    client.delete(f"/profiles/{pid}")
+
+
+def test_failed_login_job_reports_the_error(client, monkeypatch):
+    from mpm import main
+
+    async def broken(login_url, completion=None, max_wait_ms=120_000):
+        raise OSError("no display")
+
+    monkeypatch.setattr(main.play_auth, "login_async", broken)
+    res = client.post("/api/telegram/login", json={"login_url": "https://web.telegram.org/a/"})
+    job = client.get(f"/automation/jobs/{res.json()['job_id']}?wait=10").json()
+    assert job["status"] == "failed"
+    assert job["detail"] == "Playwright auth failed: no display"
+    assert client.get("/automation/jobs/missing").status_code == 404
+
+    res = client.post("/api/telegram/login", json={
+        "login_url": "https://web.telegram.org/a/", "completion": {"url_pattern": "(["},
+    })
+    assert res.status_code == 422
+
+
+def test_jobs_orphaned_by_a_restart_are_failed(client):
+    from datetime import datetime, timedelta, timezone
+
+    from mpm.database import SessionLocal
+    from mpm.models import AutomationJob
+    from mpm.services import automation_jobs
+
+    old = datetime.now(timezone.utc) - timedelta(hours=1)
+    db = SessionLocal()
+    db.add_all([
+        # the process running these is gone
+        AutomationJob(id="orphan-queued", kind="cookie_capture", status="queued",
+                      params={"timeout": 180}, created_at=old),
+        AutomationJob(id="orphan-running", kind="telegram_login", status="running",
+                      params={"timeout": 180}, created_at=old),
+        # within its deadline: may belong to another API worker
+        AutomationJob(id="live", kind="cookie_capture", status="running",
+                      params={"timeout": 180}),
+        # run by Celery, no deadline here
+        AutomationJob(id="celery", kind="cookie_refresh", status="running",
+                      params={}, created_at=old),
+    ])
+    db.commit()
+    try:
+        assert automation_jobs.reap(db) == 2
+        statuses = {j.id: (j.status, j.detail) for j in db.query(AutomationJob)}
+        assert statuses["orphan-queued"] == ("failed", automation_jobs.INTERRUPTED)
+        assert statuses["orphan-running"][0] == "failed"
+        assert statuses["live"][0] == statuses["celery"][0] == "running"
+
+        # a poll past the deadline fails it too, so clients stop waiting
+        later = datetime.now(timezone.utc) + timedelta(hours=1)
+        live = db.query(AutomationJob).get("live")
+        assert automation_jobs.expire(live, now=later)
+    finally:
+        db.rollback()
+        db.query(AutomationJob).filter(
+            AutomationJob.id.in_(["orphan-queued", "orphan-running", "live", "celery"])
+        ).delete()
+        db.commit()
+        db.close()
+
+
+class FakeContext:
+    def __init__(self):
+        self.jar = []
+
+    async def cookies(self):
+        return list(self.jar)
+
+
+class FakePage:
+    def __init__(self, url):
+        self.url = url
+        self.context = FakeContext()
+        self.selector_shown = asyncio.Event()
+        self.navigated = asyncio.Event()
+
+    def navigate(self, url):
+        self.url = url
+        self.navigated.set()
+        self.navigated = asyncio.Event()
+
+    async def wait_for_url(self, predicate, timeout):
+        async def matched():
+            while not predicate(self.url):
+                await self.navigated.wait()
+
+        await asyncio.wait_for(matched(), timeout / 1000)
+
+    async def wait_for_selector(self, selector, state, timeout):
+        await asyncio.wait_for(self.selector_shown.wait(), timeout / 1000)
+
+
+def test_wait_for_login_returns_as_soon_as_completion_is_met(monkeypatch):
+    monkeypatch.setattr(playwright_auth, "COOKIE_POLL_INTERVAL", 0.01)
+    start = "https://web.telegram.org/a/"
+
+    async def finished_within(page, seconds, completion=None):
+        began = time.monotonic()
+        ok = await wait_for_login(page, 5000, completion)
+        return ok and time.monotonic() - began < seconds
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+
+        # default: any navigation away from the login page
+        page = FakePage(start)
+        loop.call_later(0.01, page.navigate, start + "#12345")
+        assert await finished_within(page, 1)
+
+        # URL pattern: redirects that don't match are ignored
+        page = FakePage(start)
+        loop.call_later(0.01, page.navigate, start + "#login")
+        loop.call_later(0.05, page.navigate, start + "#@durov")
+        assert await finished_within(page, 1, LoginCompletion(url_pattern=r"#@\w+$"))
+        assert page.url.endswith("#@durov")
+
+        page = FakePage(start)
+        loop.call_later(0.01, page.selector_shown.set)
+        assert await finished_within(page, 1, LoginCompletion(selector="#chats"))
+
+        page = FakePage(start)
+        loop.call_later(0.01, page.context.jar.append, {"name": "stel_ssid", "value": "x"})
+        assert await finished_within(
+            page, 1, LoginCompletion(selector="#never", cookie="stel_ssid")
+        )
+
+        # nothing happens: the max wait is a timeout
+        page = FakePage(start)
+        assert not await wait_for_login(page, 50, LoginCompletion(selector="#chats", cookie="sid"))
+
+    asyncio.run(scenario())
@@ -0,0 +1,24 @@
+from mpm.services import backends
+
+
+def test_select_backend_reads_its_variable(monkeypatch):
+    monkeypatch.setattr(backends, "redis_client", lambda: "client")
+    pick = lambda: backends.select_backend("MPM_TEST_BACKEND", lambda: "memory", lambda r: r)
+
+    monkeypatch.setenv("MPM_TEST_BACKEND", "memory")
+    assert pick() == "memory"
+    monkeypatch.setenv("MPM_TEST_BACKEND", "redis")
+    assert pick() == "client"
+    monkeypatch.delenv("MPM_TEST_BACKEND")
+    assert pick() == "client"  # redis is the default
+
+
+def test_redis_backends_share_one_client(monkeypatch):
+    monkeypatch.setenv("REDIS_URL", "redis://example.invalid:6379/0")
+    backends.redis_client.cache_clear()
+    try:
+        client = backends.redis_client()
+        assert backends.redis_client() is client
+        assert client.connection_pool.connection_kwargs["host"] == "example.invalid"
+    finally:
+        backends.redis_client.cache_clear()
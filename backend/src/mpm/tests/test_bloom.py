@@ -0,0 +1,104 @@
+import multiprocessing
+
+import mpm.models as models
+from mpm.database import SessionLocal
+from mpm.services import bloom
+from mpm.services.list_index import list_index
+
+
+def test_bloom_filter_file_roundtrip(tmp_path):
+    path = str(tmp_path / "f.bloom")
+    bf = bloom.BloomFilter.create(path, capacity=1000, fp_rate=0.01)
+    bf.add_many(f"u{i}@example.com" for i in range(1000))
+    bf.close()
+
+    bf = bloom.BloomFilter(path)
+    assert bf.count == 1000
+    assert all(f"U{i}@Example.com " in bf for i in range(1000))
+    false_pos = sum(f"x{i}@example.org" in bf for i in range(10_000))
+    assert false_pos < 300
+
+
+def _add_late():
+    bloom.add_values(1, "blacklist", ["late@example.com"])
+
+
+def test_writers_are_serialised_across_processes(monkeypatch, tmp_path):
+    monkeypatch.setattr(bloom, "FILTER_DIR", str(tmp_path))
+    path = bloom.filter_path(1, "blacklist")
+    bloom.BloomFilter.create(path, 1000).close()
+
+    writer = multiprocessing.get_context("fork").Process(target=_add_late)
+    with bloom.writer_lock(path):
+        writer.start()
+        writer.join(0.3)
+        # blocked behind our lock, e.g. a rebuild in progress
+        assert writer.is_alive()
+        assert "late@example.com" not in bloom.BloomFilter(path)
+    writer.join(5)
+
+    bf = bloom.BloomFilter(path)
+    assert "late@example.com" in bf and bf.count == 1
+    bf.close()
+
+
+def test_screened_suppression_confirms_against_db(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(bloom, "FILTER_DIR", str(tmp_path))
+    pid = client.post("/profiles", json={
+        "name": "p-bloom", "platform": "email", "credentials": {}, "proxy": None,
+    }).json()["id"]
+    body = "profile_id,type,value\n" + "".join(
+        f"{pid},blacklist,b{i}@example.com\n" for i in range(50)
+    )
+    client.post("/lists/bulk", files={"file": ("l.csv", body, "text/csv")})
+
+    bloom.main(["rebuild", "--profile-id", str(pid)])
+    bf = bloom.get_filter(pid, "blacklist")
+    assert bf.count == 50
+
+    # new entries reach the existing filter without a rebuild
+    entry = client.post("/lists", json={
+        "profile_id": pid, "type": "blacklist", "value": "late@example.com",
+    }).json()
+    assert "late@example.com" in bf
+
+    recipients = ["b1@example.com", "late@example.com", "fresh@example.com"]
+    assert list_index.filter_recipients(pid, recipients) == ([2], [0, 1])
+
+    # deleted entries stay in the filter but fail the database confirm
+    client.delete(f"/lists/{entry['id']}")
+    assert "late@example.com" in bf
+    assert list_index.filter_recipients(pid, recipients) == ([1, 2], [0])
+
+    db = SessionLocal()
+    db.query(models.ListEntry).filter_by(profile_id=pid).delete()
+    db.commit()
+    db.close()
+    list_index.invalidate(pid)
+    client.delete(f"/profiles/{pid}")
+
+
+def test_emptied_whitelist_stops_suppressing(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(bloom, "FILTER_DIR", str(tmp_path))
+    pid = client.post("/profiles", json={
+        "name": "p-bloom-white", "platform": "email", "credentials": {}, "proxy": None,
+    }).json()["id"]
+    try:
+        entry = client.post("/lists", json={
+            "profile_id": pid, "type": "whitelist", "value": "ok@example.com",
+        }).json()
+        bloom.rebuild(pid, "whitelist")
+        recipients = ["ok@example.com", "other@example.com"]
+        assert list_index.filter_recipients(pid, recipients) == ([0], [1])
+
+        # the filter still counts the entry, but the list is empty now
+        client.delete(f"/lists/{entry['id']}")
+        assert bloom.get_filter(pid, "whitelist").count == 1
+        assert list_index.filter_recipients(pid, recipients) == ([0, 1], [])
+    finally:
+        db = SessionLocal()
+        db.query(models.ListEntry).filter_by(profile_id=pid).delete()
+        db.commit()
+        db.close()
+        list_index.invalidate(pid)
+        client.delete(f"/profiles/{pid}")
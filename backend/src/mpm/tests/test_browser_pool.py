@@ -0,0 +1,146 @@
+import asyncio
+import threading
+
+import pytest
+
+from mpm.services import browser_pool as bp
+from mpm.services.browser_pool import BrowserPool
+
+
+class FakeContext:
+    def __init__(self, args):
+        self.args = args
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self, proxy, headless):
+        self.proxy = proxy
+        self.headless = headless
+        self.contexts = []
+        self.closed = False
+
+    def is_connected(self):
+        return not self.closed
+
+    async def new_context(self, **args):
+        ctx = FakeContext(args)
+        self.contexts.append(ctx)
+        return ctx
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(bp, "chromium_rss_mb", lambda: None)
+    launched = []
+    lock = threading.Lock()
+
+    async def launcher(proxy, headless):
+        await asyncio.sleep(0.01)  # a launch takes a while; concurrent callers must share it
+        browser = FakeBrowser(proxy, headless)
+        with lock:
+            launched.append(browser)
+        return browser
+
+    p = BrowserPool(launcher=launcher, max_contexts=3)
+    yield p, launched
+    p.close()
+
+
+async def _use(pool, proxy=None, **args):
+    async with pool.context(proxy, **args) as ctx:
+        await asyncio.sleep(0)
+        return ctx
+
+
+def test_contexts_share_one_browser_per_proxy(pool):
+    p, launched = pool
+    a = p.run(_use(p, user_agent="ua-1"))
+    b = p.run(_use(p))
+    c = p.run(_use(p, "http://proxy-1:8080"))
+    assert [(x.proxy, x.headless) for x in launched] == [(None, True), ("http://proxy-1:8080", True)]
+    assert launched[0].contexts == [a, b]
+    assert a.args == {"user_agent": "ua-1"} and a.closed and b.closed and c.closed
+
+
+def test_browser_is_recycled_after_max_contexts(pool):
+    p, launched = pool
+    for _ in range(7):
+        p.run(_use(p))
+    assert len(launched) == 3
+    assert [len(b.contexts) for b in launched] == [3, 3, 1]
+    assert launched[0].closed and launched[1].closed and not launched[2].closed
+
+
+def test_retiring_browser_stays_open_until_its_contexts_close(pool):
+    p, launched = pool
+
+    async def scenario():
+        async with p.context() as first:
+            for _ in range(3):
+                await _use(p)  # the third goes to a second browser
+            assert len(launched) == 2 and not launched[0].closed
+            return first
+
+    first = p.run(scenario())
+    assert first.closed and launched[0].closed and not launched[1].closed
+
+
+def test_memory_limit_retires_the_busiest_browser(pool, monkeypatch):
+    p, launched = pool
+    p.max_contexts = 100
+    p.run(_use(p))
+    p.run(_use(p, "http://proxy-1:8080"))
+    p.run(_use(p))
+    p.run(_use(p))
+    monkeypatch.setattr(bp, "chromium_rss_mb", lambda: p.max_rss_mb + 1)
+    p.run(_use(p, "http://proxy-1:8080"))
+    assert launched[0].closed and not launched[1].closed
+    assert [s["proxy"] for s in p.stats()] == ["http://proxy-1:8080"]
+
+
+def test_concurrent_callers_from_threads_and_loops(pool):
+    p, launched = pool
+    p.max_contexts = 1000
+    results = []
+
+    def worker():
+        results.append(p.run(_use(p)))
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(results) == 10 and len(launched) == 1
+
+    async def other_loop():
+        return await asyncio.gather(*(p.call(_use(p)) for _ in range(5)))
+
+    assert len(asyncio.run(other_loop())) == 5
+    assert len(launched) == 1 and len(launched[0].contexts) == 15
+
+
+def test_close_shuts_every_browser(pool):
+    p, launched = pool
+    p.run(_use(p))
+    p.run(_use(p, "http://proxy-1:8080"))
+    p.close()
+    assert all(b.closed for b in launched)
+    assert p.stats() == []
+
+
+def test_warns_when_the_memory_limit_cannot_be_enforced(monkeypatch, caplog):
+    monkeypatch.setattr(bp, "psutil", None)
+    p = BrowserPool(launcher=None, max_rss_mb=512)
+    try:
+        p.run(asyncio.sleep(0))
+    finally:
+        p.close()
+    assert "BROWSER_POOL_MAX_RSS_MB=512 is not enforced" in caplog.text
@@ -0,0 +1,223 @@
+from datetime import datetime, timedelta, timezone
+
+import mpm.tasks as tasks
+from mpm.database import SessionLocal
+from mpm.models import CampaignRecipient, CampaignRun, LogEntry
+from mpm.services import campaign
+from mpm.services.log_writer import log_writer
+
+
+def _setup(client, name):
+    pid = client.post("/profiles", json={
+        "name": name,
+        "platform": "telegram",
+        "credentials": {},
+        "proxy": None,
+        "rate_limit_per_hour": 3_600_000,
+        "rate_limit_burst": 100,
+    }).json()["id"]
+    tid = client.post(
+        "/templates", json={"name": name, "subject": None, "body": "Hi {Name}"}
+    ).json()["id"]
+    return pid, tid
+
+
+def _cleanup(client, pid, tid):
+    log_writer.flush()
+    db = SessionLocal()
+    try:
+        run_ids = [r.id for r in db.query(CampaignRun).filter_by(profile_id=pid)]
+        db.query(CampaignRecipient).filter(
+            CampaignRecipient.run_id.in_(run_ids)
+        ).delete(synchronize_session=False)
+        db.query(CampaignRun).filter_by(profile_id=pid).delete()
+        db.query(LogEntry).filter_by(profile_id=pid).delete()
+        db.commit()
+    finally:
+        db.close()
+    client.delete(f"/templates/{tid}")
+    client.delete(f"/profiles/{pid}")
+
+
+def _fake_broker(monkeypatch):
+    queue = []
+    monkeypatch.setattr(
+        tasks.send_message_task,
+        "apply_async",
+        lambda args, kwargs: queue.append((args, kwargs)),
+    )
+    monkeypatch.setattr(tasks.campaign_tick_task, "delay", tasks.campaign_tick_task)
+    monkeypatch.setattr(tasks.resume_campaign_task, "delay", tasks.resume_campaign_task)
+    monkeypatch.setattr(tasks.stop_campaign_task, "delay", tasks.stop_campaign_task)
+    return queue
+
+
+def _release(queue):
+    """Move every scheduled send onto the fake broker, however far out it is due."""
+    tasks.dispatch_scheduled(now=float("inf"))
+    return queue
+
+
+def test_campaign_runs_in_bounded_windows(client, monkeypatch):
+    queue = _fake_broker(monkeypatch)
+    pid, tid = _setup(client, "camp-window")
+    recipients = [f"u{i}" for i in range(7)]
+    try:
+        res = client.post(f"/campaigns/{pid}/start", json={
+            "template_id": tid,
+            "recipients": recipients,
+            "vars_list": [{"Name": r} for r in recipients],
+            "window": 2,
+        })
+        assert res.status_code == 200
+        assert res.json()["total"] == 7
+
+        # a second run for the same profile is refused while this one is active
+        res = client.post(f"/campaigns/{pid}/start", json={"template_id": tid, "recipients": ["x"]})
+        assert res.status_code == 409
+
+        sent, peak = [], 0
+        while _release(queue):
+            peak = max(peak, len(queue))
+            args, kwargs = queue.pop(0)
+            sent.append(args[2])
+            tasks.send_message_task(*args, **kwargs)
+
+        assert sorted(sent) == recipients
+        assert peak <= 2
+        run = client.get(f"/campaigns/{pid}").json()
+        assert run["status"] == "completed"
+        assert (run["sent"], run["in_flight"], run["cursor"]) == (7, 0, 7)
+    finally:
+        _cleanup(client, pid, tid)
+
+
+def test_campaign_pause_and_resume_sends_each_recipient_once(client, monkeypatch):
+    queue = _fake_broker(monkeypatch)
+    pid, tid = _setup(client, "camp-pause")
+    recipients = [f"u{i}" for i in range(5)]
+    try:
+        client.post(f"/campaigns/{pid}/start", json={
+            "template_id": tid,
+            "recipients": recipients,
+            "window": 3,
+        })
+        assert len(_release(queue)) == 3
+
+        # one send completes, then the run is paused with the rest in flight
+        args, kwargs = queue.pop(0)
+        tasks.send_message_task(*args, **kwargs)
+        assert client.post(f"/campaigns/{pid}/stop?pause=true").status_code == 200
+        stale = list(queue)
+        queue.clear()
+        for args, kwargs in stale:
+            tasks.send_message_task(*args, **kwargs)
+        run = client.get(f"/campaigns/{pid}").json()
+        assert (run["status"], run["sent"], run["in_flight"]) == ("paused", 1, 0)
+
+        # resume picks up from the cursor; replayed stale messages are ignored
+        assert client.post(f"/campaigns/{pid}/start").status_code == 200
+        for args, kwargs in stale:
+            tasks.send_message_task(*args, **kwargs)
+        delivered = []
+        while _release(queue):
+            args, kwargs = queue.pop(0)
+            delivered.append(args[2])
+            tasks.send_message_task(*args, **kwargs)
+
+        assert sorted(delivered) == recipients[1:]
+        run = client.get(f"/campaigns/{pid}").json()
+        assert (run["status"], run["sent"]) == ("completed", 5)
+    finally:
+        _cleanup(client, pid, tid)
+
+
+def test_campaign_resume_leaves_sends_in_progress_alone(client, monkeypatch):
+    queue = _fake_broker(monkeypatch)
+    pid, tid = _setup(client, "camp-lease")
+    recipients = [f"u{i}" for i in range(5)]
+    try:
+        client.post(f"/campaigns/{pid}/start", json={
+            "template_id": tid,
+            "recipients": recipients,
+            "window": 3,
+        })
+        stale = list(_release(queue))
+        queue.clear()
+        # the first send has started; the other two claims outlived the lease
+        busy_args, busy_kwargs = stale.pop(0)
+        db = SessionLocal()
+        try:
+            rid = busy_kwargs["campaign_recipient_id"]
+            assert campaign.claim_recipient(db, rid, busy_kwargs["attempt"])
+            old = datetime.now(timezone.utc) - timedelta(seconds=campaign.SEND_LEASE + 1)
+            db.query(CampaignRecipient).filter(
+                CampaignRecipient.id.in_([kw["campaign_recipient_id"] for _, kw in stale])
+            ).update({"claimed_at": old}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+        tasks.resume_campaign_task(client.get(f"/campaigns/{pid}").json()["id"])
+        run = client.get(f"/campaigns/{pid}").json()
+        assert run["in_flight"] == 3  # the busy send plus two fresh claims
+
+        # the expired tasks are skipped, then the busy send finishes
+        for args, kwargs in stale:
+            tasks.send_message_task(*args, **kwargs)
+        db = SessionLocal()
+        try:
+            campaign.complete_recipient(db, rid, busy_kwargs["attempt"], "sent")
+        finally:
+            db.close()
+        tasks.campaign_tick_task(run["id"])
+        delivered = [busy_args[2]]
+        while _release(queue):
+            args, kwargs = queue.pop(0)
+            delivered.append(args[2])
+            tasks.send_message_task(*args, **kwargs)
+
+        assert sorted(delivered) == recipients
+        run = client.get(f"/campaigns/{pid}").json()
+        assert (run["status"], run["sent"]) == ("completed", 5)
+    finally:
+        _cleanup(client, pid, tid)
+
+
+def test_resume_leaves_a_stopped_run_stopped(client, monkeypatch):
+    queue = _fake_broker(monkeypatch)
+    pid, tid = _setup(client, "camp-stopped")
+    try:
+        client.post(f"/campaigns/{pid}/start", json={
+            "template_id": tid,
+            "recipients": ["u0", "u1"],
+            "window": 2,
+        })
+        run_id = client.get(f"/campaigns/{pid}").json()["id"]
+        stale = list(_release(queue))
+        queue.clear()
+        # the watchdog queued a resume, then the user stopped the run
+        assert client.post(f"/campaigns/{pid}/stop").status_code == 200
+        db = SessionLocal()
+        try:
+            db.query(CampaignRecipient).filter_by(run_id=run_id).update(
+                {"claimed_at": None}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+        tasks.resume_campaign_task(run_id)
+
+        assert _release(queue) == []
+        for args, kwargs in stale:
+            tasks.send_message_task(*args, **kwargs)
+        db = SessionLocal()
+        try:
+            run = db.query(CampaignRun).get(run_id)
+            statuses = {r.status for r in db.query(CampaignRecipient).filter_by(run_id=run_id)}
+            assert (run.status, run.sent) == ("stopped", 0)
+            assert statuses == {"cancelled"}
+        finally:
+            db.close()
+    finally:
+        _cleanup(client, pid, tid)
@@ -0,0 +1,113 @@
+import asyncio
+import collections
+
+import mpm.models as models
+from mpm.database import SessionLocal
+from mpm.services import cookie_refresh
+from mpm.services.state_store import set_profile_state, state_store
+
+
+def _state(tag):
+    return {"cookies": [{"name": "sid", "value": tag, "domain": ".t.me"}], "origins": []}
+
+
+def _profile(client, name, proxy, tag):
+    res = client.post("/profiles", json={
+        "name": name, "platform": "telegram", "credentials": {"user_agent": "UA"}, "proxy": proxy,
+    })
+    pid = res.json()["id"]
+    if tag:
+        db = SessionLocal()
+        try:
+            set_profile_state(db.query(models.Profile).get(pid), _state(tag))
+            db.commit()
+        finally:
+            db.close()
+    return pid
+
+
+def test_bulk_refresh_job(client, monkeypatch):
+    import mpm.routers.automation as automation
+
+    monkeypatch.setattr(cookie_refresh, "WRITE_BATCH", 2)
+    queued = []
+    monkeypatch.setattr(automation.cookie_refresh_task, "delay", queued.append)
+
+    ids = [
+        _profile(client, f"p-refresh-{i}", f"http://proxy-{i % 2}:8080", f"state_{i}")
+        for i in range(6)
+    ]
+    ids.append(_profile(client, "p-refresh-broken", None, "broken"))
+    ids.append(_profile(client, "p-refresh-never", None, None))
+
+    running = collections.Counter()
+    peak = collections.Counter()
+
+    async def refresh(state, proxy):
+        running[proxy] += 1
+        running["all"] += 1
+        peak[proxy] = max(peak[proxy], running[proxy])
+        peak["all"] = max(peak["all"], running["all"])
+        await asyncio.sleep(0.02)
+        running[proxy] -= 1
+        running["all"] -= 1
+        tag = state["cookies"][0]["value"]
+        if tag == "broken":
+            raise RuntimeError("storage state expired")
+        # even profiles get new cookies, odd ones come back unchanged
+        if int(tag.rpartition("_")[2]) % 2 == 0:
+            tag += "-new"
+        return {"storage_state": _state(tag), "user_agent": "UA"}
+
+    res = client.post("/automation/cookies/refresh/bulk", json={
+        "profile_ids": ids, "concurrency": 3, "per_proxy": 2,
+    })
+    assert res.status_code == 202
+    job_id = res.json()["job_id"]
+    assert queued == [job_id]
+    assert client.get(f"/automation/jobs/{job_id}").json()["status"] == "queued"
+
+    db = SessionLocal()
+    try:
+        cookie_refresh.run_refresh_job(db, job_id, refresh=refresh)
+    finally:
+        db.close()
+
+    data = client.get(f"/automation/jobs/{job_id}").json()
+    assert data["status"] == "completed"
+    assert (data["total"], data["processed"], data["succeeded"], data["failed"]) == (8, 8, 6, 2)
+    errors = {r["profile_id"]: r["detail"] for r in data["results"] if r["status"] == "error"}
+    assert errors[ids[6]] == "storage state expired"
+    assert "Capture first" in errors[ids[7]]
+    assert peak["all"] <= 3 and peak["http://proxy-0:8080"] <= 2 and peak["http://proxy-1:8080"] <= 2
+
+    changed = {r["profile_id"] for r in data["results"] if r["changed"]}
+    assert changed == {ids[0], ids[2], ids[4]}
+    cookies = client.get(f"/automation/cookies/{ids[0]}").json()
+    assert cookies["cookies"][0]["value"] == "state_0-new"
+    assert cookies["storage_state_summary"]["cookie_count"] == 1
+    assert client.get(f"/automation/cookies/{ids[1]}").json()["cookies"][0]["value"] == "state_1"
+
+    for pid in ids:
+        client.delete(f"/profiles/{pid}")
+
+
+def test_refresh_times_out_slow_profiles():
+    slow = state_store.put({"cookies": [], "origins": [{"origin": "https://slow.test"}]})
+    targets = [
+        cookie_refresh.Target(1, None, state_store.put({"cookies": [], "origins": []})),
+        cookie_refresh.Target(2, None, slow),
+    ]
+    outcomes = []
+
+    async def refresh(state, proxy):
+        if state["origins"]:
+            await asyncio.sleep(1)
+        return {"cookies": []}
+
+    asyncio.run(cookie_refresh.refresh_all(
+        targets, lambda *o: outcomes.append(o), refresh, timeout=0.05
+    ))
+    by_id = {t.profile_id: (result, error) for t, result, error in outcomes}
+    assert by_id[1] == ({"cookies": []}, None)
+    assert by_id[2] == (None, "TimeoutError")
@@ -0,0 +1,220 @@
+import pytest
+
+from mpm.services import domain_throttle
+from mpm.services.domain_throttle import MemoryDomainStateStore, classify
+from mpm.services.log_writer import log_writer
+
+
+@pytest.fixture
+def store(monkeypatch):
+    now = [1000.0]
+    s = MemoryDomainStateStore(clock=lambda: now[0])
+    monkeypatch.setattr(domain_throttle, "domain_state", s)
+    monkeypatch.setattr(domain_throttle.time, "time", lambda: now[0])
+    return s, now
+
+
+def test_classify():
+    assert [classify(c) for c in (250, 421, 451, 550, None)] == [
+        "sent", "deferred", "deferred", "failed", "failed"
+    ]
+
+
+def test_deferrals_halve_the_rate_and_back_off(store):
+    s, now = store
+    cap, _ = domain_throttle.domain_limits("slow.example")
+
+    kind, backoff = domain_throttle.record("slow.example", 451)
+    assert kind == "deferred" and backoff == domain_throttle.BACKOFF_BASE
+    assert domain_throttle.current_rate("slow.example") == cap / 2
+    # no sends at all during the backoff window
+    assert domain_throttle.admit("slow.example") == pytest.approx(backoff)
+
+    # consecutive deferrals back off exponentially, down to the rate floor
+    _, backoff2 = domain_throttle.record("slow.example", 421)
+    assert backoff2 == 2 * backoff
+    for _ in range(20):
+        domain_throttle.record("slow.example", 421)
+    assert domain_throttle.current_rate("slow.example") == cap * domain_throttle.MIN_RATE_FRACTION
+
+    # successes raise it additively and reset the backoff growth
+    now[0] += domain_throttle.BACKOFF_MAX + 1
+    domain_throttle.record("slow.example", 250)
+    assert domain_throttle.current_rate("slow.example") == pytest.approx(
+        cap * (domain_throttle.MIN_RATE_FRACTION + domain_throttle.INCREASE_FRACTION)
+    )
+    _, backoff3 = domain_throttle.record("slow.example", 451)
+    assert backoff3 == domain_throttle.BACKOFF_BASE
+
+    (stats,) = domain_throttle.stats()
+    assert (stats["domain"], stats["sent"], stats["deferred"]) == ("slow.example", 1, 23)
+
+
+def test_concurrency_slots(store, monkeypatch):
+    monkeypatch.setitem(domain_throttle.DOMAIN_LIMITS, "busy.example", {"concurrency": 2})
+    a = domain_throttle.acquire_slot("busy.example")
+    b = domain_throttle.acquire_slot("busy.example")
+    assert a and b and domain_throttle.acquire_slot("busy.example") is None
+    domain_throttle.release_slot("busy.example", a)
+    assert domain_throttle.acquire_slot("busy.example") is not None
+
+
+def test_domains_are_throttled_by_mx_host(monkeypatch):
+    from mpm.services.mx_cache import MXCache, MXResult, Resolver
+
+    class Hosted(Resolver):
+        def resolve(self, domain):
+            return MXResult(domain, "ok", ("ALT1.mx.example", "mx.example"), 300)
+
+    monkeypatch.setattr(domain_throttle, "mx_cache", MXCache(Hosted()))
+    monkeypatch.setitem(domain_throttle.DOMAIN_LIMITS, "own.example", {"burst": 9})
+    assert domain_throttle.throttle_key("a.example") == "alt1.mx.example"
+    assert domain_throttle.throttle_key("B.example") == "alt1.mx.example"
+    # a domain with its own limits keeps them
+    assert domain_throttle.throttle_key("own.example") == "own.example"
+    assert domain_throttle.domain_burst("own.example") == 9
+    assert domain_throttle.domain_burst("alt1.mx.example") == domain_throttle.DEFAULT_BURST
+
+
+def test_batches_hold_domain_slots_while_sending(client, store, monkeypatch):
+    import mpm.tasks as tasks
+    from mpm.database import SessionLocal
+    from mpm.models import LogEntry
+    from mpm.services.scheduler import send_scheduler
+
+    monkeypatch.setitem(domain_throttle.DOMAIN_LIMITS, "full.example", {"concurrency": 1})
+    monkeypatch.setitem(domain_throttle.DOMAIN_LIMITS, "open.example", {"concurrency": 3})
+    held = {}
+
+    def deliver(profile, messages, slots):
+        messages = list(messages)
+        held.update((d, store[0].state(d)["in_flight"]) for d in slots)
+        return [{"to": m["to"], "status": "success", "code": 250, "detail": None} for m in messages]
+
+    pid = client.post("/profiles", json={
+        "name": "p-domain-slots", "platform": "email", "credentials": {}, "proxy": None,
+        "rate_limit_per_hour": 3_600_000, "rate_limit_burst": 100,
+    }).json()["id"]
+    tid = client.post("/templates", json={"name": "slots", "subject": "s", "body": "b"}).json()["id"]
+    busy = domain_throttle.acquire_slot("full.example")  # another worker's send
+    try:
+        recipients = ["a@open.example", "b@open.example", "c@full.example"]
+        results = tasks._send_batch(
+            tasks.send_batch_task, deliver, pid, tid, recipients, [{}] * 3, parallel=2
+        )
+        assert [r["to"] for r in results] == ["a@open.example", "b@open.example"]
+        assert held == {"open.example": 2}
+        (retry,) = send_scheduler.pop_due("domain:full.example", now=float("inf"))
+        assert retry["args"][2] == "c@full.example"
+        # released once the chunk is done
+        assert store[0].state("open.example")["in_flight"] == 0
+    finally:
+        domain_throttle.release_slot("full.example", busy)
+        log_writer.flush()
+        db = SessionLocal()
+        db.query(LogEntry).filter_by(profile_id=pid).delete()
+        db.commit()
+        db.close()
+        client.delete(f"/templates/{tid}")
+        client.delete(f"/profiles/{pid}")
+
+
+def test_failed_batch_only_errors_unresolved_recipients(client, store, monkeypatch):
+    import mpm.tasks as tasks
+    from mpm.database import SessionLocal
+    from mpm.models import LogEntry
+    from mpm.services.scheduler import send_scheduler
+
+    monkeypatch.setitem(domain_throttle.DOMAIN_LIMITS, "full.example", {"concurrency": 1})
+    monkeypatch.setattr(tasks.campaign, "claim_recipient", lambda db, rid, attempt: True)
+    finished = {}
+    monkeypatch.setattr(
+        tasks,
+        "_finish_campaign_item",
+        lambda db, rid, attempt, status, detail: finished.__setitem__(rid, status),
+    )
+    record = domain_throttle.record
+    calls = []
+
+    def flaky_record(key, code):
+        calls.append(key)
+        if len(calls) == 2:
+            raise RuntimeError("state store went away")
+        return record(key, code)
+
+    monkeypatch.setattr(domain_throttle, "record", flaky_record)
+
+    def deliver(profile, messages, slots):
+        return [{"to": m["to"], "status": "success", "code": 250, "detail": None} for m in messages]
+
+    pid = client.post("/profiles", json={
+        "name": "p-batch-fail", "platform": "email", "credentials": {}, "proxy": None,
+        "rate_limit_per_hour": 3_600_000, "rate_limit_burst": 100,
+    }).json()["id"]
+    tid = client.post("/templates", json={"name": "batch-fail", "subject": "s", "body": "b"}).json()["id"]
+    busy = domain_throttle.acquire_slot("full.example")
+    try:
+        recipients = ["a@open.example", "b@open.example", "c@full.example"]
+        tasks._send_batch(
+            tasks.send_batch_task, deliver, pid, tid, recipients, [{}] * 3,
+            campaign_items=[(1, 1), (2, 1), (3, 1)], parallel=2,
+        )
+        # a was sent before the failure and c went to its domain queue
+        assert finished == {1: "sent", 2: "error"}
+        (retry,) = send_scheduler.pop_due("domain:full.example", now=float("inf"))
+        assert retry["kwargs"]["campaign_recipient_id"] == 3
+    finally:
+        domain_throttle.release_slot("full.example", busy)
+        log_writer.flush()
+        db = SessionLocal()
+        db.query(LogEntry).filter_by(profile_id=pid).delete()
+        db.commit()
+        db.close()
+        client.delete(f"/templates/{tid}")
+        client.delete(f"/profiles/{pid}")
+
+
+def test_batch_defers_4xx_recipients_to_their_domain_queue(client):
+    import mpm.tasks as tasks
+    from mpm.database import SessionLocal
+    from mpm.models import LogEntry
+    from mpm.services.scheduler import send_scheduler
+    from mpm.tests.smtp_sink import SMTPSink
+
+    sink = SMTPSink().start()
+    pid = client.post("/profiles", json={
+        "name": "p-domains",
+        "platform": "email",
+        "credentials": {"host": "127.0.0.1", "port": sink.port, "use_mailcatcher": True},
+        "proxy": None,
+        "rate_limit_per_hour": 3_600_000,
+        "rate_limit_burst": 100,
+    }).json()["id"]
+    tid = client.post("/templates", json={"name": "dom", "subject": "s", "body": "b"}).json()["id"]
+    recipients = ["ok@fine.example", "defer@grey.example"]
+    try:
+        results = tasks.send_batch_async_task(pid, tid, recipients, [{}, {}])
+        assert [r["code"] for r in results] == [250, 451]
+        assert sink.delivered == ["ok@fine.example"]
+
+        # the deferred recipient waits on grey.example's own retry queue
+        assert send_scheduler.pending("domain:fine.example") == 0
+        (retry,) = send_scheduler.pop_due("domain:grey.example", now=float("inf"))
+        assert retry["args"][2] == "defer@grey.example"
+        assert retry["kwargs"]["deferrals"] == 1
+
+        stats = {d["domain"]: d for d in client.get("/domains").json()}
+        assert stats["grey.example"]["deferred"] >= 1
+        assert stats["grey.example"]["backoff_seconds"] > 0
+        assert stats["fine.example"]["sent"] >= 1
+    finally:
+        sink.stop()
+        for domain in ("fine.example", "grey.example"):
+            domain_throttle.domain_state.reset(domain)
+        log_writer.flush()
+        db = SessionLocal()
+        db.query(LogEntry).filter_by(profile_id=pid).delete()
+        db.commit()
+        db.close()
+        client.delete(f"/templates/{tid}")
+        client.delete(f"/profiles/{pid}")
@@ -11,5 +11,10 @@ def test_email_endpoint(client, monkeypatch):
         "/api/test-email",
         json={"to_address": "test@local", "subject": "Ping", "body": "Hello"},
     )
-    assert res.status_code == 200
-    assert res.json()["status"] == "sent"
+    assert res.status_code == 202
+    job_id = res.json()["job_id"]
+
+    # the send runs in the background; long-poll for its outcome
+    job = client.get(f"/automation/jobs/{job_id}?wait=10").json()
+    assert job["status"] == "completed", job["detail"]
+    assert job["results"] == [{"status": "sent"}]
@@ -0,0 +1,89 @@
+import asyncio
+
+from mpm.routers import events as events_router
+from mpm.services import events
+from mpm.services.events import EventHub, MemoryEventBus, Subscription
+
+
+async def _next(agen, timeout=3):
+    return await asyncio.wait_for(agen.__anext__(), timeout)
+
+
+def test_hub_fans_out_by_profile_and_campaign():
+    bus = MemoryEventBus()
+    hub = EventHub(bus)
+
+    async def scenario():
+        loop = asyncio.get_running_loop()
+        mine = hub.subscribe(loop, profile_ids=[1])
+        run = hub.subscribe(loop, run_ids=[7])
+        everything = hub.subscribe(loop)
+        bus.publish({"type": "log", "profile_id": 2})
+        bus.publish({"type": "log", "profile_id": 1})
+        bus.publish({"type": "campaign", "profile_id": 3, "run_id": 7})
+        got_mine = await asyncio.wait_for(mine.queue.get(), 3)
+        got_run = await asyncio.wait_for(run.queue.get(), 3)
+        got_all = [await asyncio.wait_for(everything.queue.get(), 3) for _ in range(3)]
+        return got_mine, got_run, got_all
+
+    mine, run, everything = asyncio.run(scenario())
+    assert mine[1]["profile_id"] == 1
+    assert run[1]["run_id"] == 7
+    assert [e["profile_id"] for _, e in everything] == [2, 1, 3]
+    assert events.id_key(everything[0][0]) < events.id_key(everything[2][0])
+
+
+def test_slow_subscriber_is_cut_off():
+    async def scenario():
+        sub = Subscription(asyncio.get_running_loop(), buffer=2)
+        for i in range(3):
+            sub.offer((f"1-{i}", {"type": "log"}))
+        return sub
+
+    sub = asyncio.run(scenario())
+    assert sub.overflowed
+    assert sub.queue.qsize() == 1 and sub.queue.get_nowait() is None
+
+
+def test_stream_resumes_after_last_event_id(monkeypatch):
+    bus = MemoryEventBus()
+    hub = EventHub(bus)
+    monkeypatch.setattr(events, "hub", hub)
+    first = bus.publish({"type": "log", "profile_id": 1, "status": "a"})
+    bus.publish({"type": "log", "profile_id": 2, "status": "b"})
+    bus.publish({"type": "log", "profile_id": 1, "status": "c"})
+
+    async def scenario():
+        sub = hub.subscribe(asyncio.get_running_loop(), profile_ids=[1])
+        stream = events_router.event_stream(sub, resume=first)
+        out = [await _next(stream), await _next(stream)]
+        bus.publish({"type": "log", "profile_id": 1, "status": "d"})
+        out.append(await _next(stream))
+        await stream.aclose()
+        return out, sub
+
+    (retry, backlog, live), sub = asyncio.run(scenario())
+    assert retry.startswith("retry:")
+    assert '"status": "c"' in backlog and backlog.startswith("id: ")
+    assert '"status": "d"' in live
+    assert sub not in hub._subs
+
+
+def test_log_writes_are_published(monkeypatch):
+    from mpm.services.log_writer import LogWriter
+
+    bus = MemoryEventBus()
+    monkeypatch.setattr(events, "event_bus", bus)
+    writer = LogWriter(
+        session_factory=lambda: None, batch_size=100, flush_interval=0, spool_path=None
+    )
+    monkeypatch.setattr(writer, "_write_or_spool", lambda rows: len(rows))
+    monkeypatch.setattr(writer, "_take_spool", lambda: ([], None))
+    writer.write(42, "send_message_email", "success")
+    writer.write(42, "send_message_email", "error", "boom")
+    # published with the flush, not on the send path
+    assert bus.read("0-0") == []
+    writer.flush()
+    (_, first), (_, second) = bus.read("0-0")
+    assert (first["type"], first["profile_id"], first["status"]) == ("log", 42, "success")
+    assert (second["status"], second["detail"]) == ("error", "boom")
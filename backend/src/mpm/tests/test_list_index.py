@@ -0,0 +1,76 @@
+import mpm.models as models
+from mpm.database import SessionLocal
+from mpm.services.list_index import list_index
+
+
+def test_index_tracks_router_updates(client):
+    pid = client.post("/profiles", json={
+        "name": "p-index", "platform": "email", "credentials": {}, "proxy": None,
+    }).json()["id"]
+
+    e1 = client.post("/lists", json={
+        "profile_id": pid, "type": "blacklist", "value": "Spam@Example.com",
+    }).json()["id"]
+    recipients = ["spam@example.com", "ok@example.com"]
+    assert list_index.filter_recipients(pid, recipients) == ([1], [0])
+
+    # bulk import is reflected without a reload
+    version = list_index.version(pid, "blacklist")
+    client.post(
+        "/lists/bulk",
+        files={"file": ("l.csv", f"profile_id,type,value\n{pid},blacklist,ok@example.com\n", "text/csv")},
+    )
+    assert list_index.version(pid, "blacklist") > version
+    assert list_index.filter_recipients(pid, recipients) == ([], [0, 1])
+
+    # a non-empty whitelist suppresses everyone not on it
+    for e in client.get(f"/lists?profile_id={pid}&type=blacklist").json():
+        client.delete(f"/lists/{e['id']}")
+    e2 = client.post("/lists", json={
+        "profile_id": pid, "type": "whitelist", "value": "ok@example.com",
+    }).json()["id"]
+    assert list_index.filter_recipients(pid, recipients) == ([1], [0])
+
+    client.delete(f"/lists/{e2}")
+    assert list_index.filter_recipients(pid, recipients) == ([0, 1], [])
+    client.delete(f"/profiles/{pid}")
+    assert e1
+
+
+def test_bulk_check_of_many_recipients(client):
+    pid = client.post("/profiles", json={
+        "name": "p-index-bulk", "platform": "email", "credentials": {}, "proxy": None,
+    }).json()["id"]
+    body = "profile_id,type,value\n" + "".join(
+        f"{pid},blacklist,user{i}@example.com\n" for i in range(0, 100_000, 10)
+    )
+    client.post("/lists/bulk", files={"file": ("l.csv", body, "text/csv")})
+
+    recipients = [f"user{i}@example.com" for i in range(100_000)]
+    allowed, suppressed = list_index.filter_recipients(pid, recipients)
+    assert len(suppressed) == 10_000
+    assert len(allowed) == 90_000
+
+    db = SessionLocal()
+    db.query(models.ListEntry).filter_by(profile_id=pid).delete()
+    db.commit()
+    db.close()
+    list_index.invalidate(pid)
+    client.delete(f"/profiles/{pid}")
+
+
+def test_add_during_a_load_is_not_lost():
+    from mpm.services.list_index import MemoryListIndex
+
+    index = MemoryListIndex()
+    snapshots = [["a@example.com"], ["a@example.com", "late@example.com"]]
+
+    def load(profile_id, list_type):
+        rows = snapshots.pop(0)
+        if snapshots:
+            # committed and announced while this snapshot was being read
+            index.add(profile_id, list_type, ["late@example.com"])
+        return iter(rows)
+
+    index._load = load
+    assert index.contains_many(1, "blacklist", ["late@example.com"]) == [True]
@@ -30,3 +30,247 @@ def test_list_and_log_crud(client):
     # Cleanup
     client.delete(f"/lists/{entry_id}")
     client.delete(f"/profiles/{pid}")
+
+
+def test_bulk_upload_streams_rows_in_batches(client, monkeypatch):
+    import mpm.services.list_import as list_import
+
+    res = client.post("/profiles", json={
+        "name": "p-bulk",
+        "platform": "email",
+        "credentials": {},
+        "proxy": None,
+    })
+    pid = res.json()["id"]
+
+    rows = [f"{pid},blacklist,user{i}@example.com" for i in range(7)]
+    rows += [f"{pid},greylist,x@example.com", "abc,blacklist,y@example.com", f"{pid},whitelist,"]
+    csv_body = "Profile_ID,type,value\n" + "\n".join(rows) + "\n"
+
+    batches = []
+    real_insert = list_import._insert_batch
+    monkeypatch.setattr(
+        list_import, "_insert_batch", lambda db, b: (batches.append(len(b)), real_insert(db, b))
+    )
+    monkeypatch.setattr(list_import, "BATCH_SIZE", 3)
+
+    res = client.post("/lists/bulk", files={"file": ("list.csv", csv_body, "text/csv")})
+    assert res.status_code == 200
+    data = res.json()
+    assert data["inserted"] == 7
+    assert data["skipped"] == 3
+    assert [e["line"] for e in data["errors"]] == [9, 10, 11]
+    assert batches == [3, 3, 1]
+
+    res = client.get(f"/lists?profile_id={pid}&type=blacklist&limit=100")
+    entries = res.json()
+    assert len(entries) == 7
+
+    # Cleanup
+    for e in entries:
+        client.delete(f"/lists/{e['id']}")
+    client.delete(f"/profiles/{pid}")
+
+
+def test_bulk_upload_rejects_missing_headers(client):
+    res = client.post("/lists/bulk", files={"file": ("list.csv", "profile_id,value\n1,a\n", "text/csv")})
+    assert res.status_code == 400
+
+
+def test_bulk_upload_background_job(client, monkeypatch, tmp_path):
+    import mpm.routers.list_manager as list_manager
+    from mpm.tasks import import_list_task
+
+    monkeypatch.setattr(list_manager, "SPOOL_DIR", str(tmp_path))
+    queued = []
+    monkeypatch.setattr(import_list_task, "delay", queued.append)
+
+    res = client.post("/profiles", json={
+        "name": "p-job",
+        "platform": "email",
+        "credentials": {},
+        "proxy": None,
+    })
+    pid = res.json()["id"]
+    csv_body = "profile_id,type,value\n" + "".join(
+        f"{pid},blacklist,job{i}@example.com\n" for i in range(5)
+    )
+
+    res = client.post(
+        "/lists/bulk?background=true",
+        files={"file": ("list.csv", csv_body, "text/csv")},
+    )
+    assert res.status_code == 202
+    job_id = res.json()["job_id"]
+    assert queued == [job_id]
+
+    res = client.get(f"/lists/bulk/{job_id}")
+    assert res.json()["status"] == "queued"
+    assert res.json()["bytes_total"] == len(csv_body)
+
+    # Run the Celery task body inline
+    import_list_task.run(job_id)
+
+    data = client.get(f"/lists/bulk/{job_id}").json()
+    assert data["status"] == "completed"
+    assert data["rows_processed"] == 5
+    assert data["bytes_processed"] == data["bytes_total"]
+    assert list(tmp_path.iterdir()) == []
+
+    res = client.post(f"/lists/bulk/{job_id}/cancel")
+    assert res.status_code == 409
+
+    # Cleanup
+    for e in client.get(f"/lists?profile_id={pid}&limit=100").json():
+        client.delete(f"/lists/{e['id']}")
+    client.delete(f"/profiles/{pid}")
+
+
+def test_cancelled_import_rolls_back_committed_batches(client, monkeypatch, tmp_path):
+    import mpm.models as models
+    import mpm.services.list_import as list_import
+    from mpm.database import SessionLocal
+
+    monkeypatch.setattr(list_import, "BATCH_SIZE", 2)
+    pid = client.post("/profiles", json={
+        "name": "p-cancel", "platform": "email", "credentials": {}, "proxy": None,
+    }).json()["id"]
+    path = tmp_path / "upload.csv"
+    path.write_text("profile_id,type,value\n" + "".join(
+        f"{pid},blacklist,c{i}@example.com\n" for i in range(6)
+    ))
+
+    db = SessionLocal()
+    try:
+        db.add(models.ImportJob(
+            id="cancel-test", path=str(path), status="queued",
+            bytes_total=path.stat().st_size,
+            cancel_requested=True, rollback_on_cancel=True,
+        ))
+        db.commit()
+        list_import.run_import_job(db, "cancel-test")
+
+        job = db.query(models.ImportJob).get("cancel-test")
+        assert job.status == "cancelled"
+        assert job.inserted == 0
+        assert db.query(models.ListEntry).filter_by(import_job_id="cancel-test").count() == 0
+        db.delete(job)
+        db.commit()
+    finally:
+        db.close()
+    client.delete(f"/profiles/{pid}")
+
+
+def test_logs_keyset_pagination_and_time_range(client):
+    from datetime import datetime, timedelta, timezone
+
+    import mpm.models as models
+    from mpm.database import SessionLocal
+
+    pid = client.post("/profiles", json={
+        "name": "p-logs", "platform": "email", "credentials": {}, "proxy": None,
+    }).json()["id"]
+    base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    db = SessionLocal()
+    try:
+        # pairs share a timestamp, so pages must break ties on id
+        db.add_all(
+            models.LogEntry(
+                profile_id=pid,
+                action="send_message",
+                status="success",
+                timestamp=base + timedelta(minutes=i // 2),
+            )
+            for i in range(7)
+        )
+        db.commit()
+        expected = [
+            e.id
+            for e in db.query(models.LogEntry)
+            .filter_by(profile_id=pid)
+            .order_by(models.LogEntry.timestamp.desc(), models.LogEntry.id.desc())
+        ]
+
+        seen, cursor = [], None
+        while True:
+            params = {"profile_id": pid, "limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            res = client.get("/logs", params=params)
+            assert res.status_code == 200
+            seen += [e["id"] for e in res.json()]
+            cursor = res.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+        assert seen == expected
+
+        res = client.get("/logs", params={
+            "profile_id": pid,
+            "since": (base + timedelta(minutes=1)).isoformat(),
+            "until": (base + timedelta(minutes=3)).isoformat(),
+        })
+        assert len(res.json()) == 4
+        assert "X-Next-Cursor" not in res.headers
+
+        assert client.get("/logs", params={"cursor": "not-a-cursor"}).status_code == 400
+    finally:
+        db.query(models.LogEntry).filter_by(profile_id=pid).delete()
+        db.commit()
+        db.close()
+        client.delete(f"/profiles/{pid}")
+
+
+def test_logs_export_streams_ndjson_and_csv(client, monkeypatch):
+    import csv
+    import gzip
+    import io
+    import json
+    from datetime import datetime, timezone
+
+    import mpm.models as models
+    import mpm.routers.logs as logs
+    from mpm.database import SessionLocal
+
+    monkeypatch.setattr(logs, "EXPORT_CHUNK_ROWS", 2)
+    pid = client.post("/profiles", json={
+        "name": "p-export", "platform": "email", "credentials": {}, "proxy": None,
+    }).json()["id"]
+    db = SessionLocal()
+    try:
+        db.add_all(
+            models.LogEntry(
+                profile_id=pid,
+                action="send_message_email",
+                status=status,
+                detail=detail,
+                timestamp=datetime(2026, 1, 1, 0, i, tzinfo=timezone.utc),
+            )
+            for i, (status, detail) in enumerate(
+                [("success", None), ("error", 'a@x.example: 550 "no", thanks'), ("success", None)]
+            )
+        )
+        db.commit()
+
+        res = client.get("/logs/export", params={"profile_id": pid})
+        assert res.headers["content-type"] == "application/x-ndjson"
+        records = [json.loads(line) for line in res.text.splitlines()]
+        assert [r["status"] for r in records] == ["success", "error", "success"]
+        assert records[1]["detail"] == 'a@x.example: 550 "no", thanks'
+
+        res = client.get(
+            "/logs/export", params={"profile_id": pid, "status": "error", "format": "csv"}
+        )
+        rows = list(csv.reader(io.StringIO(res.text)))
+        assert rows[0] == list(logs.EXPORT_COLUMNS)
+        assert len(rows) == 2 and rows[1][4] == 'a@x.example: 550 "no", thanks'
+
+        res = client.get(
+            "/logs/export", params={"profile_id": pid, "format": "csv", "gzip": True}
+        )
+        assert res.headers["content-disposition"] == 'attachment; filename="logs.csv.gz"'
+        assert len(gzip.decompress(res.content).decode().splitlines()) == 4
+    finally:
+        db.query(models.LogEntry).filter_by(profile_id=pid).delete()
+        db.commit()
+        db.close()
+        client.delete(f"/profiles/{pid}")
@@ -0,0 +1,68 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+import mpm.models as models
+from mpm.database import SessionLocal
+from mpm.services import log_retention
+
+
+def test_partition_names_roll_over_the_year():
+    dec = datetime(2026, 12, 1, tzinfo=timezone.utc)
+    assert log_retention.partition_name(dec) == "log_entries_y2026m12"
+    assert log_retention._next_month(dec) == datetime(2027, 1, 1, tzinfo=timezone.utc)
+
+
+def test_retention_archives_then_deletes_expired_rows(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(log_retention, "ARCHIVE_DIR", str(tmp_path))
+    monkeypatch.setattr(log_retention, "DELETE_BATCH", 2)
+    monkeypatch.setattr(log_retention, "DEFAULT_RETENTION_DAYS", 0)
+    short = client.post("/profiles", json={
+        "name": "p-ret-short", "platform": "email", "credentials": {}, "proxy": None,
+        "log_retention_days": 7,
+    }).json()
+    forever = client.post("/profiles", json={
+        "name": "p-ret-forever", "platform": "email", "credentials": {}, "proxy": None,
+    }).json()
+    assert short["log_retention_days"] == 7
+    now = datetime(2026, 6, 1, tzinfo=timezone.utc)
+    db = SessionLocal()
+    try:
+        for pid in (short["id"], forever["id"]):
+            db.add_all(
+                models.LogEntry(
+                    profile_id=pid,
+                    action="send_message",
+                    status="success",
+                    timestamp=now - timedelta(days=age),
+                )
+                for age in (30, 20, 10, 1)
+            )
+        db.add(models.LogStatMinute(
+            bucket=now - timedelta(days=90), profile_id=short["id"],
+            action="send_message", status="success", count=1,
+        ))
+        db.commit()
+
+        result = log_retention.run_retention(db, now=now)
+        assert result["rows_archived"] == 3
+        assert result["minute_stats_deleted"] >= 1
+        left = {
+            pid: db.query(models.LogEntry).filter_by(profile_id=pid).count()
+            for pid in (short["id"], forever["id"])
+        }
+        assert left == {short["id"]: 1, forever["id"]: 4}
+
+        (archive,) = tmp_path.iterdir()
+        with gzip.open(archive, "rt") as f:
+            records = [json.loads(line) for line in f]
+        assert len(records) == 3
+        assert {r["profile_id"] for r in records} == {short["id"]}
+    finally:
+        for pid in (short["id"], forever["id"]):
+            db.query(models.LogEntry).filter_by(profile_id=pid).delete()
+            db.query(models.LogStatMinute).filter_by(profile_id=pid).delete()
+        db.commit()
+        db.close()
+        client.delete(f"/profiles/{short['id']}")
+        client.delete(f"/profiles/{forever['id']}")
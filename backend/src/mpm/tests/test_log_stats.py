@@ -0,0 +1,97 @@
+from datetime import datetime, timezone
+
+import mpm.models as models
+from mpm.database import SessionLocal
+from mpm.services import log_stats
+from mpm.services.log_writer import log_writer
+
+
+def _ts(hour, minute, second=0):
+    return datetime(2026, 3, 1, hour, minute, second, tzinfo=timezone.utc)
+
+
+def test_aggregate_buckets_by_minute_and_hour():
+    rows = [
+        {"profile_id": 1, "action": "send", "status": "success", "timestamp": _ts(9, 5, 10)},
+        {"profile_id": 1, "action": "send", "status": "success", "timestamp": _ts(9, 5, 50)},
+        {"profile_id": 1, "action": "send", "status": "error", "timestamp": _ts(9, 40)},
+    ]
+    counts = log_stats.aggregate(rows)
+    assert counts["minute"][(_ts(9, 5), 1, "send", "success")] == 2
+    assert counts["hour"][(_ts(9, 0), 1, "send", "success")] == 2
+    assert counts["hour"][(_ts(9, 0), 1, "send", "error")] == 1
+
+
+def _cleanup(client, pid, delete_profile=True):
+    log_writer.flush()
+    db = SessionLocal()
+    try:
+        for model in (models.LogEntry, models.LogStatMinute, models.LogStatHour):
+            db.query(model).filter_by(profile_id=pid).delete()
+        db.commit()
+    finally:
+        db.close()
+    if delete_profile:
+        client.delete(f"/profiles/{pid}")
+
+
+def test_writer_maintains_rollups_and_stats_endpoint(client):
+    pid = client.post("/profiles", json={
+        "name": "p-stats", "platform": "email", "credentials": {}, "proxy": None,
+    }).json()["id"]
+    # profile ids get reused, and other tests only clean up raw log rows
+    _cleanup(client, pid, delete_profile=False)
+    try:
+        for status in ("success", "success", "error"):
+            log_writer.write(pid, "send_message_email", status)
+        log_writer.flush()
+        log_writer.write(pid, "send_message_email", "success")
+        log_writer.flush()
+
+        res = client.get("/logs/stats", params={"profile_id": pid})
+        assert res.status_code == 200
+        totals = {}
+        for row in res.json():
+            totals[row["status"]] = totals.get(row["status"], 0) + row["count"]
+        assert totals == {"success": 3, "error": 1}
+
+        res = client.get("/logs/stats", params={"profile_id": pid, "period": "minute"})
+        assert sum(r["count"] for r in res.json()) == 4
+    finally:
+        _cleanup(client, pid)
+
+
+def test_backfill_rebuilds_from_raw_logs(client):
+    pid = client.post("/profiles", json={
+        "name": "p-backfill", "platform": "email", "credentials": {}, "proxy": None,
+    }).json()["id"]
+    _cleanup(client, pid, delete_profile=False)
+    db = SessionLocal()
+    try:
+        db.add_all(
+            models.LogEntry(
+                profile_id=pid, action="send_message", status="success", timestamp=ts
+            )
+            for ts in (_ts(9, 1), _ts(9, 1, 30), _ts(10, 15))
+        )
+        # a stale rollup row the backfill must replace
+        db.add(models.LogStatHour(
+            bucket=_ts(9, 0), profile_id=pid, action="send_message", status="success", count=99
+        ))
+        db.commit()
+
+        assert log_stats.backfill(db, since=_ts(9, 30), until=_ts(11, 0)) == 3
+        # twice in a row gives the same counts
+        log_stats.backfill(db, since=_ts(9, 0), until=_ts(11, 0))
+
+        res = client.get("/logs/stats", params={
+            "profile_id": pid, "since": _ts(9, 0).isoformat(), "until": _ts(11, 0).isoformat(),
+        })
+        assert [(r["bucket"][:16], r["count"]) for r in res.json()] == [
+            ("2026-03-01T09:00", 2), ("2026-03-01T10:00", 1)
+        ]
+        res = client.get("/logs/stats", params={"profile_id": pid, "period": "minute"})
+        assert [r["count"] for r in res.json()] == [2, 1]
+    finally:
+        db.close()
+        _cleanup(client, pid)
@@ -0,0 +1,126 @@
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from mpm.database import Base
+from mpm.models import LogEntry, LogStatHour, LogStatMinute
+from mpm.services.log_writer import LogWriter
+
+
+def _writer(tmp_path, **kwargs):
+    engine = create_engine(f"sqlite:///{tmp_path / 'logs.db'}")
+    Base.metadata.create_all(
+        engine, tables=[LogEntry.__table__, LogStatMinute.__table__, LogStatHour.__table__]
+    )
+    factory = sessionmaker(bind=engine)
+    kwargs.setdefault("flush_interval", 0)
+    return LogWriter(factory, spool_path=str(tmp_path / "spool.jsonl"), **kwargs), factory
+
+
+def _count(factory):
+    db = factory()
+    try:
+        return db.query(LogEntry).count()
+    finally:
+        db.close()
+
+
+def test_flushes_on_batch_size(tmp_path):
+    w, factory = _writer(tmp_path, batch_size=3)
+    w.write(1, "send_message", "success")
+    w.write(1, "send_message", "success")
+    assert (w.pending(), _count(factory)) == (2, 0)
+    w.write(1, "send_message", "error", "boom")
+    assert (w.pending(), _count(factory)) == (0, 3)
+
+
+def test_due_only_flush_waits_for_the_interval(tmp_path):
+    now = [0.0]
+    w, factory = _writer(tmp_path, batch_size=100, clock=lambda: now[0])
+    w.flush_interval = 5
+    w._start_timer = lambda: None
+    w.write(1, "send_message", "success")
+    assert w.flush(due_only=True) == 0
+    now[0] += 5
+    assert w.flush(due_only=True) == 1
+    assert _count(factory) == 1
+
+
+def test_spools_when_the_database_fails_and_replays_later(tmp_path):
+    w, factory = _writer(tmp_path, batch_size=100)
+    insert = w._insert
+
+    def down(rows):
+        raise OperationalError("INSERT", {}, Exception("database is locked"))
+
+    w._insert = down
+    w.write(1, "send_message", "success")
+    w.write(2, "send_message", "error", "x")
+    assert w.flush() == 0
+    assert len((tmp_path / "spool.jsonl").read_text().splitlines()) == 2
+
+    w._insert = insert
+    w.write(3, "send_message", "success")
+    w.close()
+    assert not (tmp_path / "spool.jsonl").exists()
+    db = factory()
+    try:
+        rows = db.query(LogEntry).order_by(LogEntry.profile_id).all()
+        assert [(r.profile_id, r.status) for r in rows] == [
+            (1, "success"), (2, "error"), (3, "success")
+        ]
+        assert all(r.timestamp is not None for r in rows)
+    finally:
+        db.close()
+
+
+def test_bad_records_are_quarantined_not_replayed_forever(tmp_path):
+    w, factory = _writer(tmp_path, batch_size=100)
+    insert = w._insert
+
+    def fk_checked(rows):
+        if any(r["profile_id"] == 99 for r in rows):  # profile deleted since
+            raise IntegrityError("INSERT", {}, Exception("FOREIGN KEY constraint failed"))
+        insert(rows)
+
+    w._insert = fk_checked
+    # a spooled batch holding the bad record, from an earlier outage
+    w._spool([
+        {"profile_id": p, "action": "a", "status": "s", "detail": None,
+         "timestamp": datetime.now(timezone.utc)}
+        for p in (1, 99, 2)
+    ])
+    for p in (3, 4, 5):
+        w.write(p, "send_message", "success")
+    assert w.flush() == 3
+    assert _count(factory) == 5
+    assert not (tmp_path / "spool.jsonl").exists()
+    rejected = (tmp_path / "spool.jsonl.rejected").read_text().splitlines()
+    assert len(rejected) == 1 and '"profile_id": 99' in rejected[0]
+
+    w.write(6, "send_message", "success")
+    assert w.flush() == 1 and _count(factory) == 6
+
+
+def test_unexpected_errors_keep_buffer_and_spool(tmp_path):
+    w, factory = _writer(tmp_path, batch_size=100)
+    insert = w._insert
+    w._spool([{"profile_id": 1, "action": "a", "status": "s", "detail": None,
+               "timestamp": datetime.now(timezone.utc)}])
+
+    def broken(rows):
+        raise RuntimeError("bug")
+
+    w._insert = broken
+    w.write(2, "send_message", "success")
+    with pytest.raises(RuntimeError):
+        w.flush()
+    assert w.pending() == 1
+
+    w._insert = insert
+    assert w.flush() == 1
+    assert _count(factory) == 2
+    assert list(tmp_path.iterdir()) == [tmp_path / "logs.db"]
@@ -0,0 +1,125 @@
+import threading
+
+import pytest
+
+from mpm.services import mx_cache as mx
+from mpm.services.mx_cache import MXCache, MXResult, Resolver
+
+
+class FakeResolver(Resolver):
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def resolve(self, domain):
+        with self._lock:
+            self.calls.append(domain)
+        status, ttl = self.answers.get(domain, ("nxdomain", 0))
+        if status == "boom":
+            raise OSError("resolver down")
+        return MXResult(domain, status, (f"mx.{domain}",) if status == "ok" else (), ttl)
+
+
+@pytest.fixture
+def cache():
+    now = [0.0]
+    resolver = FakeResolver({
+        "good.example": ("ok", 300),
+        "null.example": ("no_mail", 300),
+        "flaky.example": ("tempfail", 300),
+        "broken.example": ("boom", 0),
+    })
+    return MXCache(resolver, max_entries=10, clock=lambda: now[0]), resolver, now
+
+
+def test_answers_are_cached_for_their_ttl(cache):
+    c, resolver, now = cache
+    assert c.lookup("Good.Example").hosts == ("mx.good.example",)
+    assert c.lookup("good.example").deliverable
+    assert resolver.calls == ["good.example"]
+    assert (c.hits, c.misses) == (1, 1)
+
+    now[0] += 301
+    c.lookup("good.example")
+    assert resolver.calls == ["good.example"] * 2
+
+
+def test_negative_and_tempfail_answers(cache):
+    c, resolver, now = cache
+    assert not c.lookup("nowhere.example").deliverable
+    assert not c.lookup("null.example").deliverable
+    # transient failures (and resolver errors) are not "undeliverable"
+    assert c.lookup("flaky.example").deliverable
+    assert c.lookup("broken.example").status == mx.TEMPFAIL
+
+    # negative answers outlive their record TTL; tempfails are retried soon
+    now[0] += mx.TEMPFAIL_TTL + 1
+    c.lookup("nowhere.example")
+    c.lookup("flaky.example")
+    assert resolver.calls.count("nowhere.example") == 1
+    assert resolver.calls.count("flaky.example") == 2
+
+
+def test_lru_bound():
+    c = MXCache(FakeResolver({}), max_entries=3)
+    for d in ("a.example", "b.example", "c.example", "d.example"):
+        c.lookup(d)
+    assert c.get("a.example") is None
+    assert c.get("d.example") is not None
+
+
+def test_warm_resolves_each_domain_once(cache):
+    c, resolver, _ = cache
+    recipients = ["x@good.example", "y@GOOD.example", "z@null.example", "w@nowhere.example"]
+    assert c.undeliverable(recipients) == [2, 3]
+    assert sorted(resolver.calls) == ["good.example", "nowhere.example", "null.example"]
+    # already cached: no more lookups
+    c.warm(["good.example", "null.example"])
+    assert len(resolver.calls) == 3
+    assert c.known_undeliverable("null.example")
+    assert not c.known_undeliverable("good.example")
+    assert not c.known_undeliverable("unseen.example")
+
+
+def test_email_campaign_flags_undeliverable_domains(client, monkeypatch, cache):
+    import mpm.tasks as tasks
+    from mpm.tests.test_campaign import _cleanup, _fake_broker, _release
+
+    c, _, _ = cache
+    monkeypatch.setattr(mx, "mx_cache", c)
+    monkeypatch.setattr(tasks, "mx_cache", c)
+    monkeypatch.setattr("mpm.services.campaign.mx_cache", c)
+    queue = _fake_broker(monkeypatch)
+    pid = client.post("/profiles", json={
+        "name": "camp-mx",
+        "platform": "email",
+        "credentials": {},
+        "proxy": None,
+    }).json()["id"]
+    tid = client.post("/templates", json={"name": "camp-mx", "subject": "s", "body": "b"}).json()["id"]
+    try:
+        res = client.post(f"/campaigns/{pid}/start", json={
+            "template_id": tid,
+            "recipients": ["a@good.example", "b@nowhere.example", "c@null.example"],
+        })
+        assert res.status_code == 200
+        # checked by the worker that starts the run, not in the request
+        assert res.json()["failed"] == 0
+        assert client.get(f"/campaigns/{pid}").json()["failed"] == 2
+        _release(queue)
+        assert [args[2] for args, _ in queue] == ["a@good.example"]
+    finally:
+        _cleanup(client, pid, tid)
+
+
+def test_socket_fallback_never_flags_a_domain(monkeypatch):
+    import socket
+
+    def no_address(*args, **kwargs):
+        raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+
+    monkeypatch.setattr(socket, "getaddrinfo", no_address)
+    # may still have MX records getaddrinfo can't see
+    result = mx.SocketResolver().resolve("mx-only.example")
+    assert result.status == mx.UNKNOWN and result.deliverable
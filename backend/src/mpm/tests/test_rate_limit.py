@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import time
+
+import mpm.tasks as tasks
+from mpm.database import SessionLocal
+from mpm.models import LogEntry
+from mpm.services.log_writer import log_writer
+from mpm.services.rate_limit import MemoryRateLimiter, profile_limits
+from mpm.services.scheduler import send_scheduler
+
+
+def test_bucket_allows_burst_then_hands_out_consecutive_slots():
+    now = [100.0]
+    limiter = MemoryRateLimiter(clock=lambda: now[0])
+
+    # 2 tokens of burst, then each caller reserves the next free slot
+    waits = [limiter.acquire("p", rate=1.0, burst=2) for _ in range(4)]
+    assert waits == [0.0, 0.0, 1.0, 2.0]
+
+    # the debt is repaid before the bucket refills
+    now[0] += 3.0
+    assert limiter.acquire("p", 1.0, 2) == 0.0
+    assert limiter.acquire("p", 1.0, 2) == 1.0
+
+    # buckets are independent per key, and a batch takes n tokens at once
+    assert limiter.acquire("q", 1.0, 2, n=5) == 3.0
+
+
+def test_profile_limits_fall_back_to_defaults():
+    rate, burst = profile_limits(SimpleNamespace(rate_limit_per_hour=7200, rate_limit_burst=5))
+    assert (rate, burst) == (2.0, 5)
+    rate, burst = profile_limits(SimpleNamespace(rate_limit_per_hour=None, rate_limit_burst=None))
+    assert rate > 0 and burst >= 1
+
+
+def test_send_over_rate_is_rescheduled_for_its_slot(client):
+    pid = client.post("/profiles", json={
+        "name": "p-rate",
+        "platform": "telegram",
+        "credentials": {},
+        "proxy": None,
+        "rate_limit_per_hour": 360,
+        "rate_limit_burst": 1,
+    }).json()["id"]
+    tid = client.post("/templates", json={"name": "rate", "body": "Hi"}).json()["id"]
+    try:
+        tasks.send_message_task(pid, tid, "a", {})
+        tasks.send_message_task(pid, tid, "b", {})
+
+        # 360/h is one token every 10s; the second send is scheduled for the
+        # next slot rather than parked on the broker
+        assert send_scheduler.pending(pid) == 1
+        assert send_scheduler.pop_due(pid, now=time.time() + 8) == []
+        (send,) = send_scheduler.pop_due(pid, now=time.time() + 10.5)
+        assert send["task"] == tasks.send_message_task.name
+        assert send["args"][2] == "b" and send["kwargs"]["token_reserved"] is True
+
+        # the re-queued task already holds its token and sends immediately
+        tasks.send_message_task(*send["args"], **send["kwargs"])
+        assert send_scheduler.pending(pid) == 0
+        log_writer.flush()
+        db = SessionLocal()
+        try:
+            statuses = [e.status for e in db.query(LogEntry).filter_by(profile_id=pid)]
+        finally:
+            db.close()
+        assert statuses == ["success", "success"]
+    finally:
+        log_writer.flush()
+        db = SessionLocal()
+        db.query(LogEntry).filter_by(profile_id=pid).delete()
+        db.commit()
+        db.close()
+        client.delete(f"/templates/{tid}")
+        client.delete(f"/profiles/{pid}")
@@ -0,0 +1,68 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from mpm.services.renderer import Renderer, TemplateCache
+
+
+def make_template(body, subject="Hi {{ name }}", updated_at=None):
+    return SimpleNamespace(
+        id=1,
+        subject=subject,
+        body=body,
+        updated_at=updated_at or datetime(2025, 1, 1, tzinfo=timezone.utc),
+    )
+
+
+def test_render_template_compiles_once():
+    cache = TemplateCache(maxsize=8)
+    renderer = Renderer(cache)
+    tmpl = make_template("Hello {{ name }}!")
+    for name in ["Ann", "Bob", "Cy"]:
+        subject, body = renderer.render_template(tmpl, {"name": name})
+    assert (subject, body) == ("Hi Cy", "Hello Cy!")
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 2
+
+
+def test_edit_invalidates_cached_template():
+    cache = TemplateCache(maxsize=8)
+    renderer = Renderer(cache)
+    renderer.render_template(make_template("v1 {{ name }}"), {"name": "x"})
+    edited = make_template(
+        "v2 {{ name }}", updated_at=datetime(2025, 1, 2, tzinfo=timezone.utc)
+    )
+    assert renderer.render_template(edited, {"name": "x"})[1] == "v2 x"
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TemplateCache(maxsize=2)
+    renderer = Renderer(cache)
+    for src in ["a {{ x }}", "b {{ x }}", "a {{ x }}", "c {{ x }}"]:
+        renderer.render(src, {"x": 1})
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["evictions"] == 1
+    # "a" was touched before "c" arrived, so "b" was the one evicted
+    renderer.render("a {{ x }}", {"x": 1})
+    assert cache.stats()["hits"] == 2
+
+
+def test_render_many_streams_and_reuses_static_parts():
+    cache = TemplateCache(maxsize=8)
+    renderer = Renderer(cache)
+    tmpl = make_template("Dear {{ name }}, see {{ url }}", subject="Newsletter")
+    subject_part, body_part = renderer.compile_template(tmpl)
+    assert subject_part.static == "Newsletter"
+    assert body_part.names == {"name", "url"}
+
+    contexts = (
+        {"name": n, "url": "https://x", "unused": object()} for n in ["A", "B", "A"]
+    )
+    rendered = renderer.render_many(tmpl, contexts)
+    assert next(rendered) == ("Newsletter", "Dear A, see https://x")
+    assert list(rendered) == [
+        ("Newsletter", "Dear B, see https://x"),
+        ("Newsletter", "Dear A, see https://x"),
+    ]
+    # the repeated context was served from the memo
+    assert len(body_part.memo) == 2
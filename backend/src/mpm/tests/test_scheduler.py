@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from mpm.services.scheduler import (
+    DISTRIBUTIONS,
+    MemorySendScheduler,
+    distribution,
+    sample_delay,
+)
+
+
+def test_paced_sends_follow_each_other_and_release_only_when_due():
+    now = [1000.0]
+    sched = MemorySendScheduler(clock=lambda: now[0])
+
+    dues = [sched.schedule(1, "t", [i], {}, delay=5) for i in range(3)]
+    assert dues == [1005.0, 1010.0, 1015.0]
+    # retries sit outside the pacing
+    assert sched.schedule_at(1, "t", ["retry"], {}, delay=1) == 1001.0
+    sched.schedule(2, "t", ["other"], {}, delay=5)
+    assert sorted(sched.queues()) == [1, 2]
+
+    assert [s["args"] for s in sched.pop_due(1)] == []
+    now[0] = 1010.0
+    assert [s["args"] for s in sched.pop_due(1)] == [["retry"], [0], [1]]
+    assert sched.pending(1) == 1
+
+    # once the tail is in the past, pacing restarts from now
+    now[0] = 2000.0
+    assert sched.schedule(1, "t", [9], {}, delay=5) == 2005.0
+    assert [s["args"] for s in sched.pop_due(1, limit=1)] == [[2]]
+    assert [s["args"] for s in sched.pop_due(1, now=float("inf"))] == [[9]]
+    assert sched.queues() == [2]
+
+
+def test_distributions_stay_in_range():
+    rng = random.Random(7)
+    for _ in range(200):
+        assert 1 <= DISTRIBUTIONS["uniform"](1, 5, rng, 0) <= 5
+        assert 1 <= DISTRIBUTIONS["lognormal"](1, 5, rng, 0) <= 15
+        assert DISTRIBUTIONS["time_of_day"](1, 5, rng, 0) >= 1
+    with pytest.raises(ValueError):
+        sample_delay("nope", 1, 5)
+
+
+def test_custom_distribution_can_be_registered():
+    @distribution("fixed-test")
+    def fixed(min_delay, max_delay, rng, now):
+        return max_delay
+
+    try:
+        assert sample_delay("fixed-test", 1, 3) == 3
+    finally:
+        DISTRIBUTIONS.pop("fixed-test")
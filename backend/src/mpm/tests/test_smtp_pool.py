@@ -0,0 +1,112 @@
+import smtplib
+
+from mpm.connectors.smtp_connector import SMTPConnector
+from mpm.connectors.smtp_pool import SMTPSessionPool
+
+
+class FakeSMTP:
+    """Stands in for an authenticated smtplib.SMTP connection."""
+
+    opened = 0
+
+    def __init__(self, **kwargs):
+        FakeSMTP.opened += 1
+        self.alive = True
+        self.sent = []
+
+    def noop(self):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("gone")
+        return 250, b"OK"
+
+    def send_message(self, msg):
+        if not self.alive:
+            raise smtplib.SMTPServerDisconnected("gone")
+        self.sent.append(msg["To"])
+        return {}
+
+    def quit(self):
+        self.alive = False
+
+    def close(self):
+        self.alive = False
+
+
+def make_connector(pool):
+    return SMTPConnector(host="smtp.test", port=465, user="u", password="p", pool=pool)
+
+
+def test_pool_reuses_connection():
+    FakeSMTP.opened = 0
+    pool = SMTPSessionPool(factory=FakeSMTP)
+    smtp = make_connector(pool)
+    for i in range(5):
+        smtp.send_email(f"r{i}@example.com", "s", "b")
+    assert FakeSMTP.opened == 1
+    assert pool.idle_count() == 1
+
+
+def test_pool_reconnects_after_server_drop():
+    FakeSMTP.opened = 0
+    pool = SMTPSessionPool(factory=FakeSMTP)
+    smtp = make_connector(pool)
+    smtp.send_email("a@example.com", "s", "b")
+    # server silently drops the idle connection
+    pool._idle[next(iter(pool._idle))][0].server.alive = False
+    smtp.send_email("b@example.com", "s", "b")
+    assert FakeSMTP.opened == 2
+    assert pool.idle_count() == 1
+
+
+def test_pool_caps_messages_per_connection():
+    FakeSMTP.opened = 0
+    pool = SMTPSessionPool(factory=FakeSMTP, max_messages=2)
+    smtp = make_connector(pool)
+    for i in range(5):
+        smtp.send_email(f"r{i}@example.com", "s", "b")
+    assert FakeSMTP.opened == 3
+
+
+def test_pool_drops_idle_connections():
+    FakeSMTP.opened = 0
+    pool = SMTPSessionPool(factory=FakeSMTP, max_idle=0)
+    smtp = make_connector(pool)
+    smtp.send_email("a@example.com", "s", "b")
+    smtp.send_email("b@example.com", "s", "b")
+    assert FakeSMTP.opened == 2
+    assert pool.prune() == 1
+
+
+class RefusingSMTP(FakeSMTP):
+    def send_message(self, msg):
+        to = msg["To"]
+        if to.startswith("bad"):
+            raise smtplib.SMTPRecipientsRefused({to: (550, b"no such user")})
+        if to.startswith("partial"):
+            return {to: (450, b"mailbox busy")}
+        return super().send_message(msg)
+
+
+def test_send_many_reports_per_recipient_results():
+    RefusingSMTP.opened = FakeSMTP.opened = 0
+    pool = SMTPSessionPool(factory=RefusingSMTP)
+    smtp = make_connector(pool)
+    results = smtp.send_many(
+        {"to": to, "subject": "s", "body": "b"}
+        for to in ["a@example.com", "bad@example.com", "partial@example.com", "c@example.com"]
+    )
+    assert [r["status"] for r in results] == ["success", "refused", "refused", "success"]
+    assert results[1]["code"] == 550
+    assert results[2]["detail"] == "mailbox busy"
+    assert FakeSMTP.opened == 1
+
+
+def test_send_many_reconnects_mid_batch():
+    FakeSMTP.opened = 0
+    pool = SMTPSessionPool(factory=FakeSMTP, max_messages=2)
+    smtp = make_connector(pool)
+    results = smtp.send_many(
+        {"to": f"r{i}@example.com", "subject": "s", "body": "b"} for i in range(5)
+    )
+    assert all(r["status"] == "success" for r in results)
+    assert FakeSMTP.opened == 3
@@ -0,0 +1,87 @@
+import os
+
+from mpm.services.state_store import StateStore, set_profile_state, summarize
+
+
+class FakeProfile:
+    credentials = {"token": "t"}
+    storage_state_ref = None
+    storage_state_summary = None
+
+
+def _state(*values, origins=()):
+    return {
+        "cookies": [
+            {"name": f"c{i}", "value": v, "domain": f".d{i % 2}.test", "expires": 2_000_000_000 - i}
+            for i, v in enumerate(values)
+        ] + [{"name": "session", "value": "s", "domain": "d0.test", "expires": -1}],
+        "origins": [{"origin": o, "localStorage": []} for o in origins],
+    }
+
+
+def test_states_are_stored_once_by_content(tmp_path):
+    store = StateStore(str(tmp_path), cache_size=10)
+    ref = store.put(_state("a", "b"))
+    # same content, different key order: same blob
+    reordered = {"origins": [], "cookies": list(reversed(_state("a", "b")["cookies"]))[::-1]}
+    assert store.put(reordered) == ref
+    assert store.put(_state("a", "c")) != ref
+    blobs = [f for _, _, files in os.walk(tmp_path) for f in files]
+    assert len(blobs) == 2 and all(f.endswith(".json.gz") for f in blobs)
+
+    store.clear_cache()
+    assert store.get(ref) == _state("a", "b")
+
+
+def test_lru_serves_hot_states_without_disk(tmp_path):
+    store = StateStore(str(tmp_path), cache_size=2)
+    refs = [store.put(_state(str(i))) for i in range(3)]
+    os.remove(store.path(refs[2]))
+    assert store.get(refs[2]) == _state("2")  # still cached
+    try:
+        os.remove(store.path(refs[0]))
+        store.get(refs[0])  # evicted and gone from disk
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("evicted state should be read from disk")
+
+
+def test_prune_keeps_referenced_and_recent_blobs(tmp_path):
+    store = StateStore(str(tmp_path))
+    keep, drop = store.put(_state("keep")), store.put(_state("drop"))
+    assert store.prune([keep]) == 0  # too new to tell
+    assert store.prune([keep], min_age=-1) == 1
+    assert os.path.exists(store.path(keep)) and not os.path.exists(store.path(drop))
+
+
+def test_rewriting_an_old_blob_protects_it_from_prune(tmp_path):
+    store = StateStore(str(tmp_path))
+    ref = store.put(_state("old"))
+    os.utime(store.path(ref), (0, 0))
+    # a capture lands on the orphaned blob before its profile row commits
+    assert store.put(_state("old")) == ref
+    assert store.prune([]) == 0
+    assert os.path.exists(store.path(ref))
+
+
+def test_summary_and_write_only_on_change(tmp_path, monkeypatch):
+    from mpm.services import state_store as module
+
+    monkeypatch.setattr(module, "state_store", StateStore(str(tmp_path)))
+    summary = summarize(_state("a", "b", origins=["https://x.test"]))
+    assert summary == {
+        "cookie_count": 3,
+        "domain_count": 2,
+        "origin_count": 1,
+        "expires_at": "2033-05-18T03:33:19+00:00",
+    }
+
+    profile = FakeProfile()
+    assert set_profile_state(profile, _state("a"), user_agent="UA")
+    first = profile.storage_state_ref
+    assert profile.credentials == {"token": "t", "user_agent": "UA"}
+    assert not set_profile_state(profile, _state("a"), user_agent="UA")
+    assert set_profile_state(profile, _state("b"))
+    assert profile.storage_state_ref != first
+    assert profile.storage_state_summary["cookie_count"] == 2
@@ -30,3 +30,39 @@ def test_template_crud(client):
     # Delete
     res = client.delete(f"/templates/{tid}")
     assert res.status_code == 204
+
+
+def test_template_preview(client):
+    res = client.post(
+        "/templates",
+        json={"name": "promo", "subject": "Hi {{ name }}", "body": "Code: {{ code }}"},
+    )
+    tid = res.json()["id"]
+
+    res = client.post(
+        f"/templates/{tid}/preview",
+        json={"vars_list": [{"name": "Ann", "code": "A1"}, {"name": "Bob", "code": "B2"}]},
+    )
+    assert res.status_code == 200
+    assert res.json() == [
+        {"subject": "Hi Ann", "body": "Code: A1"},
+        {"subject": "Hi Bob", "body": "Code: B2"},
+    ]
+
+    client.delete(f"/templates/{tid}")
+
+
+def test_unsaved_template_preview(client):
+    res = client.post("/templates/preview", json={
+        "subject": "Hi {{ name }}",
+        "body": "See you, {{ name }}",
+        "vars_list": [{"name": "Ann"}, {"name": "Bob", "unused": 1}],
+    })
+    assert res.status_code == 200
+    assert res.json() == [
+        {"subject": "Hi Ann", "body": "See you, Ann"},
+        {"subject": "Hi Bob", "body": "See you, Bob"},
+    ]
+
+    res = client.post("/templates/preview", json={"body": "{% if %}", "vars_list": [{}]})
+    assert res.status_code == 422
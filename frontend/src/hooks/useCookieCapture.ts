@@ -2,14 +2,33 @@
 import { useMutation } from '@tanstack/react-query'
 import { apiFetch, API_BASE } from '@/lib/api'
 
+// Slack on top of the job's max wait (matches AUTOMATION_JOB_GRACE), plus one poll
+const JOB_GRACE_MS = 60_000 + 30_000
+
+// Long-poll a background automation job until it finishes, giving up
+// `maxWaitMs` (plus grace) from now
+async function waitForJob(jobId: string, maxWaitMs = 120_000) {
+    const deadline = Date.now() + maxWaitMs + JOB_GRACE_MS
+    while (Date.now() < deadline) {
+        const job = await apiFetch<{ status: string; results: any[]; detail?: string }>(
+            `${API_BASE}/automation/jobs/${jobId}?wait=30`
+        )
+        if (job.status === 'completed') return job.results[0]
+        if (job.status === 'failed') throw new Error(job.detail)
+    }
+    throw new Error('Timed out waiting for the automation job to finish')
+}
+
 export function useCookieCapture() {
     return useMutation({
-        mutationFn: async (args: { profile_id: number; login_url: string; max_wait_ms?: number; headless?: boolean }) =>
-            apiFetch(`${API_BASE}/automation/cookies/capture`, {
+        mutationFn: async (args: { profile_id: number; login_url: string; max_wait_ms?: number; headless?: boolean; completion?: { url_pattern?: string; selector?: string; cookie?: string } }) => {
+            const { job_id } = await apiFetch<{ job_id: string }>(`${API_BASE}/automation/cookies/capture`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(args),
-            }),
+            })
+            return waitForJob(job_id, args.max_wait_ms)
+        },
     })
 }
 